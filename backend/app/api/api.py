@@ -1,5 +1,5 @@
 from fastapi import APIRouter
-from .endpoints import pharmacy, product, supplier, auth, users
+from .endpoints import pharmacy, product, supplier, auth, users, export
 
 api_router = APIRouter()
 
@@ -37,3 +37,10 @@ api_router.include_router(
     prefix="/suppliers",
     tags=["suppliers"]
 )
+
+# Подключение эндпоинтов для потоковой выгрузки данных
+api_router.include_router(
+    export.router,
+    prefix="/export",
+    tags=["export"]
+)
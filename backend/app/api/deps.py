@@ -1,46 +1,95 @@
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, Request, status
 from fastapi.security import OAuth2PasswordBearer
 from jose import jwt, JWTError
 from sqlalchemy.orm import Session
+from dataclasses import dataclass
 from typing import Optional
+import time
 
+from ..core.auth_cache import CachedUser, token_cache, user_cache
+from ..core.conditional import Validators, list_validators
+from ..core.pagination import decode_cursor
 from ..core.config import settings
 from ..db.database import get_db
 from ..db.models_auth import User, UserRole
 from ..schemas.user import TokenData
 from ..services import user as user_service
+from ..services import versions as versions_service
 
 # Настройка OAuth2 с использованием пароля
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl=f"{settings.API_V1_STR}/auth/login")
 
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: Session = Depends(get_db)
-) -> User:
-    """
-    Получить текущего пользователя по токену
-    """
-    credentials_exception = HTTPException(
+def _decode_token(token: str) -> Optional[dict]:
+    """Проверить JWT токен, используя кэш уже проверенных токенов"""
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
+    
+    try:
+        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
+    except JWTError:
+        return None
+    
+    # Токен не должен жить в кэше дольше собственного срока действия
+    expires_in = payload.get("exp", 0) - time.time()
+    token_cache.set(token, payload, ttl=expires_in)
+    return payload
+
+def _load_user(db: Session, user_id: int) -> Optional[CachedUser]:
+    """Получить пользователя из кэша или из базы данных"""
+    user = user_cache.get(user_id)
+    if user is not None:
+        return user
+    
+    db_user = user_service.get_user(db, user_id=user_id)
+    if db_user is None:
+        return None
+    
+    user = CachedUser.from_orm(db_user)
+    user_cache.set(user_id, user)
+    return user
+
+def _credentials_exception() -> HTTPException:
+    return HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
         headers={"WWW-Authenticate": "Bearer"},
     )
+
+def get_token_data(token: str = Depends(oauth2_scheme)) -> TokenData:
+    """
+    Получить данные из проверенного JWT токена
+    """
+    # Декодируем JWT токен
+    payload = _decode_token(token)
+    if payload is None:
+        raise _credentials_exception()
     
-    try:
-        # Декодируем JWT токен
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        username: str = payload.get("sub")
-        user_id: int = payload.get("id")
-        
-        if username is None or user_id is None:
-            raise credentials_exception
-        
-        token_data = TokenData(username=username, user_id=user_id, role=payload.get("role"))
-    except JWTError:
-        raise credentials_exception
+    username: str = payload.get("sub")
+    user_id: int = payload.get("id")
+    
+    if username is None or user_id is None:
+        raise _credentials_exception()
+    
+    return TokenData(
+        username=username,
+        user_id=user_id,
+        role=payload.get("role"),
+        supplier_id=payload.get("supplier_id"),
+        has_scope="supplier_id" in payload,
+    )
+
+def get_current_user(
+    token_data: TokenData = Depends(get_token_data),
+    db: Session = Depends(get_db)
+) -> CachedUser:
+    """
+    Получить текущего пользователя по токену
+    """
+    credentials_exception = _credentials_exception()
     
-    # Получаем пользователя из базы данных
-    user = user_service.get_user(db, user_id=token_data.user_id)
+    # Получаем пользователя из кэша или базы данных
+    user = _load_user(db, user_id=token_data.user_id)
     
     if user is None:
         raise credentials_exception
@@ -53,9 +102,9 @@ async def get_current_user(
     
     return user
 
-async def get_current_active_user(
-    current_user: User = Depends(get_current_user)
-) -> User:
+def get_current_active_user(
+    current_user: CachedUser = Depends(get_current_user)
+) -> CachedUser:
     """
     Получить текущего активного пользователя
     """
@@ -67,9 +116,43 @@ async def get_current_active_user(
     
     return current_user
 
+@dataclass(frozen=True)
+class Principal:
+    """Текущий пользователь с областью доступа, взятой из токена"""
+    id: int
+    username: str
+    role: UserRole
+    supplier_id: Optional[int] = None
+
+def _claims_are_stale(token_data: TokenData, user: CachedUser) -> bool:
+    """Проверить, что роль или поставщик в токене не совпадают с данными пользователя"""
+    if not token_data.has_scope or token_data.role != user.role:
+        return True
+    return user.supplier_id is not None and user.supplier_id != token_data.supplier_id
+
+def get_current_principal(
+    token_data: TokenData = Depends(get_token_data),
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+) -> Principal:
+    """
+    Получить текущего пользователя с областью доступа без обращения к базе данных.
+    Если токен выпущен до изменения роли, область доступа вычисляется заново.
+    """
+    supplier_id = token_data.supplier_id
+    if _claims_are_stale(token_data, current_user):
+        supplier_id = user_service.get_token_claims(db, current_user)["supplier_id"]
+    
+    return Principal(
+        id=current_user.id,
+        username=current_user.username,
+        role=current_user.role,
+        supplier_id=supplier_id,
+    )
+
 def check_admin_permission(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: CachedUser = Depends(get_current_active_user)
+) -> CachedUser:
     """
     Проверить, является ли пользователь администратором
     """
@@ -82,8 +165,8 @@ def check_admin_permission(
     return current_user
 
 def check_director_permission(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: CachedUser = Depends(get_current_active_user)
+) -> CachedUser:
     """
     Проверить, является ли пользователь директором или администратором
     """
@@ -96,8 +179,8 @@ def check_director_permission(
     return current_user
 
 def check_supplier_permission(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: CachedUser = Depends(get_current_active_user)
+) -> CachedUser:
     """
     Проверить, является ли пользователь поставщиком
     """
@@ -110,8 +193,8 @@ def check_supplier_permission(
     return current_user
 
 def check_supplier_or_admin_permission(
-    current_user: User = Depends(get_current_active_user)
-) -> User:
+    current_user: CachedUser = Depends(get_current_active_user)
+) -> CachedUser:
     """
     Проверить, является ли пользователь поставщиком или администратором
     """
@@ -122,3 +205,26 @@ def check_supplier_or_admin_permission(
         )
     
     return current_user
+
+def get_after_id(
+    after: Optional[str] = Query(None, description="Курсор следующей страницы (из заголовка X-Next-Cursor)")
+) -> Optional[int]:
+    """
+    Получить ключ последней записи из курсора пагинации
+    """
+    if after is None:
+        return None
+    try:
+        return decode_cursor(after)
+    except ValueError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Некорректный курсор"
+        )
+
+def get_list_validators(request: Request, db: Session, *entities: str, scope: str = "") -> Validators:
+    """
+    Получить ETag и Last-Modified списка по версиям наборов данных (один запрос к entity_versions)
+    """
+    versions, last_modified = versions_service.get_versions(db, entities)
+    return list_validators(request, versions, last_modified, scope)
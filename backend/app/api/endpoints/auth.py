@@ -3,6 +3,7 @@ from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
 
+from ...core.auth_cache import CachedUser
 from ...core.config import settings
 from ...core.security import create_access_token
 from ...db.database import get_db
@@ -14,7 +15,7 @@ from ..deps import get_current_active_user, check_admin_permission
 router = APIRouter()
 
 @router.post("/login", response_model=Token)
-async def login_for_access_token(
+def login_for_access_token(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: Session = Depends(get_db)
 ):
@@ -33,14 +34,31 @@ async def login_for_access_token(
     # Создаем токен доступа
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username, "id": user.id, "role": user.role},
+        data=user_service.get_token_claims(db, user),
+        expires_delta=access_token_expires
+    )
+    
+    return {"access_token": access_token, "token_type": "bearer"}
+
+@router.post("/refresh", response_model=Token)
+def refresh_access_token(
+    current_user: CachedUser = Depends(get_current_active_user),
+    db: Session = Depends(get_db)
+):
+    """
+    Выпустить новый токен с актуальной ролью и областью доступа
+    (например, после изменения роли пользователя)
+    """
+    access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
+    access_token = create_access_token(
+        data=user_service.get_token_claims(db, current_user),
         expires_delta=access_token_expires
     )
     
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.post("/register", response_model=UserSchema)
-async def register_user(
+def register_user(
     user: UserCreate,
     db: Session = Depends(get_db)
 ):
@@ -72,8 +90,8 @@ async def register_user(
     return user_service.create_user(db=db, user=user)
 
 @router.get("/me", response_model=UserSchema)
-async def read_users_me(
-    current_user: User = Depends(get_current_active_user)
+def read_users_me(
+    current_user: CachedUser = Depends(get_current_active_user)
 ):
     """
     Получить информацию о текущем пользователе
@@ -0,0 +1,61 @@
+from fastapi import APIRouter, Depends, Query
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session
+
+from ...db.database import get_db
+from ...services import export as export_service
+from ..deps import get_current_active_user
+
+router = APIRouter()
+
+# Поддерживаемые форматы выгрузки: кодировщик и тип содержимого
+FORMATS = {
+    "ndjson": (export_service.encode_ndjson, "application/x-ndjson"),
+    "csv": (export_service.encode_csv, "text/csv; charset=utf-8"),
+}
+
+format_query = Query("ndjson", regex="^(ndjson|csv)$", description="Формат выгрузки: ndjson или csv")
+
+
+def _stream_response(batches, columns, fmt: str, filename: str) -> StreamingResponse:
+    encoder, media_type = FORMATS[fmt]
+    return StreamingResponse(
+        encoder(batches, columns),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{filename}.{fmt}"'},
+    )
+
+
+@router.get("/products")
+def export_products(
+    format: str = format_query,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Выгрузить весь каталог товаров"""
+    batches = export_service.iter_products(db)
+    return _stream_response(batches, export_service.PRODUCT_COLUMNS, format, "products")
+
+
+@router.get("/pharmacy/{pharmacy_id}")
+def export_pharmacy_stock(
+    pharmacy_id: int,
+    format: str = format_query,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Выгрузить остатки товаров в аптеке"""
+    batches = export_service.iter_pharmacy_stock(db, pharmacy_id=pharmacy_id)
+    return _stream_response(batches, export_service.PHARMACY_STOCK_COLUMNS, format, f"pharmacy_{pharmacy_id}")
+
+
+@router.get("/supplier/{supplier_id}")
+def export_supplier_assortment(
+    supplier_id: int,
+    format: str = format_query,
+    db: Session = Depends(get_db),
+    current_user=Depends(get_current_active_user)
+):
+    """Выгрузить ассортимент поставщика"""
+    batches = export_service.iter_supplier_assortment(db, supplier_id=supplier_id)
+    return _stream_response(batches, export_service.SUPPLIER_ASSORTMENT_COLUMNS, format, f"supplier_{supplier_id}")
@@ -1,13 +1,15 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
+from ...core.pagination import NEXT_CURSOR_HEADER, next_cursor
 from ...db.database import get_db
 from ...db.models_auth import User
 from ...schemas.pharmacy import Pharmacy, PharmacyCreate, PharmacyUpdate
 from ...services import pharmacy as pharmacy_service
-from ..deps import get_current_active_user, check_director_permission, check_admin_permission
+from ...services import versions as versions_service
+from ..deps import Principal, get_after_id, get_current_active_user, get_current_principal, get_list_validators, check_director_permission, check_admin_permission
 from ...db.models_auth import UserRole
 
 router = APIRouter()
@@ -15,13 +17,25 @@ router = APIRouter()
 
 @router.get("/", response_model=List[Pharmacy])
 def read_pharmacies(
+    request: Request,
+    response: Response,
     skip: int = Query(0, description="Количество записей для пропуска"),
     limit: int = Query(100, description="Максимальное количество записей для возврата"),
+    after_id: Optional[int] = Depends(get_after_id),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Получить список всех аптек"""
-    pharmacies = pharmacy_service.get_pharmacies(db, current_user=current_user, skip=skip, limit=limit)
+    # Директор видит только свои аптеки, поэтому его ETag отличается от общего
+    scope = f"director:{current_user.id}" if current_user.role == 'director' else ""
+    validators = get_list_validators(request, db, versions_service.PHARMACIES, scope=scope)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    pharmacies = pharmacy_service.get_pharmacies(db, current_user=current_user, skip=skip, limit=limit, after_id=after_id)
+    response.headers.update(validators.headers)
+    cursor = next_cursor(pharmacies, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return pharmacies
 
 
@@ -90,6 +104,7 @@ def assign_director_to_pharmacy(
     if not director:
         raise HTTPException(status_code=404, detail="Директор не найден")
     pharmacy.director_id = director_id
+    versions_service.bump(db, versions_service.PHARMACIES)
     db.commit()
     db.refresh(pharmacy)
     return pharmacy
@@ -105,6 +120,7 @@ def unassign_director_from_pharmacy(
     if not pharmacy:
         raise HTTPException(status_code=404, detail="Аптека не найдена")
     pharmacy.director_id = None
+    versions_service.bump(db, versions_service.PHARMACIES)
     db.commit()
     db.refresh(pharmacy)
     return pharmacy
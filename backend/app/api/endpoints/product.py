@@ -1,67 +1,91 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Request, UploadFile
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import datetime
 
+from ...core.pagination import NEXT_CURSOR_HEADER, next_cursor
+from ...core.responses import rows_response
 from ...db.database import get_db
 from ...schemas.product import Product, ProductCreate, ProductUpdate, ProductWithSupplier
+from ...schemas.product_import import ProductImportResult
+from ...schemas.transfer import TransferBatchResult, TransferLine
 from ...services import product as product_service
+from ...services import product_import as product_import_service
+from ...services import versions as versions_service
 from ..deps import check_director_permission
 from ...db.models_auth import User
-from ...db.models import Supplier
 
 router = APIRouter()
 
 
-from ..deps import get_current_active_user
+from ..deps import Principal, get_after_id, get_current_principal, get_list_validators
 
 @router.get("/", response_model=List[ProductWithSupplier])
 def read_products(
+    request: Request,
     skip: int = Query(0, description="Количество записей для пропуска"),
     limit: int = Query(100, description="Максимальное количество записей для возврата"),
+    after_id: Optional[int] = Depends(get_after_id),
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Получить список всех товаров (для поставщика — только свои)"""
-    from ...services import supplier as supplier_service
     if current_user.role == 'supplier':
-        # Получаем supplier_id, связанный с этим пользователем
-        supplier = db.query(Supplier).filter(Supplier.user_id == current_user.id).first()
-        if supplier:
-            products = product_service.get_products_by_supplier(db, supplier_id=supplier.id)
-        else:
-            products = []
-    else:
-        products = product_service.get_products(db, skip=skip, limit=limit)
-    # Для каждого продукта добавляем preferred_supplier
-    result = []
-    for p in products:
-        supplier_obj = None
-        if getattr(p, 'preferred_supplier_id', None):
-            supplier_db = supplier_service.get_supplier(db, p.preferred_supplier_id)
-            if supplier_db:
-                supplier_obj = {"id": supplier_db.id, "name": supplier_db.name}
-        prod_dict = p.__dict__.copy()
-        prod_dict['preferred_supplier'] = supplier_obj
-        result.append(prod_dict)
-    return result
+        # supplier_id, связанный с этим пользователем, берём из токена
+        if not current_user.supplier_id:
+            return []
+        validators = get_list_validators(
+            request, db, versions_service.PRODUCTS, versions_service.SUPPLIERS,
+            scope=f"supplier:{current_user.supplier_id}"
+        )
+        if validators.is_fresh(request):
+            return validators.not_modified()
+        products = product_service.get_products_with_supplier(db, supplier_id=current_user.supplier_id)
+        return rows_response(products, ProductWithSupplier, headers=validators.headers)
+    validators = get_list_validators(request, db, versions_service.PRODUCTS, versions_service.SUPPLIERS)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    products = product_service.get_products_with_supplier(db, skip=skip, limit=limit, after_id=after_id)
+    headers = validators.headers
+    cursor = next_cursor(products, limit)
+    if cursor:
+        headers[NEXT_CURSOR_HEADER] = cursor
+    return rows_response(products, ProductWithSupplier, headers=headers)
 
 
 @router.post("/", response_model=Product)
 def create_product(
     product: ProductCreate,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_active_user)
+    current_user: Principal = Depends(get_current_principal)
 ):
     """Создать новый товар"""
     # Если пользователь — поставщик, автоматически подставить preferred_supplier_id
     if current_user.role == 'supplier' and not product.preferred_supplier_id:
-        supplier = db.query(Supplier).filter(Supplier.user_id == current_user.id).first()
-        if supplier:
-            product.preferred_supplier_id = supplier.id
+        if current_user.supplier_id:
+            product.preferred_supplier_id = current_user.supplier_id
     return product_service.create_product(db=db, product=product)
 
 
+@router.post("/import", response_model=ProductImportResult)
+def import_products(
+    file: UploadFile = File(..., description="Файл CSV (с заголовком) или NDJSON с полями ProductCreate"),
+    format: str = Query("csv", regex="^(csv|ndjson)$", description="Формат файла: csv или ndjson"),
+    supplier_id: Optional[int] = Query(None, description="Поставщик для всех строк (для администратора)"),
+    db: Session = Depends(get_db),
+    current_user: Principal = Depends(get_current_principal)
+):
+    """Массовый импорт товаров с обновлением существующих (для поставщиков и администраторов)"""
+    if current_user.role == 'supplier':
+        # Поставщик импортирует только собственный прайс-лист
+        if not current_user.supplier_id:
+            raise HTTPException(status_code=400, detail="Пользователь не связан с поставщиком")
+        supplier_id = current_user.supplier_id
+    elif current_user.role != 'admin':
+        raise HTTPException(status_code=403, detail="Недостаточно прав для выполнения этой операции")
+    return product_import_service.import_products(db, file.file, fmt=format, supplier_id=supplier_id)
+
+
 @router.get("/{product_id}", response_model=Product)
 def read_product(
     product_id: int,
@@ -109,7 +133,7 @@ def read_expired_products(
     expired_products = product_service.get_expired_products(
         db, pharmacy_id=pharmacy_id, current_date=current_date
     )
-    return expired_products
+    return rows_response(expired_products, Product)
 
 
 from ...schemas.product_in_pharmacy import ProductInPharmacy
@@ -117,11 +141,18 @@ from ...schemas.product_in_pharmacy import ProductInPharmacy
 @router.get("/pharmacy/{pharmacy_id}", response_model=List[ProductInPharmacy])
 def read_products_by_pharmacy(
     pharmacy_id: int,
+    request: Request,
     db: Session = Depends(get_db)
 ):
     """Получить список товаров в конкретной аптеке (с количеством из pharmacy_product)"""
+    # Остатки других аптек и складские количества на этот список не влияют
+    validators = get_list_validators(
+        request, db, versions_service.PRODUCT_DETAILS, versions_service.pharmacy_stock(pharmacy_id)
+    )
+    if validators.is_fresh(request):
+        return validators.not_modified()
     products = product_service.get_products_by_pharmacy(db, pharmacy_id=pharmacy_id)
-    return products
+    return rows_response(products, ProductInPharmacy, headers=validators.headers)
 
 
 @router.delete("/pharmacy/{pharmacy_id}/{product_id}")
@@ -144,24 +175,26 @@ def read_products_by_supplier(
 ):
     """Получить список товаров у конкретного поставщика"""
     products = product_service.get_products_by_supplier(db, supplier_id=supplier_id)
-    return products
+    return rows_response(products, Product)
 
 
 @router.get("/dosage/{dosage}", response_model=List[Product])
 def read_products_by_dosage(
     dosage: str,
+    skip: int = Query(0, description="Количество записей для пропуска"),
+    limit: int = Query(100, description="Максимальное количество записей для возврата"),
     db: Session = Depends(get_db)
 ):
     """Получить список товаров с заданной фасовкой"""
-    products = product_service.get_products_by_dosage(db, dosage=dosage)
-    return products
+    products = product_service.get_products_by_dosage(db, dosage=dosage, skip=skip, limit=limit)
+    return rows_response(products, Product)
 
 
 @router.post("/pharmacy/{pharmacy_id}/add/{product_id}")
 def add_product_to_pharmacy(
     pharmacy_id: int,
     product_id: int,
-    quantity: int,
+    quantity: int = Query(..., gt=0, description="Количество товара для перемещения в аптеку"),
     db: Session = Depends(get_db),
     current_user: User = Depends(check_director_permission)
 ):
@@ -176,6 +209,26 @@ def add_product_to_pharmacy(
     return {"detail": "Товар успешно добавлен в аптеку"}
 
 
+# Максимальное количество строк в одном пакетном перемещении
+MAX_TRANSFER_LINES = 10000
+
+
+@router.post("/pharmacy/transfer", response_model=TransferBatchResult)
+def transfer_products_to_pharmacies(
+    lines: List[TransferLine],
+    db: Session = Depends(get_db),
+    current_user: User = Depends(check_director_permission)
+):
+    """Переместить товары в аптеки одним запросом (только для директоров и администраторов)"""
+    if not lines:
+        raise HTTPException(status_code=400, detail="Список перемещений пуст")
+    if len(lines) > MAX_TRANSFER_LINES:
+        raise HTTPException(status_code=400, detail=f"Не более {MAX_TRANSFER_LINES} строк за один запрос")
+    results = product_service.transfer_products_batch(db, [line.dict() for line in lines])
+    transferred = sum(1 for r in results if r["status"] == "ok")
+    return {"transferred": transferred, "failed": len(results) - transferred, "results": results}
+
+
 @router.delete("/pharmacy/{pharmacy_id}/remove/{product_id}")
 def remove_product_from_pharmacy(
     pharmacy_id: int,
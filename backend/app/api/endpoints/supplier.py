@@ -1,11 +1,13 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
+from ...core.pagination import NEXT_CURSOR_HEADER, next_cursor
 from ...db.database import get_db
 from ...schemas.supplier import Supplier, SupplierCreate, SupplierUpdate
 from ...services import supplier as supplier_service
-from ..deps import check_admin_permission
+from ...services import versions as versions_service
+from ..deps import check_admin_permission, get_after_id, get_list_validators
 from ...db.models_auth import User
 
 router = APIRouter()
@@ -13,12 +15,22 @@ router = APIRouter()
 
 @router.get("/", response_model=List[Supplier])
 def read_suppliers(
+    request: Request,
+    response: Response,
     skip: int = Query(0, description="Количество записей для пропуска"),
     limit: int = Query(100, description="Максимальное количество записей для возврата"),
+    after_id: Optional[int] = Depends(get_after_id),
     db: Session = Depends(get_db)
 ):
     """Получить список всех поставщиков"""
-    suppliers = supplier_service.get_suppliers(db, skip=skip, limit=limit)
+    validators = get_list_validators(request, db, versions_service.SUPPLIERS)
+    if validators.is_fresh(request):
+        return validators.not_modified()
+    suppliers = supplier_service.get_suppliers(db, skip=skip, limit=limit, after_id=after_id)
+    response.headers.update(validators.headers)
+    cursor = next_cursor(suppliers, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return suppliers
 
 
@@ -93,10 +105,12 @@ def read_suppliers_by_product_name(
 @router.get("/product-dosage/{dosage}", response_model=List[Supplier])
 def read_suppliers_by_product_dosage(
     dosage: str,
+    skip: int = Query(0, description="Количество записей для пропуска"),
+    limit: int = Query(100, description="Максимальное количество записей для возврата"),
     db: Session = Depends(get_db)
 ):
     """Получить список поставщиков, у которых есть товар с заданной фасовкой"""
-    suppliers = supplier_service.get_suppliers_by_product_dosage(db, dosage=dosage)
+    suppliers = supplier_service.get_suppliers_by_product_dosage(db, dosage=dosage, skip=skip, limit=limit)
     return suppliers
 
 
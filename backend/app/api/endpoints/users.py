@@ -1,30 +1,36 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 
+from ...core.pagination import NEXT_CURSOR_HEADER, next_cursor
 from ...db.database import get_db
 from ...db.models_auth import User, UserRole
 from ...schemas.user import User as UserSchema, UserCreate, UserUpdate
 from ...services import user as user_service
-from ..deps import check_admin_permission
+from ..deps import check_admin_permission, get_after_id
 
 router = APIRouter()
 
 @router.get("/", response_model=List[UserSchema])
-async def read_users(
+def read_users(
+    response: Response,
     skip: int = Query(0, description="Количество записей для пропуска"),
     limit: int = Query(100, description="Максимальное количество записей для возврата"),
+    after_id: Optional[int] = Depends(get_after_id),
     db: Session = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
 ):
     """
     Получить список всех пользователей (только для администраторов)
     """
-    users = user_service.get_users(db, skip=skip, limit=limit)
+    users = user_service.get_users(db, skip=skip, limit=limit, after_id=after_id)
+    cursor = next_cursor(users, limit)
+    if cursor:
+        response.headers[NEXT_CURSOR_HEADER] = cursor
     return users
 
 @router.post("/", response_model=UserSchema)
-async def create_user(
+def create_user(
     user: UserCreate,
     db: Session = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
@@ -52,7 +58,7 @@ async def create_user(
     return user_service.create_user(db=db, user=user)
 
 @router.get("/{user_id}", response_model=UserSchema)
-async def read_user(
+def read_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
@@ -66,7 +72,7 @@ async def read_user(
     return db_user
 
 @router.put("/{user_id}", response_model=UserSchema)
-async def update_user(
+def update_user(
     user_id: int,
     user: UserUpdate,
     db: Session = Depends(get_db),
@@ -81,7 +87,7 @@ async def update_user(
     return db_user
 
 @router.delete("/{user_id}")
-async def delete_user(
+def delete_user(
     user_id: int,
     db: Session = Depends(get_db),
     current_user: User = Depends(check_admin_permission)
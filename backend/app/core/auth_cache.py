@@ -0,0 +1,110 @@
+"""
+Кэши аутентификации в памяти процесса.
+
+user_cache хранит облегчённые записи пользователей, token_cache — уже
+проверенные JWT. Кэш не разделяется между процессами, поэтому изменения,
+сделанные в другом процессе, становятся видны не позже чем через
+AUTH_CACHE_TTL_SECONDS.
+"""
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Hashable, Optional
+import threading
+import time
+
+from .config import settings
+from ..db.models_auth import UserRole
+
+
+@dataclass(frozen=True)
+class CachedUser:
+    """Облегчённая запись пользователя, не привязанная к сессии БД"""
+    id: int
+    email: str
+    username: str
+    role: UserRole
+    is_active: bool
+    supplier_id: Optional[int] = None
+
+    @classmethod
+    def from_orm(cls, user) -> "CachedUser":
+        return cls(
+            id=user.id,
+            email=user.email,
+            username=user.username,
+            role=user.role,
+            is_active=user.is_active,
+            supplier_id=user.supplier_id,
+        )
+
+
+class LRUCache:
+    """Потокобезопасный LRU-кэш с ограничением времени жизни записей"""
+
+    def __init__(self, maxsize: int, ttl: float):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key)
+            if item is None or item[1] <= now:
+                if item is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+
+    def set(self, key: Hashable, value: Any, ttl: Optional[float] = None) -> None:
+        if self.maxsize <= 0:
+            return
+        lifetime = self.ttl if ttl is None else min(ttl, self.ttl)
+        if lifetime <= 0:
+            return
+        with self._lock:
+            self._data[key] = (value, time.monotonic() + lifetime)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def delete(self, key: Hashable) -> None:
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / requests, 4) if requests else 0.0,
+            }
+
+
+# Пользователи по ID
+user_cache = LRUCache(settings.AUTH_USER_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+# Содержимое проверенных токенов по строке токена
+token_cache = LRUCache(settings.AUTH_TOKEN_CACHE_SIZE, settings.AUTH_CACHE_TTL_SECONDS)
+
+
+def invalidate_user(user_id: int) -> None:
+    """Удалить пользователя из кэша после изменения или удаления"""
+    user_cache.delete(user_id)
+
+
+def get_cache_stats() -> dict:
+    """Счётчики попаданий для кэшей аутентификации"""
+    return {"users": user_cache.stats(), "tokens": token_cache.stats()}
@@ -0,0 +1,72 @@
+"""
+Условные GET-запросы для списков (ETag, Last-Modified, 304 Not Modified).
+
+ETag списка вычисляется из версий наборов данных, от которых зависит ответ
+(app.services.versions), пути с параметрами запроса и области доступа
+пользователя. Версии читаются одним запросом к entity_versions, поэтому при
+совпадении If-None-Match обработчик отвечает 304, не обращаясь к таблицам
+каталога. Cache-Control: private, no-cache — браузер хранит ответ и
+перепроверяет его перед каждым использованием, так что fetch() во фронтенде
+получает тело из своего кэша без изменений в JS.
+
+Last-Modified отправляется для информации, но If-Modified-Since не
+проверяется: точность даты HTTP — секунда, и два изменения в одну секунду
+дали бы клиенту устаревший список с ответом 304. Кроме того, время
+последнего изменения не зависит от параметров запроса и области доступа.
+"""
+import hashlib
+from dataclasses import dataclass
+from datetime import datetime, timezone
+from email.utils import format_datetime
+from typing import Dict, Optional
+
+from fastapi import Request, Response
+
+ETAG_HEADER = "ETag"
+CACHE_CONTROL = "private, no-cache"
+
+
+def make_etag(*parts) -> str:
+    """Слабый ETag: тело ответа определяется данными, но не побайтно (сжатие, порядок ключей)"""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()[:20]
+    return f'W/"{digest}"'
+
+
+def _as_utc(value: datetime) -> datetime:
+    # Время без часового пояса считается UTC
+    return value.astimezone(timezone.utc) if value.tzinfo else value.replace(tzinfo=timezone.utc)
+
+
+@dataclass
+class Validators:
+    """Валидаторы ответа со списком"""
+    etag: str
+    last_modified: Optional[datetime] = None
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        headers = {ETAG_HEADER: self.etag, "Cache-Control": CACHE_CONTROL}
+        if self.last_modified is not None:
+            headers["Last-Modified"] = format_datetime(_as_utc(self.last_modified), usegmt=True)
+        return headers
+
+    def is_fresh(self, request: Request) -> bool:
+        """Совпадает ли копия клиента с текущей версией (только по If-None-Match)"""
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        if if_none_match.strip() == "*":
+            return True
+        # Слабое сравнение: префикс W/ не учитывается
+        tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+        return self.etag.removeprefix("W/") in tags
+
+    def not_modified(self) -> Response:
+        return Response(status_code=304, headers=self.headers)
+
+
+def list_validators(request: Request, versions: Dict[str, int], last_modified: Optional[datetime],
+                    scope: str = "") -> Validators:
+    """Валидаторы для списка по версиям наборов данных и параметрам запроса"""
+    state = ",".join(f"{entity}={version}" for entity, version in sorted(versions.items()))
+    return Validators(make_etag(request.url.path, request.url.query, scope, state), last_modified)
@@ -14,10 +14,65 @@ class Settings(BaseSettings):
     POSTGRES_HOST: str = os.getenv("POSTGRES_HOST", "db")
     POSTGRES_PORT: str = os.getenv("POSTGRES_PORT", "5432")
     POSTGRES_DB: str = os.getenv("POSTGRES_DB", "pharmacy_db")
+
+    # Настройки пула соединений с базой данных
+    DB_POOL_SIZE: int = 10
+    DB_MAX_OVERFLOW: int = 20
+    DB_POOL_TIMEOUT: float = 10.0  # секунд ожидания свободного соединения
+    DB_POOL_RECYCLE: int = 1800  # пересоздавать соединения старше 30 минут
+    DB_POOL_PRE_PING: bool = True
+    DB_STATEMENT_TIMEOUT_MS: int = 30000  # 0 — без ограничения
+    DB_POOL_WAIT_WARNING_MS: float = 100.0  # порог для предупреждения в логах
+    # Соединений на все процессы-воркеры вместе; 0 — у каждого процесса пул
+    # DB_POOL_SIZE + DB_MAX_OVERFLOW, иначе бюджет делится на WEB_CONCURRENCY
+    DB_POOL_BUDGET: int = 0
+
+    # Число процессов-воркеров gunicorn (gunicorn.conf.py); 0 — по числу ядер
+    WEB_CONCURRENCY: int = 0
     
+    # Подсчёт SQL-запросов по HTTP-запросам
+    SQL_STATS_ENABLED: bool = True
+    SQL_TIMING_HEADERS: bool = False  # заголовки Server-Timing и X-SQL-Queries, для разработки
+    SQL_REPEAT_WARNING: int = 10  # сколько повторов одного запроса считать проблемой N+1
+
+    # Проверять списки, отдаваемые в обход response_model, по схеме ответа (для разработки)
+    RESPONSE_VALIDATION: bool = False
+
+    # Метрики Prometheus на /metrics
+    METRICS_ENABLED: bool = True
+    # Каталог снимков метрик воркеров (задаёт gunicorn.conf.py); пусто — один процесс
+    METRICS_MULTIPROC_DIR: str = ""
+    METRICS_FLUSH_SECONDS: float = 5.0
+
+    # Сжатие ответов gzip; ответы меньше порога отправляются как есть
+    GZIP_MINIMUM_SIZE: int = 1024  # байт
+    GZIP_LEVEL: int = 6
+
+    # Адреса статики из манифеста сборки (python -m app.manage build-static);
+    # в разработке false — файлы отдаются как есть и изменения видны сразу
+    STATIC_BUILD_ENABLED: bool = True
+
+    # Перечитывать изменённые шаблоны страниц (для разработки); иначе страницы
+    # отрисовываются один раз при запуске
+    PAGES_RELOAD: bool = False
+
+    # Размер пула потоков для синхронных обработчиков и зависимостей
+    THREADPOOL_SIZE: int = 40
+
     # Настройки JWT
     SECRET_KEY: str = os.getenv("SECRET_KEY", "your-secret-key")
     ACCESS_TOKEN_EXPIRE_MINUTES: int = 60 * 24 * 7  # 7 дней
+
+    # Настройки кэша аутентификации
+    AUTH_CACHE_TTL_SECONDS: float = 60.0
+    AUTH_USER_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+
+    # Настройки хеширования паролей
+    PASSWORD_HASH_ROUNDS: int = 0  # 0 — подобрать стоимость bcrypt по целевому времени
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+    PASSWORD_HASH_MIN_ROUNDS: int = 10
+    PASSWORD_HASH_WORKERS: Optional[int] = None  # None — по числу ядер на воркер, 0 — без пула процессов
     
     # Настройки CORS
     BACKEND_CORS_ORIGINS: list = ["*"]
@@ -0,0 +1,264 @@
+"""
+Метрики приложения в текстовом формате Prometheus (/metrics).
+
+Счётчики и гистограммы хранятся в памяти процесса и обновляются под
+блокировкой за O(1) на запрос. Состояние пула соединений, пула потоков,
+кэшей аутентификации и SQL-статистика по маршрутам считываются в
+момент запроса /metrics. При нескольких воркерах gunicorn значения
+процессов объединяются через общий каталог (app/core/worker_stats.py).
+"""
+import abc
+import bisect
+import threading
+import time
+from typing import Callable, Dict, Iterable, List, Sequence, Tuple
+
+from anyio import to_thread
+
+from ..db.database import get_pool_status
+from .auth_cache import get_cache_stats
+from .sql_stats import get_route_stats, route_template
+
+CONTENT_TYPE = "text/plain; version=0.0.4"
+
+# Границы корзин гистограммы задержек, секунды
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+Sample = Tuple[str, Labels, float]
+# Семейство метрик: имя, тип, описание, образцы
+Family = Tuple[str, str, str, List[Sample]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels) + "}"
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Metric(abc.ABC):
+    type = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Labels:
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    @abc.abstractmethod
+    def samples(self) -> List[Sample]:
+        """Значения метрики: (имя, метки, значение)"""
+
+
+class Counter(Metric):
+    type = "counter"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: Dict[Labels, float] = {}
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def samples(self) -> List[Sample]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+    def dec(self, amount: float = 1, **labels) -> None:
+        self.inc(-amount, **labels)
+
+
+class Histogram(Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (), buckets=LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # Для каждого набора меток: счётчики по корзинам (+Inf последняя), сумма
+        self._values: Dict[Labels, Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels) -> None:
+        key = self._key(labels)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._values.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+
+    def samples(self) -> List[Sample]:
+        result = []
+        with self._lock:
+            items = sorted((key, (list(counts), total[0])) for key, (counts, total) in self._values.items())
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                result.append((f"{self.name}_bucket", key + (("le", _format_value(float(bound))),), cumulative))
+            result.append((f"{self.name}_sum", key, total))
+            result.append((f"{self.name}_count", key, cumulative))
+        return result
+
+
+class Registry:
+    def __init__(self):
+        self._metrics: List[Metric] = []
+        # Функции, которые в момент выгрузки возвращают (имя, тип, описание, образцы)
+        self._collectors: List[Callable[[], Iterable[Tuple[str, str, str, List[Sample]]]]] = []
+
+    def register(self, metric: Metric) -> Metric:
+        self._metrics.append(metric)
+        return metric
+
+    def register_collector(self, collector) -> None:
+        self._collectors.append(collector)
+
+    def collect(self) -> List[Family]:
+        families = [(m.name, m.type, m.documentation, m.samples()) for m in self._metrics]
+        for collector in self._collectors:
+            families.extend(collector())
+        return families
+
+    def render(self) -> str:
+        return format_families(self.collect())
+
+
+def format_families(families: Iterable[Family]) -> str:
+    """Семейства метрик в текстовом формате Prometheus"""
+    lines = []
+    for name, metric_type, documentation, samples in families:
+        lines.append(f"# HELP {name} {documentation}")
+        lines.append(f"# TYPE {name} {metric_type}")
+        for sample_name, labels, value in samples:
+            lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+http_requests = registry.register(Counter(
+    "http_requests_total", "Число HTTP-запросов", ("method", "route", "status")))
+http_request_duration = registry.register(Histogram(
+    "http_request_duration_seconds", "Время обработки HTTP-запросов", ("method", "route", "status")))
+http_requests_in_flight = registry.register(Gauge(
+    "http_requests_in_flight", "HTTP-запросы, обрабатываемые в данный момент"))
+
+
+def _gauge(name: str, documentation: str, samples: List[Sample]):
+    return name, "gauge", documentation, samples
+
+
+def _counter(name: str, documentation: str, samples: List[Sample]):
+    return name, "counter", documentation, samples
+
+
+def collect_db_pool():
+    pool = get_pool_status()
+    yield _gauge("db_pool_size", "Размер пула соединений", [("db_pool_size", (), pool["size"])])
+    yield _gauge("db_pool_max_overflow", "Допустимое число соединений сверх пула",
+                 [("db_pool_max_overflow", (), pool["max_overflow"])])
+    yield _gauge("db_pool_checked_out", "Соединения, выданные из пула",
+                 [("db_pool_checked_out", (), pool["checked_out"])])
+    yield _gauge("db_pool_overflow", "Открытые соединения сверх пула", [("db_pool_overflow", (), pool["overflow"])])
+    yield _counter("db_pool_checkouts_total", "Выдачи соединений из пула",
+                   [("db_pool_checkouts_total", (), pool["checkouts"])])
+    yield _counter("db_pool_timeouts_total", "Таймауты ожидания соединения",
+                   [("db_pool_timeouts_total", (), pool["timeouts"])])
+    yield _counter("db_pool_wait_seconds_total", "Суммарное ожидание соединений",
+                   [("db_pool_wait_seconds_total", (), pool["wait_total_ms"] / 1000)])
+
+
+def collect_threadpool():
+    try:
+        statistics = to_thread.current_default_thread_limiter().statistics()
+    except RuntimeError:
+        # Вне цикла событий лимитер недоступен
+        return
+    yield _gauge("threadpool_size", "Размер пула потоков для синхронных обработчиков",
+                 [("threadpool_size", (), statistics.total_tokens)])
+    yield _gauge("threadpool_busy", "Занятые потоки", [("threadpool_busy", (), statistics.borrowed_tokens)])
+    yield _gauge("threadpool_queue_depth", "Задачи, ожидающие свободного потока",
+                 [("threadpool_queue_depth", (), statistics.tasks_waiting)])
+
+
+def collect_auth_cache():
+    caches = get_cache_stats()
+    for metric, key, metric_type, documentation in (
+        ("auth_cache_hits_total", "hits", "counter", "Попадания в кэш аутентификации"),
+        ("auth_cache_misses_total", "misses", "counter", "Промахи кэша аутентификации"),
+        ("auth_cache_hit_ratio", "hit_rate", "gauge", "Доля попаданий в кэш аутентификации"),
+        ("auth_cache_entries", "size", "gauge", "Записей в кэше аутентификации"),
+    ):
+        samples = [(metric, (("cache", name),), stats[key]) for name, stats in sorted(caches.items())]
+        yield metric, metric_type, documentation, samples
+
+
+def collect_sql_stats():
+    average, maximum, repeated = [], [], []
+    for name, stats in get_route_stats().items():
+        method, _, route = name.partition(" ")
+        labels = (("method", method), ("route", route))
+        average.append(("db_statements_per_request_avg", labels, stats["statements_avg"]))
+        maximum.append(("db_statements_per_request_max", labels, stats["statements_max"]))
+        repeated.append(("db_repeated_statement_requests_total", labels, stats["repeated"]))
+    yield _gauge("db_statements_per_request_avg", "Среднее число SQL-запросов на HTTP-запрос", average)
+    yield _gauge("db_statements_per_request_max", "Наибольшее число SQL-запросов на HTTP-запрос", maximum)
+    yield _counter("db_repeated_statement_requests_total", "HTTP-запросы с повторяющимся SQL-запросом (N+1)",
+                   repeated)
+
+
+for _collector in (collect_db_pool, collect_threadpool, collect_auth_cache, collect_sql_stats):
+    registry.register_collector(_collector)
+
+
+def render_metrics() -> str:
+    return registry.render()
+
+
+class MetricsMiddleware:
+    """ASGI-middleware: число, длительность и количество одновременных HTTP-запросов"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_wrapper(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        http_requests_in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            elapsed = time.perf_counter() - started
+            http_requests_in_flight.dec()
+            labels = {"method": scope["method"], "route": route_template(scope), "status": status}
+            http_requests.inc(**labels)
+            http_request_duration.observe(elapsed, **labels)
@@ -0,0 +1,112 @@
+"""
+Страницы фронтенда, отрисованные заранее.
+
+HTML страниц зависит только от файла шаблона (и адресов статики), поэтому
+каждый шаблон отрисовывается один раз (PageCache.warm() при запуске
+приложения) и хранится в памяти вместе с ETag. Обработчик страницы не
+выполняет работы с шаблонами: он отдаёт готовые байты или 304, если у
+браузера та же версия. С PAGES_RELOAD (для разработки) Jinja проверяет
+время изменения файла, и изменённый шаблон отрисовывается заново при
+следующем запросе.
+
+Модуль не зависит от остального приложения (только jinja2 и fastapi):
+его используют и app/main.py, и frontend/routes.py, поэтому у страниц
+один путь отдачи.
+"""
+import hashlib
+from dataclasses import dataclass
+from typing import Callable, Dict, Optional, Tuple
+
+from fastapi import Request, Response
+from fastapi.responses import HTMLResponse
+from jinja2 import Environment, FileSystemLoader, Template
+
+# Браузер хранит страницу и перепроверяет её по ETag перед использованием
+CACHE_CONTROL = "no-cache"
+
+# Путь страницы: шаблон и постоянный контекст
+PAGES: Dict[str, Tuple[str, dict]] = {
+    "/": ("index.html", {}),
+    "/login": ("login.html", {}),
+    "/register": ("register.html", {}),
+    "/profile": ("profile.html", {}),
+    # Флаг отключает проверку прав доступа на странице
+    "/users": ("users.html", {"skip_auth_check": True}),
+    "/pharmacy": ("pharmacy.html", {}),
+    "/products": ("products.html", {}),
+    "/suppliers": ("suppliers.html", {}),
+    "/admin_pharmacies.html": ("admin_pharmacies.html", {}),
+}
+
+
+def make_etag(body: bytes) -> str:
+    """Слабый ETag страницы по её содержимому (ответ может быть сжат при отдаче)"""
+    return f'W/"{hashlib.sha1(body).hexdigest()[:20]}"'
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    # Слабое сравнение: префикс W/ не учитывается
+    return etag.removeprefix("W/") in {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+
+
+@dataclass(frozen=True)
+class Page:
+    body: bytes
+    etag: str
+    # Шаблон, из которого отрисована страница; Jinja заменяет его при изменении файла
+    template: Template
+
+
+class PageCache:
+    """Отрисованные страницы в памяти процесса"""
+
+    def __init__(self, directory: str, static_url: Optional[Callable[[str], str]] = None, reload: bool = False):
+        self.env = Environment(loader=FileSystemLoader(directory), autoescape=True, auto_reload=reload)
+        self.env.globals["static_url"] = static_url or (lambda path: f"/static/{path}")
+        self.reload = reload
+        self._pages: Dict[str, Page] = {}
+
+    def render(self, name: str, context: dict) -> Page:
+        template = self.env.get_template(name)
+        body = template.render(**context).encode()
+        return Page(body=body, etag=make_etag(body), template=template)
+
+    def get(self, name: str, context: dict) -> Page:
+        """Страница из кэша; без PAGES_RELOAD шаблон больше не читается"""
+        page = self._pages.get(name)
+        if page is None or (self.reload and self.env.get_template(name) is not page.template):
+            page = self._pages[name] = self.render(name, context)
+        return page
+
+    def response(self, request: Request, name: str, context: dict) -> Response:
+        page = self.get(name, context)
+        headers = {"ETag": page.etag, "Cache-Control": CACHE_CONTROL}
+        if _etag_matches(request, page.etag):
+            return Response(status_code=304, headers=headers)
+        return HTMLResponse(page.body, headers=headers)
+
+    def warm(self) -> None:
+        """Отрисовать все страницы заранее"""
+        for name, context in PAGES.values():
+            self.get(name, context)
+
+
+def _page_endpoint(cache: PageCache, name: str, context: dict):
+    # Асинхронный обработчик: готовая страница отдаётся без перехода в пул потоков
+    async def page(request: Request) -> Response:
+        return cache.response(request, name, context)
+    return page
+
+
+def add_page_routes(router, cache: PageCache) -> None:
+    """Зарегистрировать маршруты всех страниц (FastAPI или APIRouter)"""
+    for path, (name, context) in PAGES.items():
+        router.add_api_route(
+            path, _page_endpoint(cache, name, context),
+            methods=["GET"], response_class=HTMLResponse, name=name.rsplit(".", 1)[0],
+        )
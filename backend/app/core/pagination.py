@@ -0,0 +1,49 @@
+"""
+Курсорная (keyset) пагинация.
+
+Курсор — непрозрачная строка с ключом последней записи страницы. Следующая
+страница выбирается условием «id > ключа» по индексу первичного ключа,
+поэтому её стоимость не зависит от глубины, а вставки между запросами не
+приводят к пропускам и повторам записей.
+"""
+import base64
+import json
+from typing import Optional, Sequence
+
+# Заголовок ответа с курсором следующей страницы
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+
+def encode_cursor(last_id: int) -> str:
+    """Закодировать ключ последней записи в курсор"""
+    raw = json.dumps({"id": last_id}, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> int:
+    """Получить ключ из курсора; ValueError, если курсор некорректен"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        last_id = json.loads(base64.urlsafe_b64decode(padded.encode()))["id"]
+    except (ValueError, KeyError, TypeError) as e:
+        raise ValueError("Некорректный курсор") from e
+    if not isinstance(last_id, int):
+        raise ValueError("Некорректный курсор")
+    return last_id
+
+
+def next_cursor(items: Sequence, limit: int) -> Optional[str]:
+    """Курсор следующей страницы или None, если страница последняя"""
+    if not items or len(items) < limit:
+        return None
+    last = items[-1]
+    return encode_cursor(last["id"] if isinstance(last, dict) else last.id)
+
+
+def paginate(query, key, skip: int = 0, limit: int = 100, after_id: Optional[int] = None):
+    """Применить к запросу пагинацию: по курсору, если он задан, иначе по смещению.
+    В обоих случаях записи упорядочены по ключу, чтобы страницы были стабильными."""
+    query = query.order_by(key)
+    if after_id is not None:
+        return query.filter(key > after_id).limit(limit)
+    return query.offset(skip).limit(limit)
@@ -0,0 +1,22 @@
+"""
+Быстрые ответы для списков.
+
+Сервисы возвращают списки словарей, собранных прямо из строк результата
+запроса; они кодируются orjson без повторной проверки и сериализации
+через response_model. response_model у маршрута остаётся для
+документации OpenAPI, а соответствие схеме проверяется при
+RESPONSE_VALIDATION (в разработке) и в бенчмарке сериализации.
+"""
+from typing import List, Optional, Type
+
+from fastapi.responses import ORJSONResponse
+from pydantic import BaseModel, parse_obj_as
+
+from .config import settings
+
+
+def rows_response(rows: List[dict], model: Type[BaseModel], headers: Optional[dict] = None) -> ORJSONResponse:
+    """Ответ со списком строк, закодированным orjson"""
+    if settings.RESPONSE_VALIDATION:
+        parse_obj_as(List[model], rows)
+    return ORJSONResponse(rows, headers=headers)
@@ -1,19 +1,182 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime, timedelta
-from typing import Optional
+from functools import lru_cache
+from typing import List, Optional, Tuple
+import logging
+import math
+import multiprocessing
+import os
+import threading
+import time
 from jose import jwt
 from passlib.context import CryptContext
 from ..core.config import settings
 
-# Настройка контекста для хеширования паролей
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+logger = logging.getLogger(__name__)
+
+# Границы стоимости bcrypt, поддерживаемые passlib
+BCRYPT_MIN_ROUNDS = 4
+BCRYPT_MAX_ROUNDS = 31
+# Стоимость, на которой замеряется скорость хеширования при калибровке
+CALIBRATION_ROUNDS = 8
+
+_rounds: Optional[int] = None
+_executor: Optional[ProcessPoolExecutor] = None
+_lock = threading.Lock()
+
+# Процессы пула запускаются через forkserver (spawn, где его нет), а не fork:
+# они не наследуют потоки, блокировки и соединения процесса приложения
+_mp_context = multiprocessing.get_context(
+    "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+)
+if _mp_context.get_start_method() == "forkserver":
+    _mp_context.set_forkserver_preload([__name__])
+
+
+# Настройка контекста для хеширования паролей с заданной стоимостью.
+# Обновления требуют (needs_update) только хеши дешевле PASSWORD_HASH_MIN_ROUNDS:
+# стоимость сохранённого хеша может только повышаться, но не понижаться.
+@lru_cache(maxsize=None)
+def get_pwd_context(rounds: int) -> CryptContext:
+    return CryptContext(
+        schemes=["bcrypt"],
+        deprecated="auto",
+        bcrypt__default_rounds=rounds,
+        bcrypt__min_rounds=min(settings.PASSWORD_HASH_MIN_ROUNDS, rounds),
+    )
+
+
+def _calibrate_rounds(target_ms: float) -> int:
+    """Подобрать стоимость bcrypt так, чтобы хеширование занимало около target_ms"""
+    context = get_pwd_context(CALIBRATION_ROUNDS)
+    elapsed = min(_timed_hash(context) for _ in range(3))
+    # Каждый дополнительный раунд удваивает время хеширования
+    rounds = CALIBRATION_ROUNDS + round(math.log2(target_ms / max(elapsed * 1000, 0.001)))
+    return min(max(rounds, settings.PASSWORD_HASH_MIN_ROUNDS, BCRYPT_MIN_ROUNDS), BCRYPT_MAX_ROUNDS)
+
+
+def _timed_hash(context: CryptContext) -> float:
+    start = time.perf_counter()
+    context.hash("calibration-password")
+    return time.perf_counter() - start
+
+
+def get_hash_rounds() -> int:
+    """Текущая стоимость bcrypt (задана в настройках или подобрана по целевому времени).
+
+    Подбор выполняется один раз на процесс; в многопроцессном режиме его делает
+    главный процесс gunicorn до запуска воркеров (gunicorn.conf.py), чтобы все
+    воркеры хешировали с одной стоимостью."""
+    global _rounds
+    if _rounds is None:
+        with _lock:
+            if _rounds is None:
+                if settings.PASSWORD_HASH_ROUNDS:
+                    _rounds = settings.PASSWORD_HASH_ROUNDS
+                elif settings.WEB_CONCURRENCY > 1:
+                    # Каждый воркер подобрал бы свою стоимость под текущую нагрузку
+                    raise RuntimeError(
+                        "При WEB_CONCURRENCY > 1 задайте PASSWORD_HASH_ROUNDS или запускайте "
+                        "через gunicorn.conf.py, где стоимость подбирается до запуска воркеров"
+                    )
+                else:
+                    _rounds = _calibrate_rounds(settings.PASSWORD_HASH_TARGET_MS)
+                    logger.info(
+                        f"Стоимость bcrypt подобрана автоматически: {_rounds} "
+                        f"(цель {settings.PASSWORD_HASH_TARGET_MS} мс)"
+                    )
+    return _rounds
+
+
+def _get_executor() -> Optional[ProcessPoolExecutor]:
+    """Пул процессов для хеширования; None, если хеширование выполняется в текущем потоке"""
+    global _executor
+    workers = settings.PASSWORD_HASH_WORKERS
+    if workers is None:
+        # Ядра делятся между процессами-воркерами, у каждого из которых свой пул
+        workers = max((os.cpu_count() or 1) // max(settings.WEB_CONCURRENCY, 1), 1)
+    if workers <= 0:
+        return None
+    if _executor is None:
+        with _lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context)
+    return _executor
+
+
+def _run(fn, *args):
+    """Выполнить функцию в пуле процессов, а при его отсутствии или поломке — на месте"""
+    global _executor
+    executor = _get_executor()
+    if executor is None:
+        return fn(*args)
+    try:
+        return executor.submit(fn, *args).result()
+    except BrokenProcessPool:
+        logger.error("Пул процессов хеширования паролей завершился аварийно, он будет пересоздан")
+        with _lock:
+            if _executor is executor:
+                _executor = None
+        return fn(*args)
+
+
+def calibrate_before_fork() -> int:
+    """Подобрать стоимость bcrypt в главном процессе; воркеры наследуют её при fork"""
+    global _rounds
+    if not settings.PASSWORD_HASH_ROUNDS:
+        with _lock:
+            if _rounds is None:
+                _rounds = _calibrate_rounds(settings.PASSWORD_HASH_TARGET_MS)
+                logger.info(
+                    f"Стоимость bcrypt подобрана до запуска воркеров: {_rounds} "
+                    f"(цель {settings.PASSWORD_HASH_TARGET_MS} мс)"
+                )
+    return get_hash_rounds()
+
+
+def shutdown_password_hasher() -> None:
+    """Остановить пул процессов хеширования"""
+    global _executor
+    with _lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+
+# Функции, выполняемые в процессах пула
+def _hash_password(password: str, rounds: int) -> str:
+    return get_pwd_context(rounds).hash(password)
+
+
+def _hash_passwords(passwords: List[str], rounds: int) -> List[str]:
+    context = get_pwd_context(rounds)
+    return [context.hash(password) for password in passwords]
+
+
+def _verify_and_update(plain_password: str, hashed_password: str, rounds: int) -> Tuple[bool, Optional[str]]:
+    return get_pwd_context(rounds).verify_and_update(plain_password, hashed_password)
+
 
 # Функция для создания хеша пароля
 def get_password_hash(password: str) -> str:
-    return pwd_context.hash(password)
+    return _run(_hash_password, password, get_hash_rounds())
+
+# Функция для создания хешей нескольких паролей параллельно
+def get_password_hashes(passwords: List[str]) -> List[str]:
+    rounds = get_hash_rounds()
+    executor = _get_executor()
+    if executor is None or len(passwords) < 2:
+        return _hash_passwords(passwords, rounds)
+    return list(executor.map(_hash_password, passwords, [rounds] * len(passwords)))
 
 # Функция для проверки пароля
 def verify_password(plain_password: str, hashed_password: str) -> bool:
-    return pwd_context.verify(plain_password, hashed_password)
+    return verify_and_update_password(plain_password, hashed_password)[0]
+
+# Функция для проверки пароля с получением нового хеша, если стоимость устарела
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return _run(_verify_and_update, plain_password, hashed_password, get_hash_rounds())
 
 # Функция для создания JWT токена
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
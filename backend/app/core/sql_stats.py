@@ -0,0 +1,113 @@
+"""
+Статистика SQL-запросов по HTTP-запросам.
+
+SQLStatsMiddleware открывает для каждого запроса область подсчёта
+(app.db.instrumentation.count_queries), а после ответа добавляет её в
+накопительную статистику маршрута. Если один и тот же запрос выполнен
+больше SQL_REPEAT_WARNING раз, в лог пишется предупреждение о
+вероятной проблеме N+1. С SQL_TIMING_HEADERS в ответ добавляются
+заголовки Server-Timing и X-SQL-Queries (для разработки).
+"""
+import logging
+import threading
+from typing import Dict
+
+from ..db.instrumentation import QueryStats, count_queries
+
+logger = logging.getLogger(__name__)
+
+QUERIES_HEADER = "X-SQL-Queries"
+
+
+class RouteStats:
+    """Накопительная статистика SQL-запросов по маршрутам"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._routes: Dict[str, dict] = {}
+
+    def record(self, route: str, stats: QueryStats, repeated: bool) -> None:
+        with self._lock:
+            item = self._routes.get(route)
+            if item is None:
+                item = self._routes[route] = {
+                    "requests": 0, "statements": 0, "statements_max": 0,
+                    "db_seconds": 0.0, "db_seconds_max": 0.0, "repeated": 0,
+                }
+            item["requests"] += 1
+            item["statements"] += stats.statements
+            item["statements_max"] = max(item["statements_max"], stats.statements)
+            item["db_seconds"] += stats.seconds
+            item["db_seconds_max"] = max(item["db_seconds_max"], stats.seconds)
+            item["repeated"] += int(repeated)
+
+    def snapshot(self) -> Dict[str, dict]:
+        with self._lock:
+            return {
+                route: {
+                    "requests": item["requests"],
+                    "statements_avg": round(item["statements"] / item["requests"], 2),
+                    "statements_max": item["statements_max"],
+                    "db_ms_avg": round(item["db_seconds"] * 1000 / item["requests"], 3),
+                    "db_ms_max": round(item["db_seconds_max"] * 1000, 3),
+                    # Запросы, в которых обнаружено повторение одного SQL-запроса (N+1)
+                    "repeated": item["repeated"],
+                }
+                for route, item in sorted(self._routes.items())
+            }
+
+
+route_stats = RouteStats()
+
+
+def route_template(scope) -> str:
+    """Шаблон пути маршрута (например, /api/v1/products/{product_id}); для
+    запросов вне маршрутов API — unmatched, чтобы не плодить метки"""
+    return getattr(scope.get("route"), "path", None) or "unmatched"
+
+
+def route_name(scope) -> str:
+    return f"{scope['method']} {route_template(scope)}"
+
+
+def get_route_stats() -> Dict[str, dict]:
+    return route_stats.snapshot()
+
+
+class SQLStatsMiddleware:
+    """ASGI-middleware подсчёта SQL-запросов для каждого HTTP-запроса"""
+
+    def __init__(self, app, timing_headers: bool = False, repeat_warning: int = 10):
+        self.app = app
+        self.timing_headers = timing_headers
+        self.repeat_warning = repeat_warning
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with count_queries() as stats:
+            async def send_wrapper(message):
+                if self.timing_headers and message["type"] == "http.response.start":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"server-timing", f"db;dur={stats.seconds * 1000:.1f}".encode()))
+                    headers.append((QUERIES_HEADER.lower().encode(), str(stats.statements).encode()))
+                    message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_wrapper)
+            finally:
+                self._finish(scope, stats)
+
+    def _finish(self, scope, stats: QueryStats) -> None:
+        route = route_name(scope)
+        repeated = stats.max_repeats > self.repeat_warning
+        if repeated:
+            statement, count = stats.shapes.most_common(1)[0]
+            logger.warning(
+                "%s: SQL-запрос выполнен %s раз (всего запросов %s), возможна проблема N+1: %s",
+                route, count, stats.statements, " ".join(statement.split())[:300]
+            )
+        route_stats.record(route, stats, repeated)
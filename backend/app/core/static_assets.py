@@ -0,0 +1,172 @@
+"""
+Статические файлы: сборка с хешем в имени, предварительное сжатие и
+раздача с долгим кэшированием.
+
+    python -m app.manage build-static
+
+копирует файлы каталога статики в <static>/build, добавляя к имени начало
+SHA-256 содержимого (css/styles.css -> css/styles.1a2b3c4d5e6f.css), и
+сохраняет рядом сжатые копии .gz и, если установлен пакет brotli, .br.
+manifest.json сопоставляет исходные пути с собранными. Шаблоны получают
+адреса через static_url(): изменённый файл получает новый URL, поэтому
+собранные файлы кэшируются браузером на год (immutable) и при повторной
+загрузке страницы не запрашиваются. Без сборки static_url() возвращает
+обычные адреса /static/..., которые браузер перепроверяет по ETag.
+"""
+import gzip
+import hashlib
+import json
+import logging
+import mimetypes
+import os
+import shutil
+from pathlib import Path
+from typing import Callable, Dict, List, Set, Tuple
+
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+from starlette.types import Scope
+
+try:
+    import brotli
+except ImportError:  # без brotli собираются только копии .gz
+    brotli = None
+
+logger = logging.getLogger(__name__)
+
+BUILD_DIR = "build"
+MANIFEST_NAME = "manifest.json"
+HASH_LENGTH = 12
+# Текстовые файлы, для которых имеет смысл сжатие
+COMPRESSIBLE_SUFFIXES = {".css", ".js", ".json", ".svg", ".html", ".txt", ".map"}
+# Кодировки в порядке предпочтения и расширения их копий
+ENCODINGS = (("br", ".br"), ("gzip", ".gz"))
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+
+def find_static_dir() -> str:
+    """Каталог статики: в контейнере /app/static, при локальном запуске ../frontend/static"""
+    return "/app/static" if os.path.exists("/app/static") else "../frontend/static"
+
+
+def hashed_name(path: Path, content: bytes) -> str:
+    digest = hashlib.sha256(content).hexdigest()[:HASH_LENGTH]
+    return f"{path.stem}.{digest}{path.suffix}"
+
+
+def _write_compressed(target: Path, content: bytes) -> None:
+    # Копия сохраняется, только если она меньше исходного файла
+    variants = [(".gz", gzip.compress(content, compresslevel=9, mtime=0))]
+    if brotli is not None:
+        variants.append((".br", brotli.compress(content, quality=11)))
+    for suffix, compressed in variants:
+        if len(compressed) < len(content):
+            target.with_name(target.name + suffix).write_bytes(compressed)
+
+
+def build_static(static_dir: str) -> Dict[str, str]:
+    """Собрать статику в <static_dir>/build; возвращает манифест"""
+    source = Path(static_dir)
+    output = source / BUILD_DIR
+    if output.exists():
+        shutil.rmtree(output)
+    manifest = {}
+    for path in sorted(source.rglob("*")):
+        relative = path.relative_to(source)
+        if not path.is_file() or relative.parts[0] == BUILD_DIR or relative.name.startswith("."):
+            continue
+        content = path.read_bytes()
+        built = relative.with_name(hashed_name(relative, content))
+        target = output / built
+        target.parent.mkdir(parents=True, exist_ok=True)
+        target.write_bytes(content)
+        if path.suffix in COMPRESSIBLE_SUFFIXES:
+            _write_compressed(target, content)
+        manifest[relative.as_posix()] = built.as_posix()
+    (output / MANIFEST_NAME).write_text(json.dumps(manifest, indent=2, sort_keys=True))
+    logger.info("Собрано статических файлов: %s (brotli: %s)", len(manifest), "да" if brotli else "нет")
+    return manifest
+
+
+def load_manifest(static_dir: str) -> Dict[str, str]:
+    """Манифест сборки или пустой словарь, если статика не собрана"""
+    path = Path(static_dir) / BUILD_DIR / MANIFEST_NAME
+    if not path.exists():
+        return {}
+    return json.loads(path.read_text())
+
+
+def make_static_url(manifest: Dict[str, str], prefix: str = "/static") -> Callable[[str], str]:
+    """Функция для шаблонов: адрес собранного файла, если он есть в манифесте"""
+    def static_url(path: str) -> str:
+        built = manifest.get(path)
+        if built is not None:
+            return f"{prefix}/{BUILD_DIR}/{built}"
+        return f"{prefix}/{path}"
+    return static_url
+
+
+def _accepted_encodings(header: str) -> Set[str]:
+    accepted = set()
+    for item in header.split(","):
+        name, _, params = item.partition(";")
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) == 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip().lower())
+    return accepted
+
+
+class StaticAssets(StaticFiles):
+    """StaticFiles с заранее сжатыми копиями файлов и заголовками кэширования"""
+
+    async def get_response(self, path: str, scope: Scope) -> Response:
+        response = await super().get_response(path, scope)
+        if path.split(os.sep, 1)[0] == BUILD_DIR:
+            response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            response.headers["Cache-Control"] = REVALIDATE_CACHE_CONTROL
+        return response
+
+    def _compressed_variants(self, full_path: str) -> List[Tuple[str, str, os.stat_result]]:
+        variants = []
+        if os.path.splitext(full_path)[1] in COMPRESSIBLE_SUFFIXES:
+            for encoding, suffix in ENCODINGS:
+                try:
+                    variants.append((encoding, full_path + suffix, os.stat(full_path + suffix)))
+                except FileNotFoundError:
+                    continue
+        return variants
+
+    def file_response(self, full_path, stat_result: os.stat_result, scope: Scope, status_code: int = 200) -> Response:
+        full_path = os.fspath(full_path)
+        request_headers = Headers(scope=scope)
+        variants = self._compressed_variants(full_path)
+        accepted = _accepted_encodings(request_headers.get("accept-encoding", ""))
+        variant = next((item for item in variants if item[0] in accepted), None)
+        if variant is None:
+            response = super().file_response(full_path, stat_result, scope, status_code)
+            if variants:
+                # Клиенту, принимающему сжатие, отдаётся другая копия
+                response.headers.add_vary_header("Accept-Encoding")
+            return response
+
+        encoding, variant_path, variant_stat = variant
+        response = FileResponse(
+            variant_path,
+            status_code=status_code,
+            stat_result=variant_stat,
+            method=scope["method"],
+            media_type=mimetypes.guess_type(full_path)[0] or "application/octet-stream",
+            headers={"Content-Encoding": encoding, "Vary": "Accept-Encoding"},
+        )
+        if self.is_not_modified(response.headers, request_headers):
+            return NotModifiedResponse(response.headers)
+        return response
@@ -0,0 +1,159 @@
+"""
+Метрики и статистика нескольких процессов-воркеров.
+
+Счётчики в app/core/metrics.py, SQL-статистика, пул соединений и кэши
+аутентификации хранятся в памяти процесса, а запрос к /metrics или
+/health/* при нескольких воркерах gunicorn попадает в случайный из них.
+Поэтому в многопроцессном режиме (gunicorn.conf.py задаёт
+METRICS_MULTIPROC_DIR) каждый воркер раз в METRICS_FLUSH_SECONDS и при
+каждом таком запросе записывает снимок своих значений в файл
+worker-<pid>.json общего каталога, а отвечающий воркер объединяет
+снимки всех процессов:
+
+- счётчики и гистограммы суммируются, включая завершившиеся воркеры
+  (их значения главный процесс переносит в dead.json), поэтому счётчики
+  между опросами не уменьшаются;
+- мгновенные значения (gauge) отдаются по живым воркерам с меткой worker;
+- /health/* возвращают значения по воркерам: {"<pid>": {...}}.
+
+Значения других воркеров отстают не более чем на METRICS_FLUSH_SECONDS.
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Callable, Dict, Iterable, List, Tuple
+
+from ..db.database import get_pool_status
+from .auth_cache import get_cache_stats
+from .config import settings
+from .metrics import Family, format_families, registry
+from .sql_stats import get_route_stats
+
+logger = logging.getLogger(__name__)
+
+WORKER_PREFIX = "worker-"
+DEAD_FILE = "dead.json"
+# Типы метрик, значения которых суммируются по процессам
+CUMULATIVE_TYPES = ("counter", "histogram")
+
+# Статистика для /health/*: ключ снимка и функция, возвращающая значения процесса
+HEALTH_SOURCES: Dict[str, Callable[[], dict]] = {
+    "db_pool": get_pool_status,
+    "sql_stats": get_route_stats,
+    "auth_cache": get_cache_stats,
+}
+
+
+def enabled() -> bool:
+    return bool(settings.METRICS_MULTIPROC_DIR)
+
+
+def _path(name: str) -> str:
+    return os.path.join(settings.METRICS_MULTIPROC_DIR, name)
+
+
+def _write_json(path: str, data) -> None:
+    # Запись через временный файл: читающий процесс не увидит файл наполовину
+    temporary = f"{path}.{os.getpid()}.tmp"
+    with open(temporary, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    os.replace(temporary, path)
+
+
+def _read_json(path: str):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+    except ValueError:
+        logger.warning("Повреждённый снимок метрик %s пропущен", path)
+        return None
+
+
+def write_snapshot() -> None:
+    """Записать снимок метрик и статистики текущего процесса"""
+    _write_json(_path(f"{WORKER_PREFIX}{os.getpid()}.json"), {
+        "families": registry.collect(),
+        "health": {key: source() for key, source in HEALTH_SOURCES.items()},
+    })
+
+
+def _worker_snapshots() -> List[Tuple[str, dict]]:
+    result = []
+    for name in sorted(os.listdir(settings.METRICS_MULTIPROC_DIR)):
+        if name.startswith(WORKER_PREFIX) and name.endswith(".json"):
+            snapshot = _read_json(_path(name))
+            if snapshot is not None:
+                result.append((name[len(WORKER_PREFIX):-len(".json")], snapshot))
+    return result
+
+
+def _merge(families: Iterable[Family], into: Dict[str, dict], worker: str = "") -> None:
+    """Добавить семейства к объединённым: накопительные суммируются, gauge получают метку worker"""
+    for name, metric_type, documentation, samples in families:
+        family = into.setdefault(name, {"type": metric_type, "documentation": documentation, "samples": {}})
+        for sample_name, labels, value in samples:
+            labels = tuple(tuple(pair) for pair in labels)
+            if metric_type not in CUMULATIVE_TYPES:
+                labels += (("worker", worker),)
+            key = (sample_name, labels)
+            family["samples"][key] = family["samples"].get(key, 0) + value
+
+
+def _to_families(merged: Dict[str, dict]) -> List[Family]:
+    return [
+        (name, family["type"], family["documentation"],
+         [(sample_name, labels, value) for (sample_name, labels), value in sorted(family["samples"].items())])
+        for name, family in merged.items()
+    ]
+
+
+def render_metrics() -> str:
+    """Метрики всех воркеров в текстовом формате Prometheus"""
+    write_snapshot()
+    merged: Dict[str, dict] = {}
+    dead = _read_json(_path(DEAD_FILE))
+    if dead is not None:
+        _merge(dead, merged)
+    for worker, snapshot in _worker_snapshots():
+        _merge(snapshot["families"], merged, worker)
+    return format_families(_to_families(merged))
+
+
+def worker_health(key: str) -> Dict[str, dict]:
+    """Статистика /health/* по живым воркерам"""
+    write_snapshot()
+    return {worker: snapshot["health"][key] for worker, snapshot in _worker_snapshots()}
+
+
+def mark_process_dead(pid: int) -> None:
+    """Перенести накопительные метрики завершившегося воркера в dead.json.
+    Вызывается только главным процессом gunicorn (child_exit)."""
+    snapshot = _read_json(_path(f"{WORKER_PREFIX}{pid}.json"))
+    if snapshot is None:
+        return
+    merged: Dict[str, dict] = {}
+    _merge(_read_json(_path(DEAD_FILE)) or [], merged)
+    _merge((family for family in snapshot["families"] if family[1] in CUMULATIVE_TYPES), merged)
+    _write_json(_path(DEAD_FILE), _to_families(merged))
+    os.remove(_path(f"{WORKER_PREFIX}{pid}.json"))
+
+
+def clear() -> None:
+    """Удалить снимки предыдущего запуска (главный процесс, до запуска воркеров)"""
+    os.makedirs(settings.METRICS_MULTIPROC_DIR, exist_ok=True)
+    for name in os.listdir(settings.METRICS_MULTIPROC_DIR):
+        if name.endswith(".json") or name.endswith(".tmp"):
+            os.remove(_path(name))
+
+
+async def flush_periodically() -> None:
+    """Записывать снимок раз в METRICS_FLUSH_SECONDS, пока работает воркер"""
+    while True:
+        await asyncio.sleep(settings.METRICS_FLUSH_SECONDS)
+        try:
+            write_snapshot()
+        except OSError as e:
+            logger.warning(f"Не удалось записать снимок метрик: {e}")
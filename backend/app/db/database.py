@@ -1,13 +1,115 @@
-from sqlalchemy import create_engine
+import logging
+import threading
+import time
+from typing import Tuple
+
+from sqlalchemy import create_engine, exc
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import QueuePool
 from ..core.config import settings
+from . import instrumentation
+
+logger = logging.getLogger(__name__)
 
 # Создание URL для подключения к базе данных
 SQLALCHEMY_DATABASE_URL = f"postgresql://{settings.POSTGRES_USER}:{settings.POSTGRES_PASSWORD}@{settings.POSTGRES_HOST}:{settings.POSTGRES_PORT}/{settings.POSTGRES_DB}"
 
+
+class PoolStats:
+    """Накопительная статистика ожидания соединений из пула"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.timeouts = 0
+        self.total_wait = 0.0
+        self.max_wait = 0.0
+
+    def record(self, wait: float, timed_out: bool = False) -> None:
+        with self._lock:
+            if timed_out:
+                self.timeouts += 1
+            else:
+                self.checkouts += 1
+            self.total_wait += wait
+            if wait > self.max_wait:
+                self.max_wait = wait
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            attempts = self.checkouts + self.timeouts
+            return {
+                "checkouts": self.checkouts,
+                "timeouts": self.timeouts,
+                "wait_total_ms": round(self.total_wait * 1000, 3),
+                "wait_avg_ms": round(self.total_wait * 1000 / attempts, 3) if attempts else 0.0,
+                "wait_max_ms": round(self.max_wait * 1000, 3),
+            }
+
+
+pool_stats = PoolStats()
+
+
+class InstrumentedQueuePool(QueuePool):
+    """QueuePool, который измеряет время получения соединения"""
+
+    def connect(self):
+        start = time.perf_counter()
+        try:
+            connection = super().connect()
+        except exc.TimeoutError:
+            pool_stats.record(time.perf_counter() - start, timed_out=True)
+            logger.error(
+                "Пул соединений исчерпан: size=%s, overflow=%s, checked_out=%s",
+                self.size(), self.overflow(), self.checkedout()
+            )
+            raise
+        wait = time.perf_counter() - start
+        pool_stats.record(wait)
+        if wait * 1000 > settings.DB_POOL_WAIT_WARNING_MS:
+            logger.warning(
+                "Ожидание соединения из пула заняло %.1f мс (checked_out=%s, overflow=%s)",
+                wait * 1000, self.checkedout(), self.overflow()
+            )
+        return connection
+
+
+def _connect_args() -> dict:
+    """Параметры подключения, передаваемые драйверу psycopg2"""
+    if settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        return {"options": f"-c statement_timeout={settings.DB_STATEMENT_TIMEOUT_MS}"}
+    return {}
+
+
+def _pool_sizes() -> Tuple[int, int]:
+    """Размер пула и допустимое превышение для одного процесса.
+    При нескольких воркерах общий бюджет DB_POOL_BUDGET делится между ними,
+    чтобы их пулы вместе не превысили max_connections базы данных"""
+    if settings.DB_POOL_BUDGET <= 0:
+        return settings.DB_POOL_SIZE, settings.DB_MAX_OVERFLOW
+    per_worker = max(settings.DB_POOL_BUDGET // max(settings.WEB_CONCURRENCY, 1), 1)
+    pool_size = min(settings.DB_POOL_SIZE, per_worker)
+    return pool_size, per_worker - pool_size
+
+
+POOL_SIZE, MAX_OVERFLOW = _pool_sizes()
+
 # Создание движка SQLAlchemy
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
+engine = create_engine(
+    SQLALCHEMY_DATABASE_URL,
+    poolclass=InstrumentedQueuePool,
+    pool_size=POOL_SIZE,
+    max_overflow=MAX_OVERFLOW,
+    pool_timeout=settings.DB_POOL_TIMEOUT,
+    pool_recycle=settings.DB_POOL_RECYCLE,
+    pool_pre_ping=settings.DB_POOL_PRE_PING,
+    connect_args=_connect_args(),
+)
+
+# Подсчёт SQL-запросов для статистики по HTTP-запросам
+if settings.SQL_STATS_ENABLED:
+    instrumentation.install(engine)
 
 # Создание сессии базы данных
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -22,3 +124,16 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+def get_pool_status() -> dict:
+    """Текущее состояние пула соединений и статистика ожидания"""
+    pool = engine.pool
+    return {
+        "size": pool.size(),
+        "max_overflow": MAX_OVERFLOW,
+        "checked_in": pool.checkedin(),
+        "checked_out": pool.checkedout(),
+        "overflow": max(pool.overflow(), 0),
+        **pool_stats.snapshot(),
+    }
@@ -0,0 +1,179 @@
+"""
+Проверка планов запросов сервисного слоя.
+
+Вызывает функции из app/services на данных текущей базы, перехватывает
+выполненные SQL-запросы и для каждого выполняет EXPLAIN с теми же
+параметрами. Если в плане встречается последовательное сканирование
+таблицы, в которой не меньше --min-rows строк, проверка завершается с
+ошибкой. Все изменения, сделанные сервисами, откатываются.
+
+Запуск (на базе с реалистичным объёмом данных):
+    python -m app.db.explain_check --min-rows 10000
+"""
+import argparse
+import json
+import sys
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+
+from . import models_auth  # noqa: F401 — регистрирует модель User
+from .database import engine
+from ..services import pharmacy as pharmacy_service
+from ..services import product as product_service
+from ..services import supplier as supplier_service
+from ..services import user as user_service
+
+# Запросы, для которых план не строится
+SKIPPED_PREFIXES = ("SAVEPOINT", "RELEASE", "ROLLBACK", "CREATE", "DROP", "EXPLAIN", "SET", "SHOW")
+
+
+@dataclass
+class SampleIds:
+    product_id: int
+    pharmacy_id: int
+    supplier_id: int
+    user_id: int
+    user_email: str
+    director: object = None
+
+
+@dataclass
+class Violation:
+    scenario: str
+    relation: str
+    rows: int
+    statement: str
+
+
+@dataclass
+class CapturedStatements:
+    items: List[Tuple[str, object]] = field(default_factory=list)
+
+    def __call__(self, conn, cursor, statement, parameters, context, executemany):
+        if not executemany and not statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+            self.items.append((statement, parameters))
+
+
+def _scenarios(ids: SampleIds) -> List[Tuple[str, Callable[[Session], object]]]:
+    return [
+        ("product.get_product", lambda db: product_service.get_product(db, ids.product_id)),
+        ("product.get_products (after_id)", lambda db: product_service.get_products(db, after_id=ids.product_id)),
+        ("product.get_products_with_supplier", lambda db: product_service.get_products_with_supplier(db)),
+        ("product.get_products_with_supplier (supplier)",
+         lambda db: product_service.get_products_with_supplier(db, supplier_id=ids.supplier_id)),
+        ("product.get_products_by_pharmacy", lambda db: product_service.get_products_by_pharmacy(db, ids.pharmacy_id)),
+        ("product.get_products_by_supplier", lambda db: product_service.get_products_by_supplier(db, ids.supplier_id)),
+        ("product.get_products_by_dosage", lambda db: product_service.get_products_by_dosage(db, "explain-check")),
+        ("product.get_expired_products (pharmacy)",
+         lambda db: product_service.get_expired_products(db, pharmacy_id=ids.pharmacy_id)),
+        ("product.get_total_products_cost (pharmacy)",
+         lambda db: product_service.get_total_products_cost(db, pharmacy_id=ids.pharmacy_id)),
+        ("product.add_product_to_pharmacy",
+         lambda db: product_service.add_product_to_pharmacy(db, ids.product_id, ids.pharmacy_id, 1)),
+        ("product.transfer_products_batch",
+         lambda db: product_service.transfer_products_batch(
+             db, [{"pharmacy_id": ids.pharmacy_id, "product_id": ids.product_id, "quantity": 1}])),
+        ("product.delete_product_from_pharmacy",
+         lambda db: product_service.delete_product_from_pharmacy(db, ids.pharmacy_id, ids.product_id)),
+        ("pharmacy.get_pharmacy", lambda db: pharmacy_service.get_pharmacy(db, ids.pharmacy_id)),
+        ("pharmacy.get_pharmacies (director)",
+         lambda db: pharmacy_service.get_pharmacies(db, current_user=ids.director)),
+        ("supplier.get_supplier", lambda db: supplier_service.get_supplier(db, ids.supplier_id)),
+        ("supplier.get_suppliers_by_product", lambda db: supplier_service.get_suppliers_by_product(db, ids.product_id)),
+        ("supplier.get_suppliers_by_product_dosage",
+         lambda db: supplier_service.get_suppliers_by_product_dosage(db, "explain-check")),
+        ("user.get_user", lambda db: user_service.get_user(db, ids.user_id)),
+        ("user.get_user_by_email", lambda db: user_service.get_user_by_email(db, ids.user_email)),
+    ]
+
+
+def _sample_ids(connection) -> SampleIds:
+    row = connection.execute(text("""
+        SELECT (SELECT product_id FROM pharmacy_product LIMIT 1) AS product_id,
+               COALESCE((SELECT pharmacy_id FROM pharmacy_product LIMIT 1),
+                        (SELECT id FROM pharmacies LIMIT 1)) AS pharmacy_id,
+               (SELECT id FROM suppliers LIMIT 1) AS supplier_id,
+               (SELECT id FROM users WHERE role = 'DIRECTOR' LIMIT 1) AS director_id,
+               (SELECT id FROM users LIMIT 1) AS user_id,
+               (SELECT email FROM users LIMIT 1) AS user_email
+    """)).one()
+    if None in (row.product_id, row.pharmacy_id, row.supplier_id, row.user_id):
+        raise SystemExit("В базе нет данных для проверки: заполните её (например, генератором данных)")
+    director = models_auth.User(id=row.director_id or row.user_id, role=models_auth.UserRole.DIRECTOR)
+    return SampleIds(row.product_id, row.pharmacy_id, row.supplier_id, row.user_id, row.user_email, director)
+
+
+def _table_sizes(connection) -> Dict[str, int]:
+    rows = connection.execute(text("""
+        SELECT c.relname, c.reltuples::bigint AS rows
+        FROM pg_class c JOIN pg_namespace n ON n.oid = c.relnamespace
+        WHERE c.relkind = 'r' AND n.nspname = current_schema()
+    """))
+    return {row.relname: row.rows for row in rows}
+
+
+def _seq_scans(plan: dict) -> List[str]:
+    found = []
+    if plan.get("Node Type") == "Seq Scan":
+        found.append(plan["Relation Name"])
+    for child in plan.get("Plans", []):
+        found.extend(_seq_scans(child))
+    return found
+
+
+def check(min_rows: int) -> List[Violation]:
+    violations = []
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            sizes = _table_sizes(connection)
+            ids = _sample_ids(connection)
+            # Коммиты сервисов превращаются в точки сохранения внешней транзакции
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            for name, scenario in _scenarios(ids):
+                captured = CapturedStatements()
+                event.listen(engine, "before_cursor_execute", captured)
+                try:
+                    scenario(db)
+                finally:
+                    event.remove(engine, "before_cursor_execute", captured)
+                cursor = connection.connection.cursor()
+                try:
+                    for statement, parameters in captured.items:
+                        cursor.execute("SAVEPOINT explain_check")
+                        cursor.execute("EXPLAIN (FORMAT JSON) " + statement, parameters)
+                        plan = cursor.fetchone()[0]
+                        cursor.execute("ROLLBACK TO SAVEPOINT explain_check")
+                        if isinstance(plan, str):
+                            plan = json.loads(plan)
+                        for relation in _seq_scans(plan[0]["Plan"]):
+                            if sizes.get(relation, 0) >= min_rows:
+                                violations.append(Violation(name, relation, sizes[relation], " ".join(statement.split())))
+                finally:
+                    cursor.close()
+            db.close()
+        finally:
+            transaction.rollback()
+    return violations
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--min-rows", type=int, default=10000,
+                        help="таблицы с таким числом строк и больше считаются большими")
+    args = parser.parse_args()
+    violations = check(args.min_rows)
+    for v in violations:
+        print(f"[{v.scenario}] Seq Scan по {v.relation} (~{v.rows} строк):\n    {v.statement[:300]}")
+    if violations:
+        print(f"\nНайдено последовательных сканирований больших таблиц: {len(violations)}")
+        return 1
+    print("Последовательных сканирований больших таблиц не найдено")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
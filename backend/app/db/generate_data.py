@@ -0,0 +1,207 @@
+"""
+Генератор синтетических данных для проверки производительности на
+реалистичном объёме: тысячи аптек, сотни тысяч товаров и остатков.
+
+Данные строятся на основе тестовых структур из init_db (наименования,
+фасовки и цены товаров, названия аптек и поставщиков) и полностью
+определяются параметрами и зерном генератора: при одинаковых --seed и
+--today получается один и тот же набор. Строки загружаются командой COPY.
+
+Запуск:
+    python -m app.manage generate --scale large
+    python -m app.manage generate --reset --pharmacies 2000 --products 300000
+"""
+import csv
+import io
+import json
+import logging
+import random
+import time
+from dataclasses import asdict, dataclass
+from datetime import date, datetime, timedelta
+from typing import Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+
+from ..services import versions
+from .init_db import INITIAL_PHARMACIES, INITIAL_PRODUCTS, SEED_PASSWORD_HASHES, SUPPLIER_USERS, init_db
+
+logger = logging.getLogger(__name__)
+
+COPY_BATCH_SIZE = 50000
+# Сколько аптек приходится на одного сгенерированного директора
+PHARMACIES_PER_DIRECTOR = 5
+# Сгенерированные пользователи отличаются от тестовых префиксом email
+USER_PREFIX = "gen-"
+
+DOSAGES = sorted(
+    {dosage for product in INITIAL_PRODUCTS for dosage in product["dosages"]} | {"5 мг", "25 мг", "125 мг", "2 г"}
+)
+
+SCALES = {
+    "small": {"pharmacies": 50, "suppliers": 20, "products": 5000, "stock_per_pharmacy": 50, "suppliers_per_product": 2},
+    "medium": {"pharmacies": 500, "suppliers": 100, "products": 50000, "stock_per_pharmacy": 100, "suppliers_per_product": 2},
+    "large": {"pharmacies": 2000, "suppliers": 500, "products": 200000, "stock_per_pharmacy": 150, "suppliers_per_product": 3},
+}
+
+
+@dataclass
+class GeneratorParams:
+    pharmacies: int
+    suppliers: int
+    products: int
+    stock_per_pharmacy: int
+    suppliers_per_product: int
+    seed: int = 42
+    today: Optional[date] = None
+
+
+def _reserve_ids(connection, table: str, count: int) -> List[int]:
+    """Получить идентификаторы из последовательности таблицы заранее,
+    чтобы связи можно было загрузить тем же COPY"""
+    return connection.execute(
+        text("SELECT nextval(pg_get_serial_sequence(:table, 'id')) FROM generate_series(1, :count)"),
+        {"table": table, "count": count}
+    ).scalars().all()
+
+
+def _copy(cursor, table: str, columns: str, rows: Iterable[tuple]) -> int:
+    """Загрузить строки в таблицу пачками по COPY_BATCH_SIZE"""
+    total = 0
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    pending = 0
+
+    def flush() -> None:
+        buffer.seek(0)
+        cursor.copy_expert(f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)", buffer)
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= COPY_BATCH_SIZE:
+            flush()
+            total += pending
+            pending = 0
+    if pending:
+        flush()
+        total += pending
+    return total
+
+
+def reset(db: Session) -> None:
+    """Удалить все данные и заново заполнить базу тестовыми данными"""
+    # entity_versions не очищается: ETag, выданные до сброса, не должны совпасть с новыми
+    db.execute(text("""
+        TRUNCATE pharmacy_product, supplier_product, pharmacy_stock_value,
+                 products, pharmacies, suppliers, users
+        RESTART IDENTITY CASCADE
+    """))
+    init_db(db)
+
+
+def generate(db: Session, params: GeneratorParams) -> dict:
+    """Сгенерировать и загрузить набор данных; возвращает число строк по таблицам"""
+    started = time.perf_counter()
+    rng = random.Random(params.seed)
+    today = datetime.combine(params.today or date.today(), datetime.min.time())
+    connection = db.connection()
+    counts = {}
+
+    directors = max(1, -(-params.pharmacies // PHARMACIES_PER_DIRECTOR))
+    director_ids = _reserve_ids(connection, "users", directors)
+    supplier_user_ids = _reserve_ids(connection, "users", params.suppliers)
+    supplier_ids = _reserve_ids(connection, "suppliers", params.suppliers)
+    pharmacy_ids = _reserve_ids(connection, "pharmacies", params.pharmacies)
+    product_ids = _reserve_ids(connection, "products", params.products)
+
+    cursor = connection.connection.cursor()
+    try:
+        # Пользователи: директора аптек и пользователи-поставщики
+        users = [
+            (user_id, f"{USER_PREFIX}director{user_id}@pharmacy.com", f"{USER_PREFIX}director{user_id}",
+             SEED_PASSWORD_HASHES["director123"], "DIRECTOR", True)
+            for user_id in director_ids
+        ] + [
+            (user_id, f"{USER_PREFIX}supplier{user_id}@pharmacy.com", f"{USER_PREFIX}supplier{user_id}",
+             SEED_PASSWORD_HASHES["supplier123"], "SUPPLIER", True)
+            for user_id in supplier_user_ids
+        ]
+        counts["users"] = _copy(cursor, "users", "id, email, username, hashed_password, role, is_active", users)
+
+        counts["suppliers"] = _copy(cursor, "suppliers", "id, name, user_id", (
+            (supplier_id, f"{rng.choice(SUPPLIER_USERS)['supplier_name']} {supplier_id}", user_id)
+            for supplier_id, user_id in zip(supplier_ids, supplier_user_ids)
+        ))
+
+        pharmacy_name = INITIAL_PHARMACIES[0]["name"].rstrip("0123456789")
+        counts["pharmacies"] = _copy(cursor, "pharmacies", "id, name, current_date, director_id", (
+            (pharmacy_id, f"{pharmacy_name}{pharmacy_id}", today.isoformat(), director_ids[idx // PHARMACIES_PER_DIRECTOR])
+            for idx, pharmacy_id in enumerate(pharmacy_ids)
+        ))
+
+        # Товары: вариации тестовых товаров; около 10% уже просрочены
+        prices = []
+        products = []
+        for product_id in product_ids:
+            base = rng.choice(INITIAL_PRODUCTS)
+            price = round(base["price"] * rng.uniform(0.5, 2.0), 2)
+            prices.append(price)
+            products.append((
+                product_id,
+                f"{base['name']} {product_id}",
+                json.dumps(rng.sample(DOSAGES, rng.randint(1, 3)), ensure_ascii=False),
+                price,
+                rng.randint(0, base["quantity"] * 2),
+                (today + timedelta(days=rng.randint(-120, 1095))).isoformat(),
+                rng.choice(supplier_ids),
+            ))
+        counts["products"] = _copy(
+            cursor, "products", "id, name, dosages, price, quantity, expiry_date, preferred_supplier_id", products
+        )
+
+        # Ассортимент поставщиков: предпочтительный поставщик и ещё несколько
+        def supplier_links():
+            per_product = min(params.suppliers_per_product, len(supplier_ids))
+            for product_id, product in zip(product_ids, products):
+                linked = [product[6]] + [s for s in rng.sample(supplier_ids, per_product) if s != product[6]]
+                for preference, supplier_id in enumerate(linked[:per_product], start=1):
+                    yield supplier_id, product_id, rng.randint(0, 5000), min(preference, 3)
+
+        counts["supplier_product"] = _copy(
+            cursor, "supplier_product", "supplier_id, product_id, quantity, preference", supplier_links()
+        )
+
+        # Остатки в аптеках; стоимость остатков считается сразу же
+        stock_values = {}
+
+        def stock_rows():
+            per_pharmacy = min(params.stock_per_pharmacy, len(product_ids))
+            for pharmacy_id in pharmacy_ids:
+                total = 0.0
+                for idx in rng.sample(range(len(product_ids)), per_pharmacy):
+                    quantity = rng.randint(1, 200)
+                    total += prices[idx] * quantity
+                    yield pharmacy_id, product_ids[idx], quantity
+                stock_values[pharmacy_id] = total
+
+        counts["pharmacy_product"] = _copy(cursor, "pharmacy_product", "pharmacy_id, product_id, quantity", stock_rows())
+        counts["pharmacy_stock_value"] = _copy(
+            cursor, "pharmacy_stock_value", "pharmacy_id, total_cost", stock_values.items()
+        )
+    finally:
+        cursor.close()
+
+    versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS, versions.PHARMACIES, versions.SUPPLIERS)
+    db.commit()
+    for table in counts:
+        db.execute(text(f"ANALYZE {table}"))
+    db.commit()
+
+    seconds = time.perf_counter() - started
+    rows = sum(counts.values())
+    logger.info(f"Загружено {rows} строк за {seconds:.1f} с ({rows / seconds:.0f} строк/с): {counts}")
+    return {"counts": counts, "seconds": round(seconds, 3), "params": asdict(params)}
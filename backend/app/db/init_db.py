@@ -1,12 +1,12 @@
 import logging
-from sqlalchemy.ext.asyncio import AsyncSession
-from app.db.database import get_db
-from app.db.models import Base, Pharmacy, Product, Supplier
+from sqlalchemy import delete, exists, insert, select
+from sqlalchemy.orm import Session
+from app.db.database import SessionLocal
+from app.db.models import Pharmacy, Product, Supplier, pharmacy_product, pharmacy_stock_value, supplier_product
 from app.db.models_auth import User, UserRole
-from app.core.config import settings
-from app.core.security import get_password_hash
+from app.core.security import get_password_hashes
+from app.services import versions
 from datetime import datetime, timedelta
-import asyncio
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
@@ -18,6 +18,24 @@ INITIAL_PHARMACIES = [
     {"name": "Аптека №3", "current_date": datetime.now()}
 ]
 
+ADMIN_EMAIL = "admin@pharmacy.com"
+
+INITIAL_USERS = [
+    {"email": ADMIN_EMAIL, "username": "admin", "password": "admin123", "role": UserRole.ADMIN},
+    {"email": "director@pharmacy.com", "username": "director", "password": "director123", "role": UserRole.DIRECTOR},
+    {"email": "director2@pharmacy.com", "username": "director2", "password": "director2", "role": UserRole.DIRECTOR},
+]
+
+# Заранее вычисленные bcrypt-хеши паролей тестовых пользователей: заполнение
+# базы не тратит секунды процессора на хеширование. Если число раундов
+# отличается от текущей настройки, хеш обновится при первом входе.
+SEED_PASSWORD_HASHES = {
+    "admin123": "$2b$12$bwwnRGaVdDXH3R8l5NXOK.zUfDr.T5Yy3Ut7W8GYZBbPrxyjmixbO",
+    "director123": "$2b$12$RJZBLWol2D3s9GBKgmtAn.dBMjQFur0qwcnxOUrhmG1CbyraImkzO",
+    "director2": "$2b$12$i7RQe3OkXgTiiY26oFGnXOAEZUhCodIoPdhRFubFANqN5WKi.GH92",
+    "supplier123": "$2b$12$uMX2gffdPO5B6Cv/Y7f3EOhfoholKVECPLdH80pQm41LycpUZJj2W",
+}
+
 # Динамически формируемых поставщиков больше нет — они создаются на основе пользователей с ролью SUPPLIER
 
 SUPPLIER_USERS = [
@@ -91,132 +109,111 @@ INITIAL_PRODUCTS = [
 ]
 
 
-def init_db(db) -> None:
+def is_seeded(db: Session) -> bool:
+    """Есть ли в базе администратор и хотя бы одна аптека (два EXISTS без чтения строк)"""
+    return db.execute(
+        select(
+            exists().where(User.email == ADMIN_EMAIL)
+            & exists().where(Pharmacy.id.isnot(None))
+        )
+    ).scalar()
+
+
+def _password_hashes(passwords) -> dict:
+    # Хеши, которых нет среди заранее вычисленных, считаются одним пакетом
+    missing = sorted(set(passwords) - SEED_PASSWORD_HASHES.keys())
+    return {**SEED_PASSWORD_HASHES, **dict(zip(missing, get_password_hashes(missing)))}
+
+
+def init_db(db: Session) -> None:
     """
     Инициализация базы данных тестовыми данными
     """
     logger.info("Инициализация базы данных...")
-    
-    # --- Создание пользователей (с проверкой на существование) ---
-    admin_user = db.query(User).filter(User.email == "admin@pharmacy.com").first()
-    if not admin_user:
-        admin_user = User(
-            email="admin@pharmacy.com",
-            username="admin",
-            hashed_password=get_password_hash("admin123"),
-            role=UserRole.ADMIN,
-            is_active=True
-        )
-        db.add(admin_user)
-    director1_user = db.query(User).filter(User.email == "director@pharmacy.com").first()
-    if not director1_user:
-        director1_user = User(
-            email="director@pharmacy.com",
-            username="director",
-            hashed_password=get_password_hash("director123"),
-            role=UserRole.DIRECTOR,
-            is_active=True
-        )
-        db.add(director1_user)
-    director2_user = db.query(User).filter(User.email == "director2@pharmacy.com").first()
-    if not director2_user:
-        director2_user = User(
-            email="director2@pharmacy.com",
-            username="director2",
-            hashed_password=get_password_hash("director2"),
-            role=UserRole.DIRECTOR,
-            is_active=True
-        )
-        db.add(director2_user)
-    
-    db.commit()
 
-    # Получаем id директоров
-    director1 = db.query(User).filter(User.email == "director@pharmacy.com").first()
-    director2 = db.query(User).filter(User.email == "director2@pharmacy.com").first()
-    director1_id = director1.id if director1 else 1
-    director2_id = director2.id if director2 else 2
-
-    # --- Создание аптек ---
-    db.query(Pharmacy).delete()  # очистка аптек для повторной инициализации
-    for idx, pharmacy_data in enumerate(INITIAL_PHARMACIES):
-        if idx < 2:
-            director_id = director2_id
-        else:
-            director_id = director1_id
-        pharmacy = Pharmacy(
-            name=pharmacy_data["name"],
-            current_date=pharmacy_data["current_date"],
-            director_id=director_id
-        )
-        db.add(pharmacy)
-    db.commit()
-
-    # --- Создание пользователей-поставщиков и Supplier ---
-    db.query(Supplier).delete()  # очистка поставщиков
-    supplier_email_to_id = {}
-    for supplier_user_info in SUPPLIER_USERS:
-        # Создаем пользователя с ролью SUPPLIER, если не существует
-        user = db.query(User).filter(User.email == supplier_user_info["email"]).first()
-        if not user:
-            user = User(
-                email=supplier_user_info["email"],
-                username=supplier_user_info["username"],
-                hashed_password=get_password_hash(supplier_user_info["password"]),
-                role=UserRole.SUPPLIER,
-                is_active=True
-            )
-            db.add(user)
-            db.commit()
-            db.refresh(user)
-        # Создаем Supplier, связанного с этим пользователем
-        supplier = db.query(Supplier).filter(Supplier.user_id == user.id).first()
-        if not supplier:
-            supplier = Supplier(
-                name=supplier_user_info["supplier_name"],
-                user_id=user.id
-            )
-            db.add(supplier)
-            db.commit()
-            db.refresh(supplier)
-        supplier_email_to_id[supplier_user_info["email"]] = supplier.id
-
-    # --- Создание продуктов ---
-    db.query(Product).delete()  # очистка продуктов для повторной инициализации
-    # Привязываем товары к поставщикам по индексу (или по заранее заданному правилу)
+    # --- Пользователи: создаются только отсутствующие ---
+    users = INITIAL_USERS + [
+        {"email": info["email"], "username": info["username"], "password": info["password"], "role": UserRole.SUPPLIER}
+        for info in SUPPLIER_USERS
+    ]
+    existing = set(db.execute(select(User.email).where(User.email.in_([u["email"] for u in users]))).scalars())
+    new_users = [u for u in users if u["email"] not in existing]
+    if new_users:
+        hashes = _password_hashes(u["password"] for u in new_users)
+        db.execute(insert(User), [
+            {
+                "email": u["email"],
+                "username": u["username"],
+                "hashed_password": hashes[u["password"]],
+                "role": u["role"],
+                "is_active": True,
+            }
+            for u in new_users
+        ])
+    user_ids = dict(db.execute(select(User.email, User.id).where(User.email.in_([u["email"] for u in users]))).all())
+
+    # --- Очистка данных для повторной инициализации ---
+    db.execute(delete(pharmacy_product))
+    db.execute(delete(pharmacy_stock_value))
+    db.execute(delete(supplier_product))
+    db.execute(delete(Product))
+    db.execute(delete(Pharmacy))
+    db.execute(delete(Supplier))
+
+    # --- Аптеки: первые две — второму директору, остальные — первому ---
+    director1_id = user_ids["director@pharmacy.com"]
+    director2_id = user_ids["director2@pharmacy.com"]
+    pharmacy_ids = db.execute(insert(Pharmacy).returning(Pharmacy.id), [
+        {
+            "name": pharmacy_data["name"],
+            "current_date": pharmacy_data["current_date"],
+            "director_id": director2_id if idx < 2 else director1_id,
+        }
+        for idx, pharmacy_data in enumerate(INITIAL_PHARMACIES)
+    ]).scalars().all()
+    db.execute(insert(pharmacy_stock_value), [{"pharmacy_id": pid, "total_cost": 0} for pid in pharmacy_ids])
+
+    # --- Поставщики, связанные с пользователями-поставщиками ---
+    # Порядок строк RETURNING при пакетной вставке не гарантирован — сопоставляем по пользователю
+    supplier_ids_by_user = dict(db.execute(insert(Supplier).returning(Supplier.user_id, Supplier.id), [
+        {"name": info["supplier_name"], "user_id": user_ids[info["email"]]}
+        for info in SUPPLIER_USERS
+    ]).all())
+    supplier_ids = [supplier_ids_by_user[user_ids[info["email"]]] for info in SUPPLIER_USERS]
+
+    # --- Товары ---
     # Привязка товаров к поставщикам: первые 2 — первому, следующие 2 — второму, следующие 2 — третьему, последние 2 — пятому
     supplier_assignment = [0,0,1,1,2,2,4,4]  # индексы SUPPLIER_USERS для каждого товара
+    products = []
     for idx, product_data in enumerate(INITIAL_PRODUCTS):
         supplier_idx = supplier_assignment[idx] if idx < len(supplier_assignment) else idx % len(SUPPLIER_USERS)
-        supplier_email = SUPPLIER_USERS[supplier_idx]["email"]
-        supplier_id = supplier_email_to_id[supplier_email]
         dosages = product_data.get("dosages")
         if not dosages or not isinstance(dosages, list):
             dosages = ["100 мг"]
-        product = Product(
-            name=product_data["name"],
-            dosages=dosages,
-            price=product_data["price"],
-            quantity=product_data["quantity"],
-            expiry_date=product_data["expiry_date"],
-            preferred_supplier_id=supplier_id
-        )
-        db.add(product)
+        products.append({
+            "name": product_data["name"],
+            "dosages": dosages,
+            "price": product_data["price"],
+            "quantity": product_data["quantity"],
+            "expiry_date": product_data["expiry_date"],
+            "preferred_supplier_id": supplier_ids[supplier_idx],
+        })
+    db.execute(insert(Product), products)
+    versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS, versions.PHARMACIES, versions.SUPPLIERS)
     db.commit()
 
     logger.info("База данных успешно инициализирована тестовыми пользователями, аптеками, поставщиками и продуктами.")
-    
 
 
-async def main() -> None:
+def main() -> None:
     """
     Основная функция для запуска инициализации базы данных
     """
     logger.info("Создание начальных данных")
-    async for db in get_db():
-        await init_db(db)
+    with SessionLocal() as db:
+        init_db(db)
     logger.info("Начальные данные созданы")
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
+    main()
@@ -0,0 +1,89 @@
+"""
+Подсчёт SQL-запросов.
+
+Обработчики событий движка записывают каждый выполненный запрос в
+статистику, активную в текущем контексте (contextvars), поэтому
+счётчики разных потоков и запросов не смешиваются. Области подсчёта
+могут быть вложенными: запрос учитывается во всех открытых областях,
+поэтому подсчёт вокруг HTTP-запроса работает и при SQLStatsMiddleware:
+
+    install(engine)
+    with count_queries() as stats:
+        product_service.get_products_by_dosage(db, "10 мг")
+    print(stats.statements, stats.rows, stats.seconds)
+"""
+import time
+from collections import Counter
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Iterator, Optional, Tuple
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# Служебные команды транзакций не считаются запросами
+SKIPPED_PREFIXES = ("SAVEPOINT", "RELEASE", "ROLLBACK", "COMMIT", "BEGIN")
+
+
+@dataclass
+class QueryStats:
+    statements: int = 0
+    # Строки, возвращённые или изменённые запросами (по cursor.rowcount)
+    rows: int = 0
+    seconds: float = 0.0
+    # Сколько раз выполнялся каждый текст запроса
+    shapes: Counter = field(default_factory=Counter)
+
+    def record(self, statement: str, rows: int, seconds: float, executions: int = 1) -> None:
+        self.statements += executions
+        self.rows += max(rows, 0)
+        self.seconds += seconds
+        self.shapes[statement] += executions
+
+    @property
+    def max_repeats(self) -> int:
+        """Наибольшее число повторов одного и того же запроса"""
+        return max(self.shapes.values(), default=0)
+
+
+# Открытые области подсчёта, от внешней к внутренней
+_current_stats: ContextVar[Tuple[QueryStats, ...]] = ContextVar("query_stats", default=())
+
+
+def current_stats() -> Optional[QueryStats]:
+    scopes = _current_stats.get()
+    return scopes[-1] if scopes else None
+
+
+@contextmanager
+def count_queries() -> Iterator[QueryStats]:
+    """Считать запросы, выполненные внутри блока"""
+    stats = QueryStats()
+    token = _current_stats.set(_current_stats.get() + (stats,))
+    try:
+        yield stats
+    finally:
+        _current_stats.reset(token)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info["query_started_at"] = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started_at = conn.info.pop("query_started_at", None)
+    scopes = _current_stats.get()
+    if not scopes or started_at is None or statement.lstrip().upper().startswith(SKIPPED_PREFIXES):
+        return
+    executions = len(parameters) if executemany and parameters else 1
+    seconds = time.perf_counter() - started_at
+    for stats in scopes:
+        stats.record(statement, cursor.rowcount, seconds, executions)
+
+
+def install(engine: Engine) -> None:
+    """Подключить подсчёт к движку (повторный вызов ничего не меняет)"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,195 @@
+"""
+Версионные миграции схемы базы данных.
+
+Применённые версии хранятся в таблице schema_migrations. Миграции
+выполняются по порядку под advisory-блокировкой, поэтому несколько
+процессов могут запускать их одновременно. Индексы на существующих
+таблицах создаются CREATE INDEX CONCURRENTLY вне транзакции и не
+блокируют запись в работающей базе.
+
+Запуск:
+    python -m app.db.migrations           # применить новые миграции
+    python -m app.db.migrations status    # показать состояние
+"""
+import logging
+import sys
+from dataclasses import dataclass
+from typing import Callable, List, Sequence, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from . import models_auth  # noqa: F401 — регистрирует таблицу users в метаданных
+from .models import Base
+
+logger = logging.getLogger(__name__)
+
+# Ключ advisory-блокировки, под которой выполняются миграции
+MIGRATIONS_LOCK_KEY = 7312001
+
+
+@dataclass
+class Migration:
+    version: int
+    description: str
+    # Транзакционные миграции получают соединение внутри транзакции,
+    # нетранзакционные — соединение в режиме AUTOCOMMIT (для CONCURRENTLY)
+    upgrade: Callable[[Connection], None]
+    transactional: bool = True
+
+
+def create_index_concurrently(connection: Connection, name: str, definition: str) -> None:
+    """Создать индекс без блокировки записи. Недостроенный индекс,
+    оставшийся после прерванной попытки, удаляется и строится заново."""
+    invalid = connection.execute(
+        text("""
+            SELECT NOT i.indisvalid FROM pg_index i
+            JOIN pg_class c ON c.oid = i.indexrelid
+            WHERE c.relname = :name
+        """),
+        {"name": name}
+    ).scalar()
+    if invalid:
+        connection.execute(text(f"DROP INDEX CONCURRENTLY IF EXISTS {name}"))
+    connection.execute(text(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} ON {definition}"))
+
+
+def _indexes(*indexes: Tuple[str, str]) -> Callable[[Connection], None]:
+    def upgrade(connection: Connection) -> None:
+        for name, definition in indexes:
+            create_index_concurrently(connection, name, definition)
+    return upgrade
+
+
+def _statements(*statements: str) -> Callable[[Connection], None]:
+    def upgrade(connection: Connection) -> None:
+        for statement in statements:
+            connection.execute(text(statement))
+    return upgrade
+
+
+def _create_tables(connection: Connection) -> None:
+    # Создаёт недостающие таблицы; существующие таблицы не изменяются
+    Base.metadata.create_all(bind=connection)
+
+
+MIGRATIONS: Sequence[Migration] = [
+    Migration(1, "Базовая схема", _create_tables),
+    Migration(2, "Фасовки товаров в JSONB", _statements("""
+        DO $$
+        BEGIN
+            IF (SELECT data_type FROM information_schema.columns
+                WHERE table_name = 'products' AND column_name = 'dosages') = 'json' THEN
+                ALTER TABLE products ALTER COLUMN dosages TYPE jsonb USING dosages::jsonb;
+            END IF;
+        END $$
+    """)),
+    Migration(3, "GIN-индекс по фасовкам", _indexes(
+        ("ix_products_dosages", "products USING gin (dosages jsonb_path_ops)"),
+    ), transactional=False),
+    Migration(4, "Начальная стоимость товаров в аптеках", _statements("""
+        INSERT INTO pharmacy_stock_value (pharmacy_id, total_cost)
+        SELECT ph.id, COALESCE(SUM(p.price * pp.quantity), 0)
+        FROM pharmacies ph
+        LEFT JOIN pharmacy_product pp ON pp.pharmacy_id = ph.id
+        LEFT JOIN products p ON p.id = pp.product_id
+        GROUP BY ph.id
+        ON CONFLICT (pharmacy_id) DO NOTHING
+    """)),
+    Migration(5, "Индексы для соединений и фильтров", _indexes(
+        ("ix_pharmacy_product_product_id", "pharmacy_product (product_id)"),
+        ("ix_supplier_product_product_id", "supplier_product (product_id)"),
+        ("ix_products_preferred_supplier_id", "products (preferred_supplier_id)"),
+        ("ix_products_expiry_date", "products (expiry_date)"),
+        ("ix_pharmacies_director_id", "pharmacies (director_id)"),
+    ), transactional=False),
+    Migration(6, "Версии наборов данных для ETag", _create_tables),
+    # Накопленная в double precision стоимость расходится с суммой остатков
+    # из-за ошибок округления, поэтому после смены типа она пересчитывается
+    Migration(7, "Стоимость товаров аптек в numeric", _statements(
+        "ALTER TABLE pharmacy_stock_value ALTER COLUMN total_cost TYPE numeric(14, 2)",
+        """
+        UPDATE pharmacy_stock_value v
+        SET total_cost = COALESCE((
+            SELECT SUM(p.price::numeric * pp.quantity)
+            FROM pharmacy_product pp
+            JOIN products p ON p.id = pp.product_id
+            WHERE pp.pharmacy_id = v.pharmacy_id
+        ), 0)
+        """,
+    )),
+]
+
+
+def _ensure_table(connection: Connection) -> None:
+    connection.execute(text("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version integer PRIMARY KEY,
+            description text NOT NULL,
+            applied_at timestamp NOT NULL DEFAULT now()
+        )
+    """))
+
+
+def get_applied_versions(connection: Connection) -> List[int]:
+    _ensure_table(connection)
+    return list(connection.execute(text("SELECT version FROM schema_migrations ORDER BY version")).scalars())
+
+
+def upgrade(engine: Engine) -> List[int]:
+    """Применить все ещё не применённые миграции; возвращает их версии"""
+    applied_now = []
+    with engine.connect() as lock_connection:
+        lock_connection = lock_connection.execution_options(isolation_level="AUTOCOMMIT")
+        lock_connection.execute(text("SELECT pg_advisory_lock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+        try:
+            applied = set(get_applied_versions(lock_connection))
+            for migration in MIGRATIONS:
+                if migration.version in applied:
+                    continue
+                logger.info(f"Применение миграции {migration.version}: {migration.description}")
+                if migration.transactional:
+                    with engine.begin() as connection:
+                        migration.upgrade(connection)
+                        _record(connection, migration)
+                else:
+                    with engine.connect() as connection:
+                        connection = connection.execution_options(isolation_level="AUTOCOMMIT")
+                        migration.upgrade(connection)
+                        _record(connection, migration)
+                applied_now.append(migration.version)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": MIGRATIONS_LOCK_KEY})
+    if applied_now:
+        logger.info(f"Применены миграции: {applied_now}")
+    else:
+        logger.info("Схема базы данных актуальна")
+    return applied_now
+
+
+def _record(connection: Connection, migration: Migration) -> None:
+    connection.execute(
+        text("INSERT INTO schema_migrations (version, description) VALUES (:version, :description)"),
+        {"version": migration.version, "description": migration.description}
+    )
+
+
+def status(engine: Engine) -> List[Tuple[int, str, bool]]:
+    """Список миграций с признаком применения"""
+    with engine.begin() as connection:
+        applied = set(get_applied_versions(connection))
+    return [(m.version, m.description, m.version in applied) for m in MIGRATIONS]
+
+
+if __name__ == "__main__":
+    from .database import engine
+
+    logging.basicConfig(level=logging.INFO)
+    command = sys.argv[1] if len(sys.argv) > 1 else "upgrade"
+    if command == "status":
+        for version, description, is_applied in status(engine):
+            print(f"{version:>4}  {'+' if is_applied else ' '}  {description}")
+    elif command == "upgrade":
+        upgrade(engine)
+    else:
+        sys.exit(f"Неизвестная команда: {command}. Доступны: upgrade, status")
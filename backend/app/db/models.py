@@ -1,4 +1,5 @@
-from sqlalchemy import Column, Integer, String, Float, ForeignKey, Table, DateTime, JSON, ARRAY
+from sqlalchemy import BigInteger, Column, Integer, String, Float, Numeric, ForeignKey, Table, DateTime, JSON, ARRAY, Index, func
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import relationship
 import datetime
@@ -10,7 +11,7 @@ pharmacy_product = Table(
     'pharmacy_product',
     Base.metadata,
     Column('pharmacy_id', Integer, ForeignKey('pharmacies.id'), primary_key=True),
-    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
+    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True, index=True),
     Column('quantity', Integer, default=0),
 )
 
@@ -19,11 +20,29 @@ supplier_product = Table(
     'supplier_product',
     Base.metadata,
     Column('supplier_id', Integer, ForeignKey('suppliers.id'), primary_key=True),
-    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True),
+    Column('product_id', Integer, ForeignKey('products.id'), primary_key=True, index=True),
     Column('quantity', Integer, default=0),
     Column('preference', Integer, default=1),  # Предпочтение поставщика (1, 2 или 3)
 )
 
+# Накопленная стоимость товаров в аптеке, обновляется сервисами при изменении остатков и цен
+pharmacy_stock_value = Table(
+    'pharmacy_stock_value',
+    Base.metadata,
+    Column('pharmacy_id', Integer, ForeignKey('pharmacies.id', ondelete="CASCADE"), primary_key=True),
+    Column('total_cost', Numeric(14, 2), nullable=False, default=0),
+)
+
+# Версии наборов данных (товары, аптеки, поставщики, остатки аптеки): увеличиваются
+# сервисами при каждом изменении и служат основой ETag для списков
+entity_versions = Table(
+    'entity_versions',
+    Base.metadata,
+    Column('entity', String, primary_key=True),
+    Column('version', BigInteger, nullable=False, default=1),
+    Column('updated_at', DateTime(timezone=True), nullable=False, server_default=func.now()),
+)
+
 
 class Pharmacy(Base):
     __tablename__ = 'pharmacies'
@@ -31,7 +50,7 @@ class Pharmacy(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
     current_date = Column(DateTime, default=datetime.datetime.now)
-    director_id = Column(Integer, ForeignKey('users.id'), nullable=True)
+    director_id = Column(Integer, ForeignKey('users.id'), nullable=True, index=True)
     
     # Отношения
     products = relationship("Product", secondary=pharmacy_product, back_populates="pharmacies")
@@ -43,17 +62,21 @@ class Product(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, index=True)
-    dosages = Column(JSON)  # Массив фасовок
+    dosages = Column(JSONB)  # Массив фасовок, индексируется GIN для поиска по фасовке
     price = Column(Float)
     quantity = Column(Integer, default=0)
-    expiry_date = Column(DateTime)
-    preferred_supplier_id = Column(Integer, ForeignKey('suppliers.id'), nullable=True)
+    expiry_date = Column(DateTime, index=True)
+    preferred_supplier_id = Column(Integer, ForeignKey('suppliers.id'), nullable=True, index=True)
     
     # Отношения
     pharmacies = relationship("Pharmacy", secondary=pharmacy_product, back_populates="products")
     suppliers = relationship("Supplier", secondary=supplier_product, back_populates="products")
     preferred_supplier = relationship("Supplier", foreign_keys=[preferred_supplier_id])
 
+    __table_args__ = (
+        Index("ix_products_dosages", "dosages", postgresql_using="gin", postgresql_ops={"dosages": "jsonb_path_ops"}),
+    )
+
 
 class Supplier(Base):
     __tablename__ = 'suppliers'
@@ -1,26 +1,32 @@
-from fastapi import FastAPI, Request
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.templating import Jinja2Templates
-from fastapi.responses import HTMLResponse
+from fastapi.middleware.gzip import GZipMiddleware
+from fastapi.responses import JSONResponse, Response
 import os
 import logging
 import asyncio
 import sys
+from anyio import to_thread
+from starlette.concurrency import run_in_threadpool
 from pathlib import Path
 
 from .api.api import api_router
 from .core.config import settings
-from .db.database import engine, get_db
-from .db.models import Base
-from .db.init_db import init_db
+from .core.conditional import ETAG_HEADER
+from .core.pagination import NEXT_CURSOR_HEADER
+from .db.database import SessionLocal, get_pool_status
+from .db.init_db import is_seeded
+from .core.security import get_hash_rounds, shutdown_password_hasher
+from .core.auth_cache import get_cache_stats
+from .core.metrics import CONTENT_TYPE as METRICS_CONTENT_TYPE, MetricsMiddleware, render_metrics
+from .core import worker_stats
+from .core.sql_stats import QUERIES_HEADER, SQLStatsMiddleware, get_route_stats
+from .core.pages import PageCache, add_page_routes
+from .core.static_assets import StaticAssets, find_static_dir, load_manifest, make_static_url
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
-# Создание таблиц в базе данных
-Base.metadata.create_all(bind=engine)
-
 app = FastAPI(
     title=settings.APP_NAME,
     openapi_url=f"{settings.API_V1_STR}/openapi.json"
@@ -33,97 +39,150 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, QUERIES_HEADER, ETAG_HEADER],
 )
 
+# Сжатие ответов; заранее сжатая статика (Content-Encoding уже задан) не сжимается повторно
+app.add_middleware(GZipMiddleware, minimum_size=settings.GZIP_MINIMUM_SIZE, compresslevel=settings.GZIP_LEVEL)
+
+# Подсчёт SQL-запросов по маршрутам и поиск проблем N+1
+if settings.SQL_STATS_ENABLED:
+    app.add_middleware(
+        SQLStatsMiddleware,
+        timing_headers=settings.SQL_TIMING_HEADERS,
+        repeat_warning=settings.SQL_REPEAT_WARNING,
+    )
+
+# Счётчики и гистограммы задержек HTTP-запросов для /metrics
+if settings.METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Подключение API-эндпоинтов
 app.include_router(api_router, prefix=settings.API_V1_STR)
 
 # Настройка статических файлов и шаблонов
-static_dir = "/app/static" if os.path.exists("/app/static") else "../frontend/static"
+static_dir = find_static_dir()
 templates_dir = "/app/templates" if os.path.exists("/app/templates") else "../frontend/templates"
 
-app.mount("/static", StaticFiles(directory=static_dir), name="static")
-templates = Jinja2Templates(directory=templates_dir)
+app.mount("/static", StaticAssets(directory=static_dir), name="static")
 
 logger.info(f"Используются статические файлы из: {static_dir}")
 logger.info(f"Используются шаблоны из: {templates_dir}")
 
-# Маршруты фронтенда
-@app.get("/", response_class=HTMLResponse)
-async def read_root(request: Request):
-    return templates.TemplateResponse("index.html", {"request": request})
+# Маршруты фронтенда: страницы отрисовываются один раз и отдаются из памяти
+pages = PageCache(
+    templates_dir,
+    static_url=make_static_url(load_manifest(static_dir) if settings.STATIC_BUILD_ENABLED else {}),
+    reload=settings.PAGES_RELOAD,
+)
+add_page_routes(app, pages)
 
-@app.get("/login", response_class=HTMLResponse)
-async def login(request: Request):
-    return templates.TemplateResponse("login.html", {"request": request})
 
-@app.get("/register", response_class=HTMLResponse)
-async def register(request: Request):
-    return templates.TemplateResponse("register.html", {"request": request})
+@app.get("/health")
+async def health_check():
+    """Проверка работоспособности приложения"""
+    return {"status": "ok"}
 
-@app.get("/profile", response_class=HTMLResponse)
-async def profile(request: Request):
-    return templates.TemplateResponse("profile.html", {"request": request})
 
-@app.get("/users", response_class=HTMLResponse)
-async def users(request: Request):
-    # Добавляем флаг, чтобы отключить проверку прав доступа
-    return templates.TemplateResponse("users.html", {"request": request, "skip_auth_check": True})
+@app.get("/health/db-pool")
+async def db_pool_status():
+    """Состояние пула соединений с базой данных (по воркерам при нескольких процессах)"""
+    if worker_stats.enabled():
+        return worker_stats.worker_health("db_pool")
+    return get_pool_status()
 
-@app.get("/pharmacy", response_class=HTMLResponse)
-async def pharmacy(request: Request):
-    return templates.TemplateResponse("pharmacy.html", {"request": request})
 
-@app.get("/products", response_class=HTMLResponse)
-async def products(request: Request):
-    return templates.TemplateResponse("products.html", {"request": request})
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Метрики в текстовом формате Prometheus (всех воркеров при нескольких процессах)"""
+    body = worker_stats.render_metrics() if worker_stats.enabled() else render_metrics()
+    return Response(body, media_type=METRICS_CONTENT_TYPE)
 
-@app.get("/suppliers", response_class=HTMLResponse)
-async def suppliers(request: Request):
-    return templates.TemplateResponse("suppliers.html", {"request": request})
 
-@app.get("/admin_pharmacies.html", response_class=HTMLResponse)
-async def admin_pharmacies(request: Request):
-    return templates.TemplateResponse("admin_pharmacies.html", {"request": request})
+@app.get("/health/sql-stats")
+async def sql_stats():
+    """Число SQL-запросов и время в базе данных по маршрутам"""
+    if worker_stats.enabled():
+        return worker_stats.worker_health("sql_stats")
+    return get_route_stats()
 
 
-@app.get("/health")
-async def health_check():
-    """Проверка работоспособности приложения"""
-    return {"status": "ok"}
+@app.get("/health/auth-cache")
+async def auth_cache_status():
+    """Счётчики попаданий в кэши аутентификации"""
+    if worker_stats.enabled():
+        return worker_stats.worker_health("auth_cache")
+    return get_cache_stats()
 
 
-@app.on_event("startup")
-async def startup_db_client():
-    """Инициализация базы данных при запуске приложения"""
+def check_database_ready() -> bool:
+    """Есть ли в базе администратор и аптеки; False, если база недоступна"""
     try:
-        logger.info("Проверка наличия данных в базе данных...")
-        # Проверяем, есть ли данные в базе
-        db = next(get_db())
-        
-        from sqlalchemy import select
-        from .db.models import Pharmacy
-        from .db.models_auth import User
-        
-        # Проверяем наличие администратора
-        admin_result = db.execute(select(User).filter(User.email == "admin@pharmacy.com"))
-        admin_exists = admin_result.scalars().first()
-        
-        # Проверяем наличие аптек
-        pharmacy_result = db.execute(select(Pharmacy))
-        pharmacies = pharmacy_result.scalars().all()
-        
-        # Если администратора нет или аптек нет, инициализируем базу данных
-        if not admin_exists or not pharmacies:
-            if not admin_exists:
-                logger.info("Администратор не найден. Инициализация базы данных...")
-            if not pharmacies:
-                logger.info("Аптеки не найдены. Инициализация базы данных...")
-                
-            # Вызываем init_db без await, так как мы используем синхронный API
-            init_db(db)
-        else:
-            logger.info(f"База данных уже содержит данные (администратор: {admin_exists is not None}, аптек: {len(pharmacies)})")
+        with SessionLocal() as db:
+            return is_seeded(db)
     except Exception as e:
-        logger.error(f"Ошибка при инициализации базы данных: {e}")
-        raise
+        logger.error(f"Ошибка проверки готовности базы данных: {e}")
+        return False
+
+
+@app.get("/health/ready")
+def readiness_check():
+    """Готовность приложения принимать запросы"""
+    if not check_database_ready():
+        return JSONResponse(status_code=503, content={"status": "not ready"})
+    return {"status": "ready"}
+
+
+@app.on_event("startup")
+async def configure_threadpool():
+    """Ограничение пула потоков, в котором выполняются синхронные обработчики"""
+    limiter = to_thread.current_default_thread_limiter()
+    limiter.total_tokens = settings.THREADPOOL_SIZE
+    logger.info(f"Размер пула потоков для обработчиков: {settings.THREADPOOL_SIZE}")
+
+
+@app.on_event("startup")
+def configure_password_hasher():
+    """Стоимость bcrypt определяется при запуске, а не при первом входе под нагрузкой"""
+    logger.info(f"Стоимость bcrypt: {get_hash_rounds()}")
+
+
+@app.on_event("startup")
+def warm_pages():
+    """Отрисовка всех страниц фронтенда до первого запроса"""
+    pages.warm()
+
+
+@app.on_event("startup")
+async def startup_db_client():
+    """Проверка готовности базы данных при запуске приложения.
+
+    Схема и тестовые данные создаются отдельной командой
+    `python -m app.manage setup`, здесь выполняется только дешёвая проверка."""
+    ready = await run_in_threadpool(check_database_ready)
+    if ready:
+        logger.info("База данных готова к работе")
+    else:
+        logger.warning("База данных не инициализирована. Выполните: python -m app.manage setup")
+
+
+@app.on_event("startup")
+async def start_worker_stats():
+    """Периодическая запись снимка метрик воркера для объединения с другими процессами"""
+    if worker_stats.enabled():
+        worker_stats.write_snapshot()
+        app.state.worker_stats_task = asyncio.create_task(worker_stats.flush_periodically())
+
+
+@app.on_event("shutdown")
+async def stop_worker_stats():
+    """Последний снимок метрик: главный процесс перенесёт его счётчики после выхода воркера"""
+    if worker_stats.enabled():
+        app.state.worker_stats_task.cancel()
+        worker_stats.write_snapshot()
+
+
+@app.on_event("shutdown")
+def shutdown_workers():
+    """Остановка пула процессов хеширования паролей"""
+    shutdown_password_hasher()
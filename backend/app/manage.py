@@ -0,0 +1,96 @@
+"""
+Разовые команды обслуживания базы данных.
+
+Схема и тестовые данные больше не создаются при запуске приложения:
+перед стартом сервера (один раз, а не в каждом воркере) выполняется
+
+    python -m app.manage setup     # миграции + тестовые данные, если база пуста
+    python -m app.manage migrate   # только миграции
+    python -m app.manage seed      # заново заполнить тестовыми данными
+    python -m app.manage check     # проверка готовности базы (код возврата 1 — не готова)
+    python -m app.manage generate --scale large  # синтетические данные для нагрузочных тестов
+    python -m app.manage build-static  # статика с хешами в именах и сжатыми копиями
+"""
+import argparse
+import logging
+import sys
+from datetime import date
+
+from .core.static_assets import build_static, find_static_dir
+from .db.database import SessionLocal, engine
+from .db.generate_data import SCALES, GeneratorParams, generate as generate_data, reset
+from .db.init_db import init_db, is_seeded
+from .db.migrations import upgrade
+
+logger = logging.getLogger(__name__)
+
+
+def migrate() -> None:
+    upgrade(engine)
+
+
+def seed(force: bool = False) -> None:
+    with SessionLocal() as db:
+        if not force and is_seeded(db):
+            logger.info("База данных уже содержит данные, заполнение пропущено")
+            return
+        init_db(db)
+
+
+def setup() -> None:
+    migrate()
+    seed()
+
+
+def check() -> bool:
+    with SessionLocal() as db:
+        return is_seeded(db)
+
+
+def generate(params: GeneratorParams, reset_data: bool = False) -> dict:
+    with SessionLocal() as db:
+        if reset_data:
+            reset(db)
+        return generate_data(db, params)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m app.manage")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("setup", help="применить миграции и заполнить пустую базу")
+    commands.add_parser("migrate", help="применить миграции")
+    seed_parser = commands.add_parser("seed", help="заполнить базу тестовыми данными")
+    seed_parser.add_argument("--force", action="store_true", help="перезаписать существующие тестовые данные")
+    commands.add_parser("check", help="проверить готовность базы")
+    generate_parser = commands.add_parser("generate", help="добавить синтетические данные для нагрузочных тестов")
+    generate_parser.add_argument("--scale", choices=sorted(SCALES), default="small", help="размер набора по умолчанию")
+    for name in SCALES["small"]:
+        generate_parser.add_argument(f"--{name.replace('_', '-')}", type=int, help="переопределяет значение из --scale")
+    generate_parser.add_argument("--seed", type=int, default=42)
+    generate_parser.add_argument("--today", type=date.fromisoformat, help="опорная дата (по умолчанию сегодня)")
+    generate_parser.add_argument("--reset", action="store_true", help="удалить все данные и заново заполнить тестовыми")
+    static_parser = commands.add_parser("build-static", help="собрать статику для долгого кэширования")
+    static_parser.add_argument("--static-dir", default=find_static_dir(), help="каталог статических файлов")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    if args.command == "setup":
+        setup()
+    elif args.command == "migrate":
+        migrate()
+    elif args.command == "seed":
+        seed(force=args.force)
+    elif args.command == "check":
+        ready = check()
+        print("ready" if ready else "not ready")
+        return 0 if ready else 1
+    elif args.command == "generate":
+        sizes = {name: getattr(args, name) or value for name, value in SCALES[args.scale].items()}
+        generate(GeneratorParams(**sizes, seed=args.seed, today=args.today), reset_data=args.reset)
+    elif args.command == "build-static":
+        build_static(args.static_dir)
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
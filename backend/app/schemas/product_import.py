@@ -0,0 +1,19 @@
+from pydantic import BaseModel
+from typing import List
+
+
+class ProductImportError(BaseModel):
+    row: int
+    errors: List[str]
+
+
+class ProductImportResult(BaseModel):
+    received: int
+    imported: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[ProductImportError] = []
+    errors_truncated: bool = False
+    elapsed_seconds: float
+    rows_per_second: float
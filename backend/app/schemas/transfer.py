@@ -0,0 +1,19 @@
+from pydantic import BaseModel, conint
+from typing import List
+
+
+class TransferLine(BaseModel):
+    pharmacy_id: int
+    product_id: int
+    quantity: conint(gt=0)
+
+
+class TransferLineResult(TransferLine):
+    # ok — перемещено, not_found — нет товара или аптеки, insufficient — недостаточно товара
+    status: str
+
+
+class TransferBatchResult(BaseModel):
+    transferred: int
+    failed: int
+    results: List[TransferLineResult]
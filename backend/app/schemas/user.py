@@ -51,3 +51,6 @@ class TokenData(BaseModel):
     username: Optional[str] = None
     user_id: Optional[int] = None
     role: Optional[str] = None
+    supplier_id: Optional[int] = None
+    # Признак того, что токен содержит область доступа (supplier_id)
+    has_scope: bool = False
@@ -3,9 +3,9 @@ from .pharmacy import (
     delete_pharmacy, update_pharmacy_date
 )
 from .product import (
-    get_product, get_products, create_product, update_product, delete_product,
+    get_product, get_products, get_products_with_supplier, create_product, update_product, delete_product,
     get_expired_products, get_products_by_pharmacy, get_products_by_supplier,
-    get_products_by_dosage, add_product_to_pharmacy, remove_product_from_pharmacy,
+    get_products_by_dosage, add_product_to_pharmacy, transfer_products_batch, remove_product_from_pharmacy,
     get_total_products_cost
 )
 from .supplier import (
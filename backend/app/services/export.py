@@ -0,0 +1,101 @@
+"""
+Потоковая выгрузка каталога.
+
+Строки читаются курсором на стороне сервера (yield_per) и сразу
+кодируются в NDJSON или CSV пачками, поэтому память не растёт с размером
+каталога, а первые байты ответа отправляются до окончания выборки.
+"""
+import csv
+import io
+import json
+from datetime import date, datetime
+from typing import Iterator, List, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.orm import Session
+
+from ..db.models import Product, pharmacy_product, supplier_product
+
+# Количество строк, которые читаются из курсора и отправляются клиенту за раз
+EXPORT_BATCH_SIZE = 1000
+
+PRODUCT_COLUMNS = ["id", "name", "dosages", "price", "quantity", "expiry_date", "preferred_supplier_id"]
+PHARMACY_STOCK_COLUMNS = ["id", "name", "dosages", "price", "expiry_date", "quantity_in_pharmacy"]
+SUPPLIER_ASSORTMENT_COLUMNS = ["id", "name", "dosages", "price", "expiry_date", "quantity_at_supplier", "preference"]
+
+
+def _stream(db: Session, statement, batch_size: int) -> Iterator[Sequence]:
+    """Выполнить запрос с курсором на стороне сервера и вернуть строки пачками"""
+    result = db.execute(statement.execution_options(yield_per=batch_size))
+    for partition in result.mappings().partitions():
+        yield partition
+
+
+def iter_products(db: Session, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Sequence]:
+    """Все товары каталога"""
+    statement = select(*[Product.__table__.c[name] for name in PRODUCT_COLUMNS]).order_by(Product.id)
+    return _stream(db, statement, batch_size)
+
+
+def iter_pharmacy_stock(db: Session, pharmacy_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Sequence]:
+    """Товары в аптеке с количеством из pharmacy_product"""
+    statement = (
+        select(
+            Product.id, Product.name, Product.dosages, Product.price, Product.expiry_date,
+            pharmacy_product.c.quantity.label("quantity_in_pharmacy"),
+        )
+        .join(pharmacy_product, pharmacy_product.c.product_id == Product.id)
+        .where(pharmacy_product.c.pharmacy_id == pharmacy_id)
+        .order_by(Product.id)
+    )
+    return _stream(db, statement, batch_size)
+
+
+def iter_supplier_assortment(db: Session, supplier_id: int, batch_size: int = EXPORT_BATCH_SIZE) -> Iterator[Sequence]:
+    """Товары поставщика с количеством и предпочтением из supplier_product"""
+    statement = (
+        select(
+            Product.id, Product.name, Product.dosages, Product.price, Product.expiry_date,
+            supplier_product.c.quantity.label("quantity_at_supplier"),
+            supplier_product.c.preference,
+        )
+        .join(supplier_product, supplier_product.c.product_id == Product.id)
+        .where(supplier_product.c.supplier_id == supplier_id)
+        .order_by(Product.id)
+    )
+    return _stream(db, statement, batch_size)
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(batches: Iterator[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """Закодировать пачки строк в NDJSON (одна JSON-запись на строку)"""
+    for batch in batches:
+        lines = [
+            json.dumps({name: row[name] for name in columns}, ensure_ascii=False, default=_json_default)
+            for row in batch
+        ]
+        yield ("\n".join(lines) + "\n").encode("utf-8")
+
+
+def encode_csv(batches: Iterator[Sequence], columns: List[str]) -> Iterator[bytes]:
+    """Закодировать пачки строк в CSV с заголовком; фасовки записываются как JSON-массив"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue().encode("utf-8")
+    for batch in batches:
+        buffer.seek(0)
+        buffer.truncate()
+        for row in batch:
+            writer.writerow([
+                json.dumps(row[name], ensure_ascii=False) if name == "dosages"
+                else _json_default(row[name]) if isinstance(row[name], (datetime, date))
+                else row[name]
+                for name in columns
+            ])
+        yield buffer.getvalue().encode("utf-8")
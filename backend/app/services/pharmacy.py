@@ -1,6 +1,8 @@
 from sqlalchemy.orm import Session
-from ..db.models import Pharmacy
+from ..core.pagination import paginate
+from ..db.models import Pharmacy, pharmacy_stock_value
 from ..schemas.pharmacy import PharmacyCreate, PharmacyUpdate
+from . import versions
 from typing import List, Optional
 from datetime import datetime
 
@@ -10,12 +12,12 @@ def get_pharmacy(db: Session, pharmacy_id: int) -> Optional[Pharmacy]:
     return db.query(Pharmacy).filter(Pharmacy.id == pharmacy_id).first()
 
 
-def get_pharmacies(db: Session, current_user=None, skip: int = 0, limit: int = 100) -> List[Pharmacy]:
-    """Получить список аптек с пагинацией. Директор видит только свои аптеки."""
+def get_pharmacies(db: Session, current_user=None, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[Pharmacy]:
+    """Получить список аптек с пагинацией (по смещению или по курсору after_id). Директор видит только свои аптеки."""
     query = db.query(Pharmacy)
     if current_user and hasattr(current_user, 'role') and getattr(current_user, 'role', None) == 'director':
         query = query.filter(Pharmacy.director_id == current_user.id)
-    return query.offset(skip).limit(limit).all()
+    return paginate(query, Pharmacy.id, skip=skip, limit=limit, after_id=after_id).all()
 
 
 def create_pharmacy(db: Session, pharmacy: PharmacyCreate, current_user=None) -> Pharmacy:
@@ -25,6 +27,10 @@ def create_pharmacy(db: Session, pharmacy: PharmacyCreate, current_user=None) ->
         data['director_id'] = current_user.id
     db_pharmacy = Pharmacy(**data)
     db.add(db_pharmacy)
+    db.flush()
+    # Новая аптека начинается с нулевой стоимостью товаров
+    db.execute(pharmacy_stock_value.insert().values(pharmacy_id=db_pharmacy.id, total_cost=0))
+    versions.bump(db, versions.PHARMACIES)
     db.commit()
     db.refresh(db_pharmacy)
     return db_pharmacy
@@ -41,6 +47,7 @@ def update_pharmacy(db: Session, pharmacy_id: int, pharmacy: PharmacyUpdate, cur
     update_data = pharmacy.dict(exclude_unset=True)
     for key, value in update_data.items():
         setattr(db_pharmacy, key, value)
+    versions.bump(db, versions.PHARMACIES)
     db.commit()
     db.refresh(db_pharmacy)
     return db_pharmacy
@@ -55,6 +62,7 @@ def delete_pharmacy(db: Session, pharmacy_id: int, current_user=None) -> bool:
         if db_pharmacy.director_id != current_user.id:
             return False
     db.delete(db_pharmacy)
+    versions.bump(db, versions.PHARMACIES, versions.pharmacy_stock(pharmacy_id))
     db.commit()
     return True
 
@@ -66,6 +74,7 @@ def update_pharmacy_date(db: Session, pharmacy_id: int, new_date: datetime) -> O
         return None
     
     db_pharmacy.current_date = new_date
+    versions.bump(db, versions.PHARMACIES)
     db.commit()
     db.refresh(db_pharmacy)
     return db_pharmacy
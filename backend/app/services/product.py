@@ -1,25 +1,75 @@
+from sqlalchemy import func, select
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text
-from ..db.models import Product, Pharmacy, Supplier
+from ..core.pagination import paginate
+from ..db.models import Product, Supplier, pharmacy_product, pharmacy_stock_value
 from ..schemas.product import ProductCreate, ProductUpdate
+from . import versions
 from typing import List, Optional
 from datetime import datetime
 
+# Поля товара в ответах API (схема Product). Списки товаров возвращаются
+# словарями из строк результата и кодируются в JSON без создания моделей
+PRODUCT_COLUMNS = (
+    Product.id, Product.name, Product.dosages, Product.price, Product.quantity,
+    Product.expiry_date, Product.preferred_supplier_id,
+)
+
+
+def _rows_to_dicts(result) -> List[dict]:
+    """Строки результата в словари; имена ключей берутся из результата один раз"""
+    keys = tuple(result.keys())
+    return [dict(zip(keys, row)) for row in result]
+
 
 def get_product(db: Session, product_id: int) -> Optional[Product]:
     """Получить товар по ID"""
     return db.query(Product).filter(Product.id == product_id).first()
 
 
-def get_products(db: Session, skip: int = 0, limit: int = 100) -> List[Product]:
-    """Получить список товаров с пагинацией"""
-    return db.query(Product).offset(skip).limit(limit).all()
+def _get_product_for_update(db: Session, product_id: int) -> Optional[Product]:
+    """Товар с блокировкой строки до конца транзакции; populate_existing
+    перечитывает объект, если он уже загружен в сессию"""
+    return (
+        db.query(Product).filter(Product.id == product_id)
+        .populate_existing().with_for_update().first()
+    )
+
+
+def get_products(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[Product]:
+    """Получить список товаров с пагинацией (по смещению или по курсору after_id)"""
+    return paginate(db.query(Product), Product.id, skip=skip, limit=limit, after_id=after_id).all()
+
+
+def get_products_with_supplier(
+    db: Session, supplier_id: Optional[int] = None, skip: int = 0, limit: int = 100,
+    after_id: Optional[int] = None
+) -> List[dict]:
+    """Получить товары вместе с предпочтительным поставщиком одним запросом (схема ProductWithSupplier).
+    Если указан supplier_id, возвращаются все товары этого поставщика без пагинации."""
+    query = (
+        select(*PRODUCT_COLUMNS, Supplier.name.label("preferred_supplier_name"))
+        .outerjoin(Supplier, Product.preferred_supplier_id == Supplier.id)
+    )
+    if supplier_id is not None:
+        query = query.where(Product.preferred_supplier_id == supplier_id)
+    else:
+        query = paginate(query, Product.id, skip=skip, limit=limit, after_id=after_id)
+
+    result = []
+    for row in _rows_to_dicts(db.execute(query)):
+        name = row.pop("preferred_supplier_name")
+        preferred_id = row["preferred_supplier_id"]
+        row["preferred_supplier"] = {"id": preferred_id, "name": name} if preferred_id is not None else None
+        result.append(row)
+    return result
 
 
 def create_product(db: Session, product: ProductCreate) -> Product:
     """Создать новый товар"""
     db_product = Product(**product.dict())
     db.add(db_product)
+    versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS)
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -27,14 +77,35 @@ def create_product(db: Session, product: ProductCreate) -> Product:
 
 def update_product(db: Session, product_id: int, product: ProductUpdate) -> Optional[Product]:
     """Обновить данные товара"""
-    db_product = get_product(db, product_id)
+    # Строка блокируется до commit: иначе параллельное изменение цены прочитало бы
+    # ту же старую цену, и разница в стоимости товаров аптек была бы учтена неверно
+    db_product = _get_product_for_update(db, product_id)
     if not db_product:
         return None
     
     update_data = product.dict(exclude_unset=True)
+    old_price = db_product.price
     for key, value in update_data.items():
         setattr(db_product, key, value)
     
+    # Изменение цены меняет стоимость товаров во всех аптеках, где он есть
+    new_price = update_data.get("price")
+    if new_price is not None and new_price != old_price:
+        db.execute(
+            text("""
+                UPDATE pharmacy_stock_value v
+                SET total_cost = v.total_cost + (:new_price - :old_price) * pp.quantity
+                FROM pharmacy_product pp
+                WHERE pp.pharmacy_id = v.pharmacy_id AND pp.product_id = :product_id
+            """),
+            {"new_price": new_price, "old_price": old_price or 0, "product_id": product_id}
+        )
+    
+    # Изменение только количества на складе не затрагивает списки товаров аптек
+    if set(update_data) - {"quantity"}:
+        versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS)
+    else:
+        versions.bump(db, versions.PRODUCTS)
     db.commit()
     db.refresh(db_product)
     return db_product
@@ -42,131 +113,246 @@ def update_product(db: Session, product_id: int, product: ProductUpdate) -> Opti
 
 def delete_product(db: Session, product_id: int) -> bool:
     """Удалить товар"""
-    db_product = get_product(db, product_id)
+    db_product = _get_product_for_update(db, product_id)
     if not db_product:
         return False
     
+    # Вместе с товаром удаляются его остатки в аптеках — вычитаем их стоимость
+    db.execute(
+        text("""
+            UPDATE pharmacy_stock_value v
+            SET total_cost = v.total_cost - :price * pp.quantity
+            FROM pharmacy_product pp
+            WHERE pp.pharmacy_id = v.pharmacy_id AND pp.product_id = :product_id
+        """),
+        {"price": db_product.price or 0, "product_id": product_id}
+    )
     db.delete(db_product)
+    versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS)
     db.commit()
     return True
 
 
-def get_expired_products(db: Session, pharmacy_id: Optional[int] = None, current_date: Optional[datetime] = None) -> List[Product]:
+def get_expired_products(db: Session, pharmacy_id: Optional[int] = None, current_date: Optional[datetime] = None) -> List[dict]:
     """Получить список просроченных товаров"""
     if current_date is None:
         current_date = datetime.now()
     
-    query = db.query(Product).filter(Product.expiry_date < current_date)
+    query = select(*PRODUCT_COLUMNS).where(Product.expiry_date < current_date)
     
     if pharmacy_id:
         # Фильтрация по аптеке
-        query = query.join(Product.pharmacies).filter(Pharmacy.id == pharmacy_id)
+        query = query.join(pharmacy_product, pharmacy_product.c.product_id == Product.id).where(
+            pharmacy_product.c.pharmacy_id == pharmacy_id
+        )
     
-    return query.all()
-
+    return _rows_to_dicts(db.execute(query))
 
-from ..schemas.product_in_pharmacy import ProductInPharmacy
-
-def get_products_by_pharmacy(db: Session, pharmacy_id: int) -> list:
-    """Получить список товаров в конкретной аптеке с количеством из pharmacy_product"""
-    rows = db.execute(
-        text("""
-            SELECT p.id, p.name, p.dosages, p.price, p.expiry_date, pp.quantity
-            FROM products p
-            JOIN pharmacy_product pp ON pp.product_id = p.id
-            WHERE pp.pharmacy_id = :pharmacy_id
-        """),
-        {"pharmacy_id": pharmacy_id}
-    ).fetchall()
-    result = []
-    for row in rows:
-        result.append(ProductInPharmacy(
-            id=row.id,
-            name=row.name,
-            dosages=row.dosages,
-            price=row.price,
-            expiry_date=row.expiry_date,
-            quantity_in_pharmacy=row.quantity
-        ))
-    return result
 
+def get_products_by_pharmacy(db: Session, pharmacy_id: int) -> List[dict]:
+    """Получить список товаров в конкретной аптеке с количеством из pharmacy_product (схема ProductInPharmacy)"""
+    return _rows_to_dicts(db.execute(
+        select(
+            Product.id, Product.name, Product.dosages, Product.price, Product.expiry_date,
+            pharmacy_product.c.quantity.label("quantity_in_pharmacy"),
+        )
+        .join(pharmacy_product, pharmacy_product.c.product_id == Product.id)
+        .where(pharmacy_product.c.pharmacy_id == pharmacy_id)
+    ))
 
 
-def get_products_by_supplier(db: Session, supplier_id: int) -> List[Product]:
+def get_products_by_supplier(db: Session, supplier_id: int) -> List[dict]:
     """Получить список товаров у конкретного поставщика"""
-    return db.query(Product).filter(Product.preferred_supplier_id == supplier_id).all()
+    return _rows_to_dicts(db.execute(select(*PRODUCT_COLUMNS).where(Product.preferred_supplier_id == supplier_id)))
 
 
-def get_products_by_dosage(db: Session, dosage: str) -> List[Product]:
+def get_products_by_dosage(db: Session, dosage: str, skip: int = 0, limit: int = 100) -> List[dict]:
     """Получить список товаров с заданной фасовкой"""
-    # Поиск товаров, у которых в массиве фасовок есть заданная фасовка
-    # Примечание: это упрощенная реализация, в реальном приложении 
-    # нужно использовать специальные операторы PostgreSQL для работы с JSON
-    products = db.query(Product).all()
-    return [p for p in products if dosage in p.dosages]
+    # Оператор JSONB @> использует GIN-индекс ix_products_dosages
+    return _rows_to_dicts(db.execute(
+        select(*PRODUCT_COLUMNS)
+        .where(Product.dosages.contains([dosage]))
+        .order_by(Product.id)
+        .offset(skip)
+        .limit(limit)
+    ))
 
 
 def add_product_to_pharmacy(db: Session, product_id: int, pharmacy_id: int, quantity: int) -> int:
     """Добавить товар в аптеку
     
+    Остаток товара уменьшается условным UPDATE ... WHERE quantity >= :quantity,
+    поэтому параллельные заказы не могут продать больше, чем есть в наличии.
+    
     Возвращает:
         1 - успешно
         0 - товар или аптека не найдены
         -1 - недостаточно товара в наличии
     """
-    db_product = get_product(db, product_id)
-    db_pharmacy = db.query(Pharmacy).filter(Pharmacy.id == pharmacy_id).first()
-    
-    if not db_product or not db_pharmacy:
-        return 0
+    result = db.execute(
+        text("""
+            WITH moved AS (
+                UPDATE products SET quantity = quantity - :quantity
+                WHERE id = :product_id AND quantity >= :quantity
+                  AND EXISTS (SELECT 1 FROM pharmacies WHERE id = :pharmacy_id)
+                RETURNING id, price
+            ), stocked AS (
+                INSERT INTO pharmacy_product (pharmacy_id, product_id, quantity)
+                SELECT :pharmacy_id, id, :quantity FROM moved
+                ON CONFLICT (pharmacy_id, product_id)
+                DO UPDATE SET quantity = pharmacy_product.quantity + EXCLUDED.quantity
+                RETURNING product_id
+            ), valued AS (
+                UPDATE pharmacy_stock_value v
+                SET total_cost = v.total_cost + moved.price * :quantity
+                FROM moved
+                WHERE v.pharmacy_id = :pharmacy_id
+                RETURNING v.pharmacy_id
+            )
+            SELECT (SELECT count(*) FROM stocked) AS stocked, (SELECT count(*) FROM valued) AS valued
+        """),
+        {"quantity": quantity, "pharmacy_id": pharmacy_id, "product_id": product_id}
+    ).one()
     
-    # Проверяем, что количество не превышает доступное
-    if quantity > db_product.quantity:
+    if not result.stocked:
+        db.rollback()
+        # Перемещение не выполнено — выясняем причину
+        exists = db.execute(
+            text("""
+                SELECT EXISTS (SELECT 1 FROM products WHERE id = :product_id) AS product,
+                       EXISTS (SELECT 1 FROM pharmacies WHERE id = :pharmacy_id) AS pharmacy
+            """),
+            {"pharmacy_id": pharmacy_id, "product_id": product_id}
+        ).one()
+        if not exists.product or not exists.pharmacy:
+            return 0
         return -1  # Недостаточно товара в наличии
+    
+    if not result.valued:
+        recalculate_pharmacy_stock_value(db, pharmacy_id)
+    versions.bump(db, versions.PRODUCTS, versions.pharmacy_stock(pharmacy_id))
+    db.commit()
+    return 1
 
-    # Уменьшаем остаток товара у поставщика
-    db_product.quantity -= quantity
-    if db_product.quantity < 0:
-        db_product.quantity = 0
+
+def transfer_products_batch(db: Session, lines: List[dict]) -> List[dict]:
+    """Переместить товары в аптеки одной транзакцией
     
-    # Проверяем, есть ли уже этот товар в аптеке
-    product_exists = False
-    for p in db_pharmacy.products:
-        if p.id == db_product.id:
-            product_exists = True
-            break
+    Строки товаров блокируются в порядке возрастания id, поэтому параллельные
+    пакеты не взаимоблокируются. Строки обрабатываются по порядку: если товара
+    уже не хватает, строка отклоняется, остальные всё равно выполняются.
+    Возвращает результат для каждой строки со статусом ok, not_found или insufficient.
+    """
+    product_ids = sorted({line["product_id"] for line in lines})
+    pharmacy_ids = sorted({line["pharmacy_id"] for line in lines})
     
-    if not product_exists:
-        # Явно создаём запись в pharmacy_product с нужным количеством
-        db.execute(
-            text("INSERT INTO pharmacy_product (pharmacy_id, product_id, quantity) VALUES (:pharmacy_id, :product_id, :quantity) ON CONFLICT (pharmacy_id, product_id) DO UPDATE SET quantity = pharmacy_product.quantity + EXCLUDED.quantity"),
-            {"quantity": quantity, "pharmacy_id": pharmacy_id, "product_id": product_id}
-        )
-    else:
-        # Обновляем количество в таблице связи
-        db.execute(
-            text("UPDATE pharmacy_product SET quantity = quantity + :quantity WHERE pharmacy_id = :pharmacy_id AND product_id = :product_id"),
-            {"quantity": quantity, "pharmacy_id": pharmacy_id, "product_id": product_id}
+    products = {
+        row.id: row for row in db.execute(
+            text("SELECT id, quantity, price FROM products WHERE id = ANY(:ids) ORDER BY id FOR UPDATE"),
+            {"ids": product_ids}
         )
+    }
+    existing_pharmacies = set(db.execute(
+        text("SELECT id FROM pharmacies WHERE id = ANY(:ids)"),
+        {"ids": pharmacy_ids}
+    ).scalars())
+    
+    # Распределяем остатки по строкам в порядке их следования
+    remaining = {product_id: row.quantity or 0 for product_id, row in products.items()}
+    moved_by_product = {}
+    moved_by_link = {}
+    value_by_pharmacy = {}
+    results = []
+    for line in lines:
+        product_id, pharmacy_id, quantity = line["product_id"], line["pharmacy_id"], line["quantity"]
+        if product_id not in products or pharmacy_id not in existing_pharmacies:
+            status = "not_found"
+        elif remaining[product_id] < quantity:
+            status = "insufficient"
+        else:
+            status = "ok"
+            remaining[product_id] -= quantity
+            moved_by_product[product_id] = moved_by_product.get(product_id, 0) + quantity
+            key = (pharmacy_id, product_id)
+            moved_by_link[key] = moved_by_link.get(key, 0) + quantity
+            value_by_pharmacy[pharmacy_id] = (
+                value_by_pharmacy.get(pharmacy_id, 0.0) + (products[product_id].price or 0) * quantity
+            )
+        results.append({**line, "status": status})
     
+    if not moved_by_product:
+        db.rollback()
+        return results
+    
+    db.execute(
+        text("""
+            UPDATE products p SET quantity = p.quantity - d.quantity
+            FROM unnest(CAST(:ids AS integer[]), CAST(:quantities AS integer[])) AS d(id, quantity)
+            WHERE p.id = d.id
+        """),
+        {"ids": list(moved_by_product), "quantities": list(moved_by_product.values())}
+    )
+    db.execute(
+        text("""
+            INSERT INTO pharmacy_product (pharmacy_id, product_id, quantity)
+            SELECT * FROM unnest(CAST(:pharmacy_ids AS integer[]), CAST(:product_ids AS integer[]),
+                                 CAST(:quantities AS integer[]))
+            ON CONFLICT (pharmacy_id, product_id)
+            DO UPDATE SET quantity = pharmacy_product.quantity + EXCLUDED.quantity
+        """),
+        {
+            "pharmacy_ids": [pharmacy_id for pharmacy_id, _ in moved_by_link],
+            "product_ids": [product_id for _, product_id in moved_by_link],
+            "quantities": list(moved_by_link.values()),
+        }
+    )
+    
+    # Стоимость товаров аптек: строки блокируются в порядке id, как и товары
+    valued_pharmacies = sorted(value_by_pharmacy)
+    locked = set(db.execute(
+        text("""
+            SELECT pharmacy_id FROM pharmacy_stock_value
+            WHERE pharmacy_id = ANY(:ids) ORDER BY pharmacy_id FOR UPDATE
+        """),
+        {"ids": valued_pharmacies}
+    ).scalars())
+    db.execute(
+        text("""
+            UPDATE pharmacy_stock_value v SET total_cost = v.total_cost + d.delta
+            FROM unnest(CAST(:ids AS integer[]), CAST(:deltas AS numeric[])) AS d(pharmacy_id, delta)
+            WHERE v.pharmacy_id = d.pharmacy_id
+        """),
+        {"ids": valued_pharmacies, "deltas": [value_by_pharmacy[pid] for pid in valued_pharmacies]}
+    )
+    for pharmacy_id in valued_pharmacies:
+        if pharmacy_id not in locked:
+            recalculate_pharmacy_stock_value(db, pharmacy_id)
+    
+    versions.bump(db, versions.PRODUCTS, *(versions.pharmacy_stock(pid) for pid in valued_pharmacies))
     db.commit()
-    return 1
+    return results
 
 
 def delete_product_from_pharmacy(db: Session, pharmacy_id: int, product_id: int) -> bool:
     """Удалить товар из конкретной аптеки"""
-    db_product = get_product(db, product_id)
-    db_pharmacy = db.query(Pharmacy).filter(Pharmacy.id == pharmacy_id).first()
+    # Удаление связи сразу проверяет, что товар есть в аптеке, и возвращает его стоимость
+    row = db.execute(
+        text("""
+            DELETE FROM pharmacy_product pp
+            USING products p
+            WHERE pp.pharmacy_id = :pharmacy_id AND pp.product_id = :product_id AND p.id = pp.product_id
+            RETURNING pp.quantity, p.price
+        """),
+        {"pharmacy_id": pharmacy_id, "product_id": product_id}
+    ).first()
     
-    if not db_product or not db_pharmacy:
+    if row is None:
         return False
     
-    if db_pharmacy in db_product.pharmacies:
-        db_pharmacy.products.remove(db_product)
-        db.commit()
-        return True
-    
-    return False
+    adjust_pharmacy_stock_value(db, pharmacy_id, -(row.price or 0) * (row.quantity or 0))
+    versions.bump(db, versions.pharmacy_stock(pharmacy_id))
+    db.commit()
+    return True
 
 
 # Для обратной совместимости
@@ -175,15 +361,49 @@ def remove_product_from_pharmacy(db: Session, product_id: int, pharmacy_id: int)
     return delete_product_from_pharmacy(db, pharmacy_id, product_id)
 
 
+def recalculate_pharmacy_stock_value(db: Session, pharmacy_id: int) -> float:
+    """Пересчитать стоимость товаров в аптеке агрегирующим запросом и сохранить её"""
+    total_cost = db.execute(
+        text("""
+            INSERT INTO pharmacy_stock_value (pharmacy_id, total_cost)
+            SELECT ph.id, COALESCE((
+                SELECT SUM(p.price * pp.quantity)
+                FROM pharmacy_product pp
+                JOIN products p ON p.id = pp.product_id
+                WHERE pp.pharmacy_id = ph.id
+            ), 0)
+            FROM pharmacies ph
+            WHERE ph.id = :pharmacy_id
+            ON CONFLICT (pharmacy_id) DO UPDATE SET total_cost = EXCLUDED.total_cost
+            RETURNING total_cost
+        """),
+        {"pharmacy_id": pharmacy_id}
+    ).scalar()
+    return float(total_cost or 0)
+
+
+def adjust_pharmacy_stock_value(db: Session, pharmacy_id: int, delta: float) -> None:
+    """Изменить накопленную стоимость товаров в аптеке (в рамках текущей транзакции)"""
+    result = db.execute(
+        pharmacy_stock_value.update()
+        .where(pharmacy_stock_value.c.pharmacy_id == pharmacy_id)
+        .values(total_cost=pharmacy_stock_value.c.total_cost + delta)
+    )
+    if result.rowcount == 0:
+        # Строки ещё нет — считаем стоимость целиком, изменение уже учтено в остатках
+        recalculate_pharmacy_stock_value(db, pharmacy_id)
+
+
 def get_total_products_cost(db: Session, pharmacy_id: Optional[int] = None) -> float:
-    """Получить суммарную стоимость товаров в аптеке"""
+    """Получить суммарную стоимость товаров в аптеке (или всех товаров на складе)"""
     if pharmacy_id:
-        products = get_products_by_pharmacy(db, pharmacy_id)
-    else:
-        products = get_products(db)
-    
-    total_cost = 0.0
-    for product in products:
-        total_cost += product.price * product.quantity
+        total_cost = db.execute(
+            select(pharmacy_stock_value.c.total_cost)
+            .where(pharmacy_stock_value.c.pharmacy_id == pharmacy_id)
+        ).scalar()
+        if total_cost is None:
+            total_cost = recalculate_pharmacy_stock_value(db, pharmacy_id)
+            db.commit()
+        return float(total_cost)
     
-    return total_cost
+    return db.execute(select(func.coalesce(func.sum(Product.price * Product.quantity), 0.0))).scalar()
@@ -0,0 +1,252 @@
+"""
+Массовый импорт товаров (прайс-листов поставщиков).
+
+Строки читаются из CSV или NDJSON потоком, проверяются пачками по правилам
+ProductCreate и загружаются во временную таблицу командой COPY. Затем
+одной транзакцией обновляются существующие товары (совпадение по
+наименованию и предпочтительному поставщику), добавляются новые и
+обновляется ассортимент поставщика в supplier_product. Параллельные
+импорты сливают данные в таблицы по очереди (advisory-блокировка), чтобы
+один и тот же новый товар не был добавлен дважды.
+
+Файл должен быть в кодировке UTF-8: строки, которые не декодируются,
+попадают в отчёт об ошибках.
+"""
+import csv
+import io
+import json
+import math
+import time
+from typing import IO, Iterator, List, Optional, Tuple
+
+from pydantic import ValidationError
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import text
+
+from ..schemas.product import ProductCreate
+from . import versions
+
+IMPORT_BATCH_SIZE = 5000
+# Сколько ошибок возвращать в отчёте
+IMPORT_MAX_ERRORS = 1000
+
+# Ключ advisory-блокировки на время слияния импорта с таблицами товаров
+PRODUCT_IMPORT_LOCK_KEY = 7312002
+# Недекодируемые байты заменяются этим символом, строки с ним не импортируются
+REPLACEMENT_CHAR = "\ufffd"
+ENCODING_ERROR = "строка не в кодировке UTF-8"
+
+# Наибольшее значение столбца integer в PostgreSQL
+MAX_INTEGER = 2**31 - 1
+
+STAGING_COLUMNS = "row_no, name, dosages, price, quantity, expiry_date, supplier_id"
+
+
+def _parse_dosages(value):
+    """Фасовки в CSV: JSON-массив или значения через точку с запятой"""
+    if value is None or isinstance(value, list):
+        return value
+    value = value.strip()
+    if value.startswith("["):
+        return json.loads(value)
+    return [item.strip() for item in value.split(";") if item.strip()]
+
+
+def iter_rows(file: IO[bytes], fmt: str) -> Iterator[Tuple[int, Optional[dict], Optional[str]]]:
+    """Прочитать строки файла: (номер строки, данные, ошибка разбора)"""
+    stream = io.TextIOWrapper(file, encoding="utf-8-sig", errors="replace", newline="")
+    if fmt == "csv":
+        reader = csv.DictReader(stream)
+        if any(REPLACEMENT_CHAR in name for name in reader.fieldnames or ()):
+            yield 1, None, f"заголовок: {ENCODING_ERROR}, файл не импортирован"
+            return
+        for row_no, row in enumerate(reader, start=2):
+            if any(REPLACEMENT_CHAR in value for value in row.values() if isinstance(value, str)):
+                yield row_no, None, ENCODING_ERROR
+                continue
+            data = {key: (value if value != "" else None) for key, value in row.items() if key}
+            try:
+                data["dosages"] = _parse_dosages(data.get("dosages"))
+            except ValueError:
+                yield row_no, None, "dosages: некорректный JSON-массив"
+                continue
+            yield row_no, data, None
+    else:
+        for row_no, line in enumerate(stream, start=1):
+            if not line.strip():
+                continue
+            if REPLACEMENT_CHAR in line:
+                yield row_no, None, ENCODING_ERROR
+                continue
+            try:
+                data = json.loads(line)
+            except ValueError:
+                yield row_no, None, "некорректная JSON-строка"
+                continue
+            if not isinstance(data, dict):
+                yield row_no, None, "строка должна быть JSON-объектом"
+                continue
+            yield row_no, data, None
+
+
+def _format_errors(error: ValidationError) -> List[str]:
+    return [f"{'.'.join(str(part) for part in e['loc'])}: {e['msg']}" for e in error.errors()]
+
+
+def _check_product(product: ProductCreate) -> List[str]:
+    """Ограничения столбцов таблицы, которые не проверяет ProductCreate: иначе
+    одна такая строка прервала бы COPY всей пачки"""
+    messages = []
+    if not 0 <= product.quantity <= MAX_INTEGER:
+        messages.append(f"quantity: значение должно быть от 0 до {MAX_INTEGER}")
+    if not math.isfinite(product.price):
+        messages.append("price: значение должно быть конечным числом")
+    if product.preferred_supplier_id is not None and not 0 < product.preferred_supplier_id <= MAX_INTEGER:
+        messages.append("preferred_supplier_id: некорректный идентификатор")
+    if "\x00" in product.name:
+        messages.append("name: недопустимый символ NUL")
+    if any("\x00" in dosage for dosage in product.dosages):
+        messages.append("dosages: недопустимый символ NUL")
+    return messages
+
+
+def _copy_batch(cursor, batch: List[tuple]) -> None:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerows(batch)
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY product_import_staging ({STAGING_COLUMNS}) FROM STDIN WITH (FORMAT csv, FORCE_NOT_NULL (name))",
+        buffer,
+    )
+
+
+def import_products(db: Session, file: IO[bytes], fmt: str = "csv", supplier_id: Optional[int] = None) -> dict:
+    """Импортировать товары из файла. Если указан supplier_id, он становится
+    предпочтительным поставщиком всех строк."""
+    started = time.perf_counter()
+    errors = []
+    received = 0
+    failed = 0
+
+    def add_error(row_no: int, messages: List[str]) -> None:
+        nonlocal failed
+        failed += 1
+        if len(errors) < IMPORT_MAX_ERRORS:
+            errors.append({"row": row_no, "errors": messages})
+
+    connection = db.connection()
+    connection.execute(text("""
+        CREATE TEMP TABLE product_import_staging (
+            row_no integer, name text, dosages jsonb, price double precision,
+            quantity integer, expiry_date timestamp, supplier_id integer
+        ) ON COMMIT DROP
+    """))
+    cursor = connection.connection.cursor()
+
+    # Проверка и загрузка строк пачками
+    try:
+        batch = []
+        for row_no, data, parse_error in iter_rows(file, fmt):
+            received += 1
+            if parse_error:
+                add_error(row_no, [parse_error])
+                continue
+            if supplier_id is not None:
+                data["preferred_supplier_id"] = supplier_id
+            try:
+                product = ProductCreate.parse_obj(data)
+            except ValidationError as e:
+                add_error(row_no, _format_errors(e))
+                continue
+            messages = _check_product(product)
+            if messages:
+                add_error(row_no, messages)
+                continue
+            batch.append((
+                row_no, product.name, json.dumps(product.dosages, ensure_ascii=False), product.price,
+                product.quantity, product.expiry_date.isoformat(), product.preferred_supplier_id,
+            ))
+            if len(batch) >= IMPORT_BATCH_SIZE:
+                _copy_batch(cursor, batch)
+                batch = []
+        if batch:
+            _copy_batch(cursor, batch)
+    finally:
+        cursor.close()
+
+    # Слияние параллельных импортов по очереди: иначе оба добавят один и тот же
+    # новый товар, так как (name, preferred_supplier_id) не уникальны в таблице.
+    # Блокировка снимается при commit или rollback.
+    connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": PRODUCT_IMPORT_LOCK_KEY})
+
+    # Строки с несуществующим поставщиком не импортируются
+    missing = connection.execute(text("""
+        DELETE FROM product_import_staging s
+        WHERE s.supplier_id IS NOT NULL
+          AND NOT EXISTS (SELECT 1 FROM suppliers WHERE suppliers.id = s.supplier_id)
+        RETURNING s.row_no, s.supplier_id
+    """)).fetchall()
+    for row in sorted(missing):
+        add_error(row.row_no, [f"preferred_supplier_id: поставщик {row.supplier_id} не найден"])
+
+    # Повторы одного товара в файле: действует последняя строка
+    connection.execute(text("""
+        CREATE TEMP TABLE product_import_rows ON COMMIT DROP AS
+        SELECT DISTINCT ON (name, supplier_id) *
+        FROM product_import_staging
+        ORDER BY name, supplier_id, row_no DESC
+    """))
+
+    # Изменение цен существующих товаров учитываем в стоимости товаров аптек
+    connection.execute(text("""
+        UPDATE pharmacy_stock_value v
+        SET total_cost = v.total_cost + d.delta
+        FROM (
+            SELECT pp.pharmacy_id, SUM((s.price - p.price) * pp.quantity) AS delta
+            FROM product_import_rows s
+            JOIN products p ON p.name = s.name AND p.preferred_supplier_id IS NOT DISTINCT FROM s.supplier_id
+            JOIN pharmacy_product pp ON pp.product_id = p.id
+            GROUP BY pp.pharmacy_id
+        ) d
+        WHERE v.pharmacy_id = d.pharmacy_id
+    """))
+    updated = connection.execute(text("""
+        UPDATE products p
+        SET dosages = s.dosages, price = s.price, quantity = s.quantity, expiry_date = s.expiry_date
+        FROM product_import_rows s
+        WHERE p.name = s.name AND p.preferred_supplier_id IS NOT DISTINCT FROM s.supplier_id
+    """)).rowcount
+    inserted = connection.execute(text("""
+        INSERT INTO products (name, dosages, price, quantity, expiry_date, preferred_supplier_id)
+        SELECT s.name, s.dosages, s.price, s.quantity, s.expiry_date, s.supplier_id
+        FROM product_import_rows s
+        WHERE NOT EXISTS (
+            SELECT 1 FROM products p
+            WHERE p.name = s.name AND p.preferred_supplier_id IS NOT DISTINCT FROM s.supplier_id
+        )
+    """)).rowcount
+    connection.execute(text("""
+        INSERT INTO supplier_product (supplier_id, product_id, quantity, preference)
+        SELECT s.supplier_id, p.id, s.quantity, 1
+        FROM product_import_rows s
+        JOIN products p ON p.name = s.name AND p.preferred_supplier_id = s.supplier_id
+        WHERE s.supplier_id IS NOT NULL
+        ON CONFLICT (supplier_id, product_id) DO UPDATE SET quantity = EXCLUDED.quantity
+    """))
+    imported = connection.execute(text("SELECT count(*) FROM product_import_staging")).scalar()
+    versions.bump(db, versions.PRODUCTS, versions.PRODUCT_DETAILS)
+    db.commit()
+
+    elapsed = time.perf_counter() - started
+    return {
+        "received": received,
+        "imported": imported,
+        "inserted": inserted,
+        "updated": updated,
+        "failed": failed,
+        "errors": sorted(errors, key=lambda e: e["row"]),
+        "errors_truncated": failed > len(errors),
+        "elapsed_seconds": round(elapsed, 3),
+        "rows_per_second": round(received / elapsed, 1) if elapsed > 0 else 0.0,
+    }
@@ -1,7 +1,10 @@
+from sqlalchemy import select
 from sqlalchemy.orm import Session
 from sqlalchemy.sql import text
-from ..db.models import Supplier, Product
+from ..core.pagination import paginate
+from ..db.models import Supplier, Product, supplier_product
 from ..schemas.supplier import SupplierCreate, SupplierUpdate
+from . import versions
 from typing import List, Optional
 
 
@@ -10,16 +13,18 @@ def get_supplier(db: Session, supplier_id: int) -> Optional[Supplier]:
     return db.query(Supplier).filter(Supplier.id == supplier_id).first()
 
 
-def get_suppliers(db: Session, skip: int = 0, limit: int = 100) -> List[Supplier]:
+def get_suppliers(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[Supplier]:
     """Получить список поставщиков, у которых есть связанный пользователь с ролью 'поставщик' (SUPPLIER)"""
     from ..db.models_auth import User, UserRole
-    return db.query(Supplier).join(User, Supplier.user_id == User.id).filter(User.role == UserRole.SUPPLIER).offset(skip).limit(limit).all()
+    query = db.query(Supplier).join(User, Supplier.user_id == User.id).filter(User.role == UserRole.SUPPLIER)
+    return paginate(query, Supplier.id, skip=skip, limit=limit, after_id=after_id).all()
 
 
 def create_supplier(db: Session, supplier: SupplierCreate) -> Supplier:
     """Создать нового поставщика"""
     db_supplier = Supplier(**supplier.dict())
     db.add(db_supplier)
+    versions.bump(db, versions.SUPPLIERS)
     db.commit()
     db.refresh(db_supplier)
     return db_supplier
@@ -35,6 +40,7 @@ def update_supplier(db: Session, supplier_id: int, supplier: SupplierUpdate) ->
     for key, value in update_data.items():
         setattr(db_supplier, key, value)
     
+    versions.bump(db, versions.SUPPLIERS)
     db.commit()
     db.refresh(db_supplier)
     return db_supplier
@@ -47,6 +53,7 @@ def delete_supplier(db: Session, supplier_id: int) -> bool:
         return False
     
     db.delete(db_supplier)
+    versions.bump(db, versions.SUPPLIERS)
     db.commit()
     return True
 
@@ -61,20 +68,22 @@ def get_suppliers_by_product_name(db: Session, product_name: str) -> List[Suppli
     return db.query(Supplier).join(Supplier.products).filter(Product.name == product_name).all()
 
 
-def get_suppliers_by_product_dosage(db: Session, dosage: str) -> List[Supplier]:
+def get_suppliers_by_product_dosage(db: Session, dosage: str, skip: int = 0, limit: int = 100) -> List[Supplier]:
     """Получить список поставщиков, у которых есть товар с заданной фасовкой"""
-    # Примечание: это упрощенная реализация, в реальном приложении 
-    # нужно использовать специальные операторы PostgreSQL для работы с JSON
-    suppliers = db.query(Supplier).all()
-    result = []
-    
-    for supplier in suppliers:
-        for product in supplier.products:
-            if dosage in product.dosages:
-                result.append(supplier)
-                break
-    
-    return result
+    # Товары с фасовкой находятся по GIN-индексу, поставщики — через таблицу связи
+    supplier_ids = (
+        select(supplier_product.c.supplier_id)
+        .join(Product, Product.id == supplier_product.c.product_id)
+        .where(Product.dosages.contains([dosage]))
+    )
+    return (
+        db.query(Supplier)
+        .filter(Supplier.id.in_(supplier_ids))
+        .order_by(Supplier.id)
+        .offset(skip)
+        .limit(limit)
+        .all()
+    )
 
 
 def add_product_to_supplier(db: Session, product_id: int, supplier_id: int, quantity: int, preference: int = 1) -> int:
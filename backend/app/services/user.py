@@ -3,7 +3,10 @@ from sqlalchemy import select
 from typing import Optional, List
 from ..db.models_auth import User, UserRole
 from ..schemas.user import UserCreate, UserUpdate
-from ..core.security import get_password_hash, verify_password
+from ..core.auth_cache import invalidate_user
+from ..core.pagination import paginate
+from ..core.security import get_password_hash, verify_and_update_password
+from . import versions
 
 def get_user(db: Session, user_id: int) -> Optional[User]:
     """Получить пользователя по ID"""
@@ -17,9 +20,9 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """Получить пользователя по имени пользователя"""
     return db.query(User).filter(User.username == username).first()
 
-def get_users(db: Session, skip: int = 0, limit: int = 100) -> List[User]:
-    """Получить список всех пользователей"""
-    return db.query(User).offset(skip).limit(limit).all()
+def get_users(db: Session, skip: int = 0, limit: int = 100, after_id: Optional[int] = None) -> List[User]:
+    """Получить список всех пользователей (по смещению или по курсору after_id)"""
+    return paginate(db.query(User), User.id, skip=skip, limit=limit, after_id=after_id).all()
 
 def create_user(db: Session, user: UserCreate) -> User:
     """Создать нового пользователя"""
@@ -58,7 +61,11 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
     for key, value in update_data.items():
         if hasattr(db_user, key) and value is not None:
             setattr(db_user, key, value)
+    if db_user.role != old_role:
+        # В список поставщиков входят только пользователи с ролью поставщика
+        versions.bump(db, versions.SUPPLIERS)
     db.commit()
+    invalidate_user(user_id)
     db.refresh(db_user)
     # --- АВТОМАТИЧЕСКОЕ СОЗДАНИЕ ПОСТАВЩИКА ---
     if (old_role != 'supplier' and db_user.role == 'supplier') or (old_role != 'SUPPLIER' and db_user.role == 'SUPPLIER'):
@@ -73,11 +80,13 @@ def update_user(db: Session, user_id: int, user: UserUpdate) -> Optional[User]:
             }
             new_supplier = Supplier(**supplier_data)
             db.add(new_supplier)
+            versions.bump(db, versions.SUPPLIERS)
             db.commit()
             db.refresh(new_supplier)
             # Привязываем supplier_id к пользователю
             db_user.supplier_id = new_supplier.id
             db.commit()
+            invalidate_user(user_id)
             db.refresh(db_user)
     return db_user
 
@@ -101,10 +110,20 @@ def delete_user(db: Session, user_id: int) -> bool:
     )
 
     db.delete(db_user)
+    versions.bump(db, versions.PRODUCTS, versions.PHARMACIES, versions.SUPPLIERS)
     db.commit()
+    invalidate_user(user_id)
 
     return True
 
+def get_token_claims(db: Session, user) -> dict:
+    """Собрать данные для JWT токена, включая область доступа пользователя"""
+    from ..db.models import Supplier
+    supplier_id = None
+    if user.role == UserRole.SUPPLIER:
+        supplier_id = user.supplier_id or db.query(Supplier.id).filter(Supplier.user_id == user.id).scalar()
+    return {"sub": user.username, "id": user.id, "role": user.role, "supplier_id": supplier_id}
+
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     """Аутентифицировать пользователя"""
     user = get_user_by_email(db, email)
@@ -112,7 +131,14 @@ def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
     if not user:
         return None
     
-    if not verify_password(password, user.hashed_password):
+    is_valid, new_hash = verify_and_update_password(password, user.hashed_password)
+    if not is_valid:
         return None
     
+    # Стоимость хеша устарела — сохраняем пересчитанный хеш
+    if new_hash:
+        user.hashed_password = new_hash
+        db.commit()
+        db.refresh(user)
+    
     return user
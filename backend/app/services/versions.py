@@ -0,0 +1,68 @@
+"""
+Версии наборов данных для условных GET-запросов.
+
+Каждый сервис, изменяющий данные, вызывает bump() в своей транзакции
+перед commit, поэтому новая версия становится видна одновременно с
+новыми данными. Блокировка строки счётчика держится до commit, а набор
+products меняет каждое перемещение товара, поэтому счётчик набора разбит
+на VERSION_SHARDS строк ("products#0" ... "products#15"): транзакция
+увеличивает случайную из них, и параллельные изменения почти не ждут
+друг друга. Версия набора — сумма его строк, она только растёт. Ключи
+сортируются, чтобы параллельные транзакции блокировали строки в одном
+порядке.
+"""
+import random
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.orm import Session
+
+from ..db.models import entity_versions
+
+# Любые изменения товаров, включая остатки на складе
+PRODUCTS = "products"
+# Изменения карточек товаров (наименование, фасовки, цена, срок годности), без остатков
+PRODUCT_DETAILS = "product_details"
+PHARMACIES = "pharmacies"
+SUPPLIERS = "suppliers"
+
+# Число строк счётчика на набор данных
+VERSION_SHARDS = 16
+
+
+def pharmacy_stock(pharmacy_id: int) -> str:
+    """Ключ набора остатков конкретной аптеки"""
+    return f"pharmacy_stock:{pharmacy_id}"
+
+
+def _shard_keys(entity: str) -> List[str]:
+    # Строка без номера осталась от версий до разбиения и тоже входит в сумму
+    return [entity] + [f"{entity}#{shard}" for shard in range(VERSION_SHARDS)]
+
+
+def bump(db: Session, *entities: str) -> None:
+    """Увеличить версии наборов данных (в рамках текущей транзакции)"""
+    keys = sorted(f"{entity}#{random.randrange(VERSION_SHARDS)}" for entity in set(entities))
+    if not keys:
+        return
+    statement = insert(entity_versions).values([{"entity": key, "version": 1} for key in keys])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[entity_versions.c.entity],
+        set_={"version": entity_versions.c.version + 1, "updated_at": func.now()},
+    ))
+
+
+def get_versions(db: Session, entities: Iterable[str]) -> Tuple[Dict[str, int], Optional[datetime]]:
+    """Версии наборов данных (суммы строк счётчиков) одним запросом и время
+    последнего изменения; для наборов, которые ещё не менялись, версия равна 0"""
+    entities = sorted(set(entities))
+    rows = db.execute(
+        select(entity_versions.c.entity, entity_versions.c.version, entity_versions.c.updated_at)
+        .where(entity_versions.c.entity.in_([key for entity in entities for key in _shard_keys(entity)]))
+    ).all()
+    versions = dict.fromkeys(entities, 0)
+    for row in rows:
+        versions[row.entity.partition("#")[0]] += row.version
+    return versions, max((row.updated_at for row in rows), default=None)
@@ -0,0 +1,127 @@
+"""
+Поиск товаров и поставщиков по фасовке на большом каталоге.
+
+Добавляет в базу --products синтетических товаров (с префиксом имени
+bench-dosage-), сравнивает прежний поиск (загрузка всех товаров и
+фильтрация в Python) с индексированным запросом JSONB @> и удаляет
+добавленные строки.
+
+Запуск:
+    python -m benchmarks.bench_dosage_search --products 100000
+"""
+import argparse
+import random
+import time
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, insert, select, text
+
+from app.db import models_auth  # noqa: F401 — регистрирует модель User
+from app.db.database import SessionLocal, engine
+from app.db.models import Product, Supplier, supplier_product
+from app.services import product as product_service
+from app.services import supplier as supplier_service
+
+from .common import print_table, save_results, summarize
+
+PREFIX = "bench-dosage-"
+DOSAGES = ["5 мг", "10 мг", "20 мг", "50 мг", "100 мг", "200 мг", "250 мг", "500 мг", "1 г"]
+
+
+def populate(count: int, seed: int) -> None:
+    rng = random.Random(seed)
+    expiry = datetime.now() + timedelta(days=365)
+    with engine.begin() as connection:
+        supplier_ids = [
+            connection.execute(insert(Supplier).values(name=f"{PREFIX}{i}").returning(Supplier.id)).scalar_one()
+            for i in range(20)
+        ]
+        for start in range(0, count, 5000):
+            rows = [
+                {
+                    "name": f"{PREFIX}{i}",
+                    "dosages": rng.sample(DOSAGES, rng.randint(1, 3)) + [f"{i} мг"],
+                    "price": round(rng.uniform(10, 1000), 2),
+                    "quantity": rng.randint(0, 1000),
+                    "expiry_date": expiry,
+                }
+                for i in range(start, min(start + 5000, count))
+            ]
+            ids = connection.execute(insert(Product).returning(Product.id), rows).scalars().all()
+            connection.execute(
+                insert(supplier_product),
+                [{"supplier_id": rng.choice(supplier_ids), "product_id": pid, "quantity": 10} for pid in ids],
+            )
+        connection.execute(text("ANALYZE products"))
+        connection.execute(text("ANALYZE supplier_product"))
+
+
+def cleanup() -> None:
+    with engine.begin() as connection:
+        product_ids = select(Product.id).where(Product.name.like(f"{PREFIX}%"))
+        connection.execute(delete(supplier_product).where(supplier_product.c.product_id.in_(product_ids)))
+        connection.execute(delete(Product).where(Product.name.like(f"{PREFIX}%")))
+        connection.execute(delete(Supplier).where(Supplier.name.like(f"{PREFIX}%")))
+
+
+def python_scan_products(db, dosage):
+    """Прежняя реализация: все товары загружаются и фильтруются в Python"""
+    return [p for p in db.query(Product).all() if dosage in p.dosages]
+
+
+def python_scan_suppliers(db, dosage):
+    """Прежняя реализация: ленивая загрузка товаров каждого поставщика"""
+    result = []
+    for supplier in db.query(Supplier).all():
+        if any(dosage in product.dosages for product in supplier.products):
+            result.append(supplier)
+    return result
+
+
+def measure(fn, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        db = SessionLocal()
+        try:
+            start = time.perf_counter()
+            fn(db)
+            latencies.append(time.perf_counter() - start)
+        finally:
+            db.close()
+    return latencies
+
+
+def main(args) -> None:
+    print(f"Добавление {args.products} товаров...")
+    started = time.perf_counter()
+    populate(args.products, args.seed)
+    print(f"Готово за {time.perf_counter() - started:.1f} с")
+    try:
+        cases = {
+            "products: python scan": lambda db: python_scan_products(db, args.dosage),
+            "products: jsonb @> (page)": lambda db: product_service.get_products_by_dosage(db, args.dosage),
+            "suppliers: python scan": lambda db: python_scan_suppliers(db, args.dosage),
+            "suppliers: jsonb @> (page)": lambda db: supplier_service.get_suppliers_by_product_dosage(db, args.dosage),
+        }
+        results = {}
+        for name, fn in cases.items():
+            repeat = args.slow_repeat if "python" in name else args.repeat
+            results[name] = summarize(measure(fn, repeat))
+        print_table(f"Поиск по фасовке «{args.dosage}», {args.products} товаров", results)
+        if args.output:
+            save_results(args.output, "dosage_search", results, vars(args))
+    finally:
+        if not args.keep:
+            cleanup()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--products", type=int, default=100_000)
+    parser.add_argument("--dosage", default="12345 мг", help="фасовка для поиска")
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--slow-repeat", type=int, default=3)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--keep", action="store_true", help="не удалять добавленные данные")
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    main(parser.parse_args())
@@ -0,0 +1,237 @@
+"""
+Нагрузочный тест HTTP API на заполненной базе.
+
+Виртуальные пользователи (--concurrency) в замкнутом цикле выполняют
+запросы выбранного профиля нагрузки: вход в систему, списки товаров,
+остатки аптек, перемещения товаров, просроченные товары и т.д. Для
+каждого маршрута выводятся пропускная способность и p50/p95/p99.
+
+По умолчанию приложение запускается в этом же процессе (ASGI без сети);
+с --base-url запросы идут на запущенный сервер (uvicorn/gunicorn).
+Перемещения товаров изменяют данные: запускайте на тестовой базе,
+например после `python -m app.manage generate --reset --scale medium`.
+
+Запуск:
+    python -m benchmarks.bench_http --mix browse,director --duration 30 --output run.json
+    python -m benchmarks.bench_http --base-url http://localhost:8000 --compare baseline.json
+
+Масштабирование по ядрам: запустите сервер с разным числом воркеров
+(`WEB_CONCURRENCY=1 gunicorn -c gunicorn.conf.py app.main:app`, затем 2, 4, ...)
+и сравните rps при --concurrency не меньше 8 на воркер.
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Awaitable, Callable, Dict, List, Tuple
+
+import httpx
+
+from .common import compare_results, print_table, save_results, summarize
+
+API = "/api/v1"
+
+
+@dataclass
+class Context:
+    director_headers: dict
+    pharmacy_ids: List[int]
+    product_ids: List[int]
+    dosages: List[str]
+    email: str
+    password: str
+
+
+@dataclass
+class Operation:
+    route: str
+    request: Callable[[httpx.AsyncClient, Context, random.Random], Awaitable[httpx.Response]]
+    # Перемещение может законно завершиться 400, если товар закончился
+    expected: Tuple[int, ...] = (200,)
+
+
+def _login(client, ctx, rng):
+    return client.post(f"{API}/auth/login", data={"username": ctx.email, "password": ctx.password})
+
+
+def _transfer_batch(client, ctx, rng):
+    lines = [
+        {"pharmacy_id": rng.choice(ctx.pharmacy_ids), "product_id": rng.choice(ctx.product_ids), "quantity": 1}
+        for _ in range(10)
+    ]
+    return client.post(f"{API}/products/pharmacy/transfer", json=lines, headers=ctx.director_headers)
+
+
+OPERATIONS: Dict[str, Operation] = {
+    "login": Operation("POST /auth/login", _login),
+    "list_products": Operation(
+        "GET /products/",
+        lambda client, ctx, rng: client.get(f"{API}/products/", params={"limit": 50}, headers=ctx.director_headers),
+    ),
+    "product": Operation(
+        "GET /products/{product_id}",
+        lambda client, ctx, rng: client.get(f"{API}/products/{rng.choice(ctx.product_ids)}", headers=ctx.director_headers),
+    ),
+    "pharmacies": Operation(
+        "GET /pharmacies/",
+        lambda client, ctx, rng: client.get(f"{API}/pharmacies/", headers=ctx.director_headers),
+    ),
+    "pharmacy_stock": Operation(
+        "GET /products/pharmacy/{pharmacy_id}",
+        lambda client, ctx, rng: client.get(f"{API}/products/pharmacy/{rng.choice(ctx.pharmacy_ids)}"),
+    ),
+    "total_cost": Operation(
+        "GET /products/total-cost/",
+        lambda client, ctx, rng: client.get(f"{API}/products/total-cost/", params={"pharmacy_id": rng.choice(ctx.pharmacy_ids)}),
+    ),
+    "expired": Operation(
+        "GET /products/expired/",
+        lambda client, ctx, rng: client.get(f"{API}/products/expired/", params={"pharmacy_id": rng.choice(ctx.pharmacy_ids)}),
+    ),
+    "dosage": Operation(
+        "GET /products/dosage/{dosage}",
+        lambda client, ctx, rng: client.get(f"{API}/products/dosage/{rng.choice(ctx.dosages)}"),
+    ),
+    "suppliers_by_dosage": Operation(
+        "GET /suppliers/product-dosage/{dosage}",
+        lambda client, ctx, rng: client.get(f"{API}/suppliers/product-dosage/{rng.choice(ctx.dosages)}", headers=ctx.director_headers),
+    ),
+    "transfer": Operation(
+        "POST /products/pharmacy/{pharmacy_id}/add/{product_id}",
+        lambda client, ctx, rng: client.post(
+            f"{API}/products/pharmacy/{rng.choice(ctx.pharmacy_ids)}/add/{rng.choice(ctx.product_ids)}",
+            params={"quantity": 1}, headers=ctx.director_headers,
+        ),
+        expected=(200, 400),
+    ),
+    "transfer_batch": Operation("POST /products/pharmacy/transfer", _transfer_batch),
+}
+
+# Профили нагрузки: доля каждой операции
+MIXES: Dict[str, Dict[str, int]] = {
+    "browse": {"list_products": 30, "product": 20, "pharmacy_stock": 20, "dosage": 10, "suppliers_by_dosage": 5, "expired": 10, "total_cost": 5},
+    "director": {"pharmacies": 10, "pharmacy_stock": 25, "expired": 15, "total_cost": 15, "transfer": 20, "transfer_batch": 5, "list_products": 10},
+    "login": {"login": 70, "list_products": 30},
+}
+
+
+@dataclass
+class RouteSamples:
+    latencies: List[float] = field(default_factory=list)
+    errors: int = 0
+    statuses: Dict[int, int] = field(default_factory=dict)
+
+
+async def virtual_user(client, ctx, mix, rng, started_at, stop_at, samples: Dict[str, RouteSamples]) -> None:
+    names = list(mix)
+    weights = [mix[name] for name in names]
+    while time.perf_counter() < stop_at:
+        operation = OPERATIONS[rng.choices(names, weights)[0]]
+        start = time.perf_counter()
+        try:
+            response = await operation.request(client, ctx, rng)
+            status = response.status_code
+        except httpx.HTTPError:
+            status = 0
+        if start < started_at:
+            continue  # прогрев
+        route = samples.setdefault(operation.route, RouteSamples())
+        route.latencies.append(time.perf_counter() - start)
+        route.statuses[status] = route.statuses.get(status, 0) + 1
+        if status not in operation.expected:
+            route.errors += 1
+
+
+async def run_mix(client, ctx, name: str, args) -> Dict[str, dict]:
+    samples: Dict[str, RouteSamples] = {}
+    started_at = time.perf_counter() + args.warmup
+    stop_at = started_at + args.duration
+    await asyncio.gather(*[
+        virtual_user(client, ctx, MIXES[name], random.Random(args.seed + i), started_at, stop_at, samples)
+        for i in range(args.concurrency)
+    ])
+    results = {}
+    for route, s in sorted(samples.items()):
+        results[route] = summarize(s.latencies, args.duration, s.errors)
+        results[route]["statuses"] = {str(status): count for status, count in sorted(s.statuses.items())}
+    all_latencies = [latency for s in samples.values() for latency in s.latencies]
+    results["total"] = summarize(all_latencies, args.duration, sum(s.errors for s in samples.values()))
+    return results
+
+
+async def prepare_context(client, args) -> Context:
+    response = await client.post(f"{API}/auth/login", data={"username": args.email, "password": args.password})
+    response.raise_for_status()
+    headers = {"Authorization": f"Bearer {response.json()['access_token']}"}
+    pharmacies = (await client.get(f"{API}/pharmacies/", params={"limit": 1000}, headers=headers)).json()
+    products = (await client.get(f"{API}/products/", params={"limit": 1000}, headers=headers)).json()
+    if not pharmacies or not products:
+        sys.exit("В базе нет аптек или товаров директора: выполните python -m app.manage setup / generate")
+    return Context(
+        director_headers=headers,
+        pharmacy_ids=[p["id"] for p in pharmacies],
+        product_ids=[p["id"] for p in products],
+        dosages=sorted({d for p in products for d in (p.get("dosages") or [])}) or ["100 мг"],
+        email=args.email,
+        password=args.password,
+    )
+
+
+async def run(args) -> Dict[str, Dict[str, dict]]:
+    limits = httpx.Limits(max_connections=args.concurrency)
+    if args.base_url:
+        client = httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60)
+        app = None
+    else:
+        from app.main import app
+
+        await app.router.startup()
+        client = httpx.AsyncClient(app=app, base_url="http://bench", timeout=60)
+    try:
+        async with client:
+            ctx = await prepare_context(client, args)
+            results = {}
+            for name in args.mix.split(","):
+                results[name] = await run_mix(client, ctx, name, args)
+                print_table(f"Профиль «{name}»: {args.concurrency} пользователей, {args.duration} с", results[name])
+            return results
+    finally:
+        if app is not None:
+            await app.router.shutdown()
+
+
+def main(args) -> None:
+    unknown = [name for name in args.mix.split(",") if name not in MIXES]
+    if unknown:
+        sys.exit(f"Неизвестные профили: {unknown}. Доступны: {', '.join(MIXES)}")
+    results = asyncio.run(run(args))
+    if args.output:
+        save_results(args.output, "http", results, vars(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(baseline, results, args.threshold)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ: {line}")
+        if regressions:
+            sys.exit(1)
+        print(f"\nРегрессий относительно {args.compare} нет (порог {args.threshold}%)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", help="адрес запущенного сервера; по умолчанию приложение запускается в процессе")
+    parser.add_argument("--mix", default=",".join(MIXES), help=f"профили через запятую: {', '.join(MIXES)}")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=20.0, help="длительность профиля, секунд")
+    parser.add_argument("--warmup", type=float, default=3.0, help="прогрев перед измерением, секунд")
+    parser.add_argument("--email", default="director@pharmacy.com")
+    parser.add_argument("--password", default="director123")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    parser.add_argument("--compare", help="JSON-файл предыдущего запуска для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=20.0, help="допустимое ухудшение p95 и rps, %%")
+    main(parser.parse_args())
@@ -0,0 +1,94 @@
+"""
+Задержки лёгких запросов во время потока входов в систему.
+
+Сначала измеряются /health и /api/v1/products/ без фоновой нагрузки,
+затем те же запросы на фоне непрерывных POST /api/v1/auth/login.
+Если обработчики блокируют цикл событий, p99 во второй фазе вырастет
+до времени хеширования пароля.
+
+Запуск (сервер должен быть запущен):
+    python -m benchmarks.bench_login_concurrency --base-url http://localhost:8000
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List
+
+import httpx
+
+from .common import print_table, save_results, summarize
+
+API = "/api/v1"
+
+
+async def login(client: httpx.AsyncClient, email: str, password: str) -> httpx.Response:
+    return await client.post(f"{API}/auth/login", data={"username": email, "password": password})
+
+
+async def probe_loop(client, path, headers, stop_at, latencies: List[float], errors: List[int]):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await client.get(path, headers=headers)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def login_loop(client, email, password, stop_at, latencies: List[float], errors: List[int]):
+    while time.perf_counter() < stop_at:
+        start = time.perf_counter()
+        response = await login(client, email, password)
+        latencies.append(time.perf_counter() - start)
+        if response.status_code != 200:
+            errors.append(response.status_code)
+
+
+async def run_phase(args, token: str, with_logins: bool) -> Dict[str, dict]:
+    headers = {"Authorization": f"Bearer {token}"}
+    probes = {"/health": {}, f"{API}/products/": headers}
+    samples = {path: ([], []) for path in probes}
+    login_samples = ([], [])
+    limits = httpx.Limits(max_connections=args.probe_concurrency * 2 + args.login_concurrency)
+
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        stop_at = time.perf_counter() + args.duration
+        tasks = []
+        for path, path_headers in probes.items():
+            for _ in range(args.probe_concurrency):
+                tasks.append(probe_loop(client, path, path_headers, stop_at, *samples[path]))
+        if with_logins:
+            for _ in range(args.login_concurrency):
+                tasks.append(login_loop(client, args.email, args.password, stop_at, *login_samples))
+        await asyncio.gather(*tasks)
+
+    results = {path: summarize(lat, args.duration, len(err)) for path, (lat, err) in samples.items()}
+    if with_logins:
+        results["POST /auth/login"] = summarize(login_samples[0], args.duration, len(login_samples[1]))
+    return results
+
+
+async def main(args) -> None:
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        response = await login(client, args.email, args.password)
+        response.raise_for_status()
+        token = response.json()["access_token"]
+
+    baseline = await run_phase(args, token, with_logins=False)
+    print_table("Без нагрузки на вход", baseline)
+    loaded = await run_phase(args, token, with_logins=True)
+    print_table(f"С {args.login_concurrency} параллельными входами", loaded)
+
+    if args.output:
+        save_results(args.output, "login_concurrency", {"baseline": baseline, "login_storm": loaded}, vars(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", default="admin@pharmacy.com")
+    parser.add_argument("--password", default="admin123")
+    parser.add_argument("--duration", type=float, default=10.0, help="длительность каждой фазы, секунд")
+    parser.add_argument("--probe-concurrency", type=int, default=4)
+    parser.add_argument("--login-concurrency", type=int, default=16)
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,149 @@
+"""
+Сериализация больших списков товаров: прежний путь и быстрый.
+
+Прежний путь: строки результата -> модели Pydantic в сервисе -> повторная
+проверка и сериализация через response_model -> JSONResponse (json).
+Быстрый путь: текущие функции app.services.product (строки -> словари) ->
+ORJSONResponse. Оба ответа сравниваются между собой, а быстрый ещё и
+проверяется по схеме ответа. База данных не нужна: сервисы получают
+сессию, которая возвращает сгенерированные строки в порядке колонок их
+запроса.
+
+Запуск:
+    python -m benchmarks.bench_serialization --rows 10000
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from typing import Dict, List
+
+from fastapi.responses import JSONResponse, ORJSONResponse
+from fastapi.routing import serialize_response
+from fastapi.utils import create_response_field
+from pydantic import parse_obj_as
+from sqlalchemy.engine.result import IteratorResult, SimpleResultMetaData
+
+from app.db.generate_data import DOSAGES
+from app.schemas.product import ProductWithSupplier
+from app.schemas.product_in_pharmacy import ProductInPharmacy
+from app.services import product as product_service
+
+from .common import print_table, save_results, summarize
+
+
+def make_rows(count: int, seed: int):
+    rng = random.Random(seed)
+    now = datetime(2025, 1, 1)
+    pharmacy_rows, product_rows = [], []
+    for i in range(1, count + 1):
+        dosages = rng.sample(DOSAGES, rng.randint(1, 3))
+        price = round(rng.uniform(10, 1000), 2)
+        expiry = now + timedelta(days=rng.randint(-100, 1000), seconds=rng.randint(0, 86399))
+        pharmacy_rows.append({
+            "id": i, "name": f"Товар {i}", "dosages": dosages, "price": price, "expiry_date": expiry,
+            "quantity_in_pharmacy": rng.randint(1, 200),
+        })
+        supplier_id = rng.choice([None, rng.randint(1, 500)])
+        product_rows.append({
+            "id": i, "name": f"Товар {i}", "dosages": dosages, "price": price, "quantity": rng.randint(0, 2000),
+            "expiry_date": expiry, "preferred_supplier_id": supplier_id,
+            "preferred_supplier_name": f"Поставщик {supplier_id}" if supplier_id else None,
+        })
+    return pharmacy_rows, product_rows
+
+
+class RowsSession:
+    """Сессия без базы: execute() возвращает строки в порядке колонок запроса сервиса"""
+
+    def __init__(self, rows: List[dict]):
+        self.rows = rows
+        self._tuples: Dict[tuple, list] = {}
+
+    def execute(self, statement):
+        keys = tuple(column.key for column in statement.selected_columns)
+        if keys not in self._tuples:
+            # Колонка, которой нет в сгенерированных строках, — ошибка: запрос сервиса изменился
+            self._tuples[keys] = [tuple(row[key] for key in keys) for row in self.rows]
+        return IteratorResult(SimpleResultMetaData(keys), iter(self._tuples[keys]))
+
+
+# Прежние реализации сервисов: модель Pydantic на каждую строку
+def old_pharmacy_products(rows):
+    return [ProductInPharmacy(**row) for row in rows]
+
+
+def old_products_with_supplier(rows):
+    return [
+        ProductWithSupplier(
+            **{key: value for key, value in row.items() if key != "preferred_supplier_name"},
+            preferred_supplier=(
+                {"id": row["preferred_supplier_id"], "name": row["preferred_supplier_name"]}
+                if row["preferred_supplier_id"] is not None else None
+            ),
+        )
+        for row in rows
+    ]
+
+
+# Текущие реализации: сервисы приложения
+def new_pharmacy_products(db: RowsSession):
+    return product_service.get_products_by_pharmacy(db, pharmacy_id=1)
+
+
+def new_products_with_supplier(db: RowsSession):
+    return product_service.get_products_with_supplier(db, limit=len(db.rows))
+
+
+def old_path(build, field, rows) -> bytes:
+    content = asyncio.run(serialize_response(field=field, response_content=build(rows), is_coroutine=True))
+    return JSONResponse(content).body
+
+
+def new_path(build, db: RowsSession) -> bytes:
+    return ORJSONResponse(build(db)).body
+
+
+def measure(fn, repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main(args) -> None:
+    pharmacy_rows, product_rows = make_rows(args.rows, args.seed)
+    cases = [
+        ("pharmacy stock", old_pharmacy_products, new_pharmacy_products, ProductInPharmacy, pharmacy_rows),
+        ("products with supplier", old_products_with_supplier, new_products_with_supplier, ProductWithSupplier,
+         product_rows),
+    ]
+    results = {}
+    for name, old_build, new_build, model, rows in cases:
+        field = create_response_field(name=f"Response_{model.__name__}", type_=List[model])
+        db = RowsSession(rows)
+        # Ответы совпадают, а быстрый путь соответствует схеме
+        old_body, new_body = old_path(old_build, field, rows), new_path(new_build, db)
+        assert json.loads(old_body) == json.loads(new_body), f"{name}: ответы различаются"
+        parse_obj_as(List[model], new_build(db))
+
+        results[f"{name}: pydantic + json"] = summarize(measure(lambda: old_path(old_build, field, rows), args.repeat))
+        results[f"{name}: rows + orjson"] = summarize(measure(lambda: new_path(new_build, db), args.repeat))
+        results[f"{name}: pydantic + json"]["bytes"] = len(old_body)
+        results[f"{name}: rows + orjson"]["bytes"] = len(new_body)
+    print_table(f"Сериализация {args.rows} строк", results)
+    if args.output:
+        save_results(args.output, "serialization", results, vars(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    main(parser.parse_args())
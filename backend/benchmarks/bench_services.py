@@ -0,0 +1,254 @@
+"""
+Микробенчмарки сервисного слоя с подсчётом SQL-запросов.
+
+Для каждого размера набора данных (--sizes, число товаров) генератор
+app.db.generate_data заполняет базу внутри транзакции, после чего каждая
+функция из app/services/{product,pharmacy,supplier,user}.py вызывается
+--repeat раз в отдельной точке сохранения. Записываются время, число
+SQL-запросов, число полученных/изменённых строк и наибольшее число
+повторов одного запроса. Все изменения откатываются.
+
+Функции, у которых число запросов растёт вместе с объёмом данных,
+помечаются как O(n). С --compare результаты сравниваются с предыдущим
+запуском (время, число запросов, ошибки).
+
+Запуск:
+    python -m benchmarks.bench_services --sizes 1000,10000,50000 --output services.json
+"""
+import argparse
+import json
+import sys
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from app.db import models_auth
+from app.db.database import engine
+from app.db.generate_data import GeneratorParams, generate
+from app.db.instrumentation import count_queries, install
+from app.schemas.pharmacy import PharmacyCreate, PharmacyUpdate
+from app.schemas.product import ProductCreate, ProductUpdate
+from app.schemas.supplier import SupplierCreate, SupplierUpdate
+from app.schemas.user import UserCreate, UserUpdate
+from app.services import pharmacy as pharmacy_service
+from app.services import product as product_service
+from app.services import supplier as supplier_service
+from app.services import user as user_service
+
+from .common import compare_results, save_results, summarize
+
+BENCH_PASSWORD = "bench-password"
+
+
+@dataclass
+class SampleIds:
+    product_id: int
+    pharmacy_id: int
+    supplier_id: int
+    user_id: int
+    user_email: str
+    user_name: str
+    product_name: str
+    dosage: str
+    director: object
+    admin: object
+
+
+def _sample_ids(db: Session) -> SampleIds:
+    row = db.execute(text("""
+        SELECT pp.product_id, pp.pharmacy_id, p.name AS product_name, p.dosages ->> 0 AS dosage,
+               (SELECT supplier_id FROM supplier_product ORDER BY supplier_id LIMIT 1) AS supplier_id,
+               ph.director_id, u.email, u.username
+        FROM pharmacy_product pp
+        JOIN products p ON p.id = pp.product_id
+        JOIN pharmacies ph ON ph.id = pp.pharmacy_id
+        JOIN users u ON u.id = ph.director_id
+        ORDER BY pp.pharmacy_id, pp.product_id
+        LIMIT 1
+    """)).one()
+    director = models_auth.User(id=row.director_id, role=models_auth.UserRole.DIRECTOR)
+    admin = models_auth.User(id=0, role=models_auth.UserRole.ADMIN)
+    return SampleIds(
+        row.product_id, row.pharmacy_id, row.supplier_id, row.director_id, row.email, row.username,
+        row.product_name, row.dosage, director, admin,
+    )
+
+
+def scenarios(ids: SampleIds) -> List[Tuple[str, Callable[[Session], object]]]:
+    expiry = datetime.now() + timedelta(days=365)
+    new_product = ProductCreate(
+        name="bench-product", dosages=["10 мг"], price=100.0, quantity=10,
+        expiry_date=expiry, preferred_supplier_id=ids.supplier_id,
+    )
+    transfer = [{"pharmacy_id": ids.pharmacy_id, "product_id": ids.product_id + i, "quantity": 1} for i in range(10)]
+    return [
+        # product.py
+        ("product.get_product", lambda db: product_service.get_product(db, ids.product_id)),
+        ("product.get_products", lambda db: product_service.get_products(db)),
+        ("product.get_products (after_id)", lambda db: product_service.get_products(db, after_id=ids.product_id)),
+        ("product.get_products_with_supplier", lambda db: product_service.get_products_with_supplier(db)),
+        ("product.create_product", lambda db: product_service.create_product(db, new_product)),
+        ("product.update_product (price)",
+         lambda db: product_service.update_product(db, ids.product_id, ProductUpdate(price=123.45))),
+        ("product.delete_product", lambda db: product_service.delete_product(db, ids.product_id)),
+        ("product.get_expired_products", lambda db: product_service.get_expired_products(db)),
+        ("product.get_expired_products (pharmacy)",
+         lambda db: product_service.get_expired_products(db, pharmacy_id=ids.pharmacy_id)),
+        ("product.get_products_by_pharmacy", lambda db: product_service.get_products_by_pharmacy(db, ids.pharmacy_id)),
+        ("product.get_products_by_supplier", lambda db: product_service.get_products_by_supplier(db, ids.supplier_id)),
+        ("product.get_products_by_dosage", lambda db: product_service.get_products_by_dosage(db, ids.dosage)),
+        ("product.add_product_to_pharmacy",
+         lambda db: product_service.add_product_to_pharmacy(db, ids.product_id, ids.pharmacy_id, 1)),
+        ("product.transfer_products_batch (10)", lambda db: product_service.transfer_products_batch(db, transfer)),
+        ("product.delete_product_from_pharmacy",
+         lambda db: product_service.delete_product_from_pharmacy(db, ids.pharmacy_id, ids.product_id)),
+        ("product.remove_product_from_pharmacy",
+         lambda db: product_service.remove_product_from_pharmacy(db, ids.product_id, ids.pharmacy_id)),
+        ("product.recalculate_pharmacy_stock_value",
+         lambda db: product_service.recalculate_pharmacy_stock_value(db, ids.pharmacy_id)),
+        ("product.get_total_products_cost (pharmacy)",
+         lambda db: product_service.get_total_products_cost(db, pharmacy_id=ids.pharmacy_id)),
+        ("product.get_total_products_cost", lambda db: product_service.get_total_products_cost(db)),
+        # pharmacy.py
+        ("pharmacy.get_pharmacy", lambda db: pharmacy_service.get_pharmacy(db, ids.pharmacy_id)),
+        ("pharmacy.get_pharmacies (admin)", lambda db: pharmacy_service.get_pharmacies(db, current_user=ids.admin)),
+        ("pharmacy.get_pharmacies (director)",
+         lambda db: pharmacy_service.get_pharmacies(db, current_user=ids.director)),
+        ("pharmacy.create_pharmacy",
+         lambda db: pharmacy_service.create_pharmacy(db, PharmacyCreate(name="bench-pharmacy"), ids.director)),
+        ("pharmacy.update_pharmacy",
+         lambda db: pharmacy_service.update_pharmacy(db, ids.pharmacy_id, PharmacyUpdate(name="bench"), ids.director)),
+        ("pharmacy.delete_pharmacy", lambda db: pharmacy_service.delete_pharmacy(db, ids.pharmacy_id, ids.director)),
+        ("pharmacy.update_pharmacy_date",
+         lambda db: pharmacy_service.update_pharmacy_date(db, ids.pharmacy_id, datetime.now())),
+        # supplier.py
+        ("supplier.get_supplier", lambda db: supplier_service.get_supplier(db, ids.supplier_id)),
+        ("supplier.get_suppliers", lambda db: supplier_service.get_suppliers(db)),
+        ("supplier.create_supplier", lambda db: supplier_service.create_supplier(db, SupplierCreate(name="bench"))),
+        ("supplier.update_supplier",
+         lambda db: supplier_service.update_supplier(db, ids.supplier_id, SupplierUpdate(name="bench"))),
+        ("supplier.delete_supplier", lambda db: supplier_service.delete_supplier(db, ids.supplier_id)),
+        ("supplier.get_suppliers_by_product",
+         lambda db: supplier_service.get_suppliers_by_product(db, ids.product_id)),
+        ("supplier.get_suppliers_by_product_name",
+         lambda db: supplier_service.get_suppliers_by_product_name(db, ids.product_name)),
+        ("supplier.get_suppliers_by_product_dosage",
+         lambda db: supplier_service.get_suppliers_by_product_dosage(db, ids.dosage)),
+        ("supplier.add_product_to_supplier",
+         lambda db: supplier_service.add_product_to_supplier(db, ids.product_id, ids.supplier_id, 5)),
+        ("supplier.remove_product_from_supplier",
+         lambda db: supplier_service.remove_product_from_supplier(db, ids.product_id, ids.supplier_id)),
+        # user.py
+        ("user.get_user", lambda db: user_service.get_user(db, ids.user_id)),
+        ("user.get_user_by_email", lambda db: user_service.get_user_by_email(db, ids.user_email)),
+        ("user.get_user_by_username", lambda db: user_service.get_user_by_username(db, ids.user_name)),
+        ("user.get_users", lambda db: user_service.get_users(db)),
+        ("user.create_user", lambda db: user_service.create_user(
+            db, UserCreate(email="bench@pharmacy.com", username="bench", password=BENCH_PASSWORD))),
+        ("user.update_user", lambda db: user_service.update_user(db, ids.user_id, UserUpdate(is_active=True))),
+        ("user.delete_user", lambda db: user_service.delete_user(db, ids.user_id)),
+        ("user.get_token_claims",
+         lambda db: user_service.get_token_claims(db, user_service.get_user(db, ids.user_id))),
+        ("user.authenticate_user", lambda db: user_service.authenticate_user(db, ids.user_email, "director123")),
+    ]
+
+
+def run_scenario(connection, fn: Callable[[Session], object], repeat: int) -> dict:
+    latencies, queries, rows, repeats, errors = [], [], [], [], 0
+    for _ in range(repeat):
+        savepoint = connection.begin_nested()
+        db = Session(bind=connection, join_transaction_mode="create_savepoint")
+        try:
+            with count_queries() as stats:
+                started = time.perf_counter()
+                fn(db)
+                latencies.append(time.perf_counter() - started)
+            queries.append(stats.statements)
+            rows.append(stats.rows)
+            repeats.append(stats.max_repeats)
+        except Exception:
+            errors += 1
+        finally:
+            db.close()
+            savepoint.rollback()
+    result = summarize(latencies, errors=errors)
+    result["queries"] = max(queries, default=0)
+    result["rows"] = max(rows, default=0)
+    result["max_repeats"] = max(repeats, default=0)
+    return result
+
+
+def run_size(size: int, args) -> Dict[str, dict]:
+    params = GeneratorParams(
+        pharmacies=max(size // 100, 2), suppliers=max(size // 200, 2), products=size,
+        stock_per_pharmacy=min(args.stock_per_pharmacy, size), suppliers_per_product=2, seed=args.seed,
+    )
+    results = {}
+    with engine.connect() as connection:
+        transaction = connection.begin()
+        try:
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            generate(db, params)
+            ids = _sample_ids(db)
+            db.close()
+            for name, fn in scenarios(ids):
+                if args.only and not any(part in name for part in args.only.split(",")):
+                    continue
+                results[name] = run_scenario(connection, fn, args.repeat)
+        finally:
+            transaction.rollback()
+    return results
+
+
+def print_scaling(results: Dict[str, Dict[str, dict]]) -> None:
+    sizes = list(results)
+    names = list(results[sizes[0]])
+    width = max(len(name) for name in names) + 1
+    header = "".join(f"{'q@' + size:>10}{'ms@' + size:>12}" for size in sizes)
+    print(f"\n{'function':<{width}}{header}  scaling")
+    for name in names:
+        cells = "".join(
+            f"{results[size][name]['queries']:>10}{results[size][name]['p50_ms']:>12}" for size in sizes
+        )
+        queries = [results[size][name]["queries"] for size in sizes]
+        errors = sum(results[size][name]["errors"] for size in sizes)
+        scaling = "O(n) запросов" if queries[-1] > queries[0] else ""
+        if errors:
+            scaling = f"{scaling} ошибок: {errors}".strip()
+        print(f"{name:<{width}}{cells}  {scaling}")
+
+
+def main(args) -> None:
+    install(engine)
+    results = {}
+    for size in [int(s) for s in args.sizes.split(",")]:
+        print(f"Набор данных: {size} товаров...")
+        results[str(size)] = run_size(size, args)
+    print_scaling(results)
+    if args.output:
+        save_results(args.output, "services", results, vars(args))
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+        regressions = compare_results(baseline, results, args.threshold)
+        for line in regressions:
+            print(f"РЕГРЕССИЯ: {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="1000,10000,50000", help="размеры набора (число товаров) через запятую")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--stock-per-pharmacy", type=int, default=100)
+    parser.add_argument("--only", help="выполнять только функции, имя которых содержит одну из подстрок")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    parser.add_argument("--compare", help="JSON-файл предыдущего запуска для поиска регрессий")
+    parser.add_argument("--threshold", type=float, default=20.0, help="допустимое ухудшение p95, %%")
+    main(parser.parse_args())
@@ -0,0 +1,120 @@
+"""
+Время запуска приложения.
+
+Измеряет в отдельных процессах (холодный старт интерпретатора):
+  - import: импорт app.main;
+  - startup: импорт и выполнение обработчиков запуска (как при старте воркера);
+а в текущем процессе:
+  - ready probe: проверку готовности базы (/health/ready);
+  - seed: заполнение тестовыми данными в откатываемой транзакции;
+  - seed: hashing: хеширование паролей тестовых пользователей по одному,
+    которое прежняя инициализация выполняла при каждом запуске.
+
+Запуск:
+    python -m benchmarks.bench_startup --repeat 10
+"""
+import argparse
+import subprocess
+import sys
+import time
+
+from sqlalchemy.orm import Session
+
+from app.db import models_auth  # noqa: F401 — регистрирует модель User
+from app.db.database import engine
+from app.db.init_db import INITIAL_USERS, SUPPLIER_USERS, init_db
+
+from .common import print_table, save_results, summarize
+
+IMPORT_SCRIPT = """
+import time
+started = time.perf_counter()
+import app.main
+print(time.perf_counter() - started)
+"""
+
+STARTUP_SCRIPT = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import app.main
+with TestClient(app.main.app):
+    print(time.perf_counter() - started)
+"""
+
+
+def measure_subprocess(script: str, repeat: int) -> tuple:
+    latencies, errors = [], 0
+    for _ in range(repeat):
+        completed = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True)
+        if completed.returncode != 0:
+            errors += 1
+            print(completed.stderr.strip().splitlines()[-1] if completed.stderr else "ошибка запуска")
+            continue
+        latencies.append(float(completed.stdout.strip().splitlines()[-1]))
+    return latencies, errors
+
+
+def measure_ready_probe(repeat: int) -> list:
+    from app.main import check_database_ready
+
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        check_database_ready()
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def measure_seed(repeat: int) -> list:
+    latencies = []
+    for _ in range(repeat):
+        with engine.connect() as connection:
+            transaction = connection.begin()
+            # Коммит init_db превращается в точку сохранения и откатывается вместе с транзакцией
+            db = Session(bind=connection, join_transaction_mode="create_savepoint")
+            try:
+                started = time.perf_counter()
+                init_db(db)
+                latencies.append(time.perf_counter() - started)
+            finally:
+                db.close()
+                transaction.rollback()
+    return latencies
+
+
+def measure_hashing(repeat: int) -> list:
+    from app.core.security import get_password_hash
+
+    passwords = [u["password"] for u in INITIAL_USERS] + [u["password"] for u in SUPPLIER_USERS]
+    latencies = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for password in passwords:
+            get_password_hash(password)
+        latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def main(args) -> None:
+    results = {}
+    latencies, errors = measure_subprocess(IMPORT_SCRIPT, args.repeat)
+    results["import"] = summarize(latencies, errors=errors)
+    latencies, errors = measure_subprocess(STARTUP_SCRIPT, args.repeat)
+    results["startup"] = summarize(latencies, errors=errors)
+    results["ready probe"] = summarize(measure_ready_probe(args.repeat * 10))
+    if not args.skip_seed:
+        results["seed"] = summarize(measure_seed(args.repeat))
+        results["seed: hashing"] = summarize(measure_hashing(args.hash_repeat))
+    print_table("Запуск приложения", results)
+    if args.output:
+        save_results(args.output, "startup", results, vars(args))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10)
+    parser.add_argument("--hash-repeat", type=int, default=1, help="повторы хеширования паролей")
+    parser.add_argument("--skip-seed", action="store_true", help="не измерять заполнение базы")
+    parser.add_argument("--output", help="путь к JSON-файлу с результатами")
+    main(parser.parse_args())
@@ -0,0 +1,83 @@
+"""Общие функции для бенчмарков: статистика задержек и сохранение результатов"""
+import json
+import math
+import platform
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    """Перцентиль по методу ближайшего ранга (samples должны быть отсортированы)"""
+    if not samples:
+        return 0.0
+    rank = max(math.ceil(pct / 100.0 * len(samples)) - 1, 0)
+    return samples[min(rank, len(samples) - 1)]
+
+
+def summarize(latencies: Iterable[float], duration: Optional[float] = None, errors: int = 0) -> Dict[str, float]:
+    """Сводка по задержкам в миллисекундах"""
+    samples = sorted(latencies)
+    summary = {
+        "count": len(samples),
+        "errors": errors,
+        "p50_ms": round(percentile(samples, 50) * 1000, 3),
+        "p95_ms": round(percentile(samples, 95) * 1000, 3),
+        "p99_ms": round(percentile(samples, 99) * 1000, 3),
+        "max_ms": round(samples[-1] * 1000, 3) if samples else 0.0,
+    }
+    if duration:
+        summary["rps"] = round(len(samples) / duration, 2)
+    return summary
+
+
+def print_table(title: str, rows: Dict[str, Dict[str, float]]) -> None:
+    """Вывести сводку в виде таблицы"""
+    width = max([40] + [len(name) + 1 for name in rows])
+    print(f"\n{title}")
+    print(f"{'name':<{width}} {'count':>8} {'rps':>9} {'p50':>9} {'p95':>9} {'p99':>9} {'err':>5}")
+    for name, s in rows.items():
+        print(
+            f"{name:<{width}} {s['count']:>8} {s.get('rps', 0):>9} "
+            f"{s['p50_ms']:>9} {s['p95_ms']:>9} {s['p99_ms']:>9} {s['errors']:>5}"
+        )
+
+
+def save_results(path: str, benchmark: str, results: dict, params: Optional[dict] = None) -> None:
+    """Сохранить результаты в JSON, чтобы сравнивать запуски между собой"""
+    payload = {
+        "benchmark": benchmark,
+        "timestamp": datetime.utcnow().isoformat() + "Z",
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": params or {},
+        "results": results,
+    }
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(payload, f, ensure_ascii=False, indent=2)
+    print(f"\nРезультаты сохранены в {path}")
+
+
+def compare_results(baseline: dict, current: dict, threshold_pct: float, path: str = "") -> List[str]:
+    """Сравнить два набора результатов: p95 вырос или rps упал больше чем на
+    threshold_pct процентов, выросло число SQL-запросов или появились ошибки.
+    Возвращает описания регрессий."""
+    regressions = []
+    for name, value in current.items():
+        if not isinstance(value, dict) or name not in baseline:
+            continue
+        label = f"{path}/{name}" if path else name
+        before = baseline[name]
+        if "p95_ms" not in value:
+            regressions.extend(compare_results(before, value, threshold_pct, label))
+            continue
+        factor = 1 + threshold_pct / 100.0
+        # Разница меньше миллисекунды считается шумом
+        if value["p95_ms"] > before["p95_ms"] * factor and value["p95_ms"] - before["p95_ms"] > 1:
+            regressions.append(f"{label}: p95 {before['p95_ms']} -> {value['p95_ms']} мс")
+        if before.get("rps") and value.get("rps", 0) * factor < before["rps"]:
+            regressions.append(f"{label}: rps {before['rps']} -> {value.get('rps', 0)}")
+        if value.get("queries", 0) > before.get("queries", value.get("queries", 0)):
+            regressions.append(f"{label}: запросов {before['queries']} -> {value['queries']}")
+        if value["errors"] > 0 and before["errors"] == 0:
+            regressions.append(f"{label}: ошибок {value['errors']}")
+    return regressions
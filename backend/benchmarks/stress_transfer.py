@@ -0,0 +1,136 @@
+"""
+Стресс-проверка перемещения товара в аптеки при высокой параллельности.
+
+Создаёт --products товаров с остатком --stock у каждого и несколько
+аптек, после чего --workers потоков одновременно перемещают случайный
+товар по --quantity единиц, пока остатки не закончатся. С одним товаром
+все перемещения конкурируют за его строку; с несколькими — только за
+общие строки (стоимость аптек, версии наборов данных для ETag). Проверяется, что продано ровно столько, сколько было на
+складе: остаток не ушёл в минус, а сумма в pharmacy_product и накопленная
+стоимость аптек совпадают с числом успешных перемещений.
+
+Запуск:
+    python -m benchmarks.stress_transfer --workers 64 --stock 5000
+    python -m benchmarks.stress_transfer --workers 32 --products 32 --stock 200
+"""
+import argparse
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, select
+
+from app.db import models_auth  # noqa: F401 — регистрирует модель User
+from app.db.database import SessionLocal, engine
+from app.db.models import Pharmacy, Product, pharmacy_product, pharmacy_stock_value
+from app.services import product as product_service
+
+PREFIX = "bench-transfer-"
+PRICE = 10.0
+
+
+def setup(stock: int, pharmacies: int, products: int):
+    with engine.begin() as connection:
+        product_ids = [
+            connection.execute(
+                insert(Product).values(
+                    name=f"{PREFIX}product-{i}", dosages=["10 мг"], price=PRICE, quantity=stock,
+                    expiry_date=datetime.now() + timedelta(days=365),
+                ).returning(Product.id)
+            ).scalar_one()
+            for i in range(products)
+        ]
+        pharmacy_ids = [
+            connection.execute(insert(Pharmacy).values(name=f"{PREFIX}{i}").returning(Pharmacy.id)).scalar_one()
+            for i in range(pharmacies)
+        ]
+        connection.execute(insert(pharmacy_stock_value), [{"pharmacy_id": pid, "total_cost": 0} for pid in pharmacy_ids])
+    return product_ids, pharmacy_ids
+
+
+def cleanup(product_ids, pharmacy_ids) -> None:
+    with engine.begin() as connection:
+        connection.execute(delete(pharmacy_product).where(pharmacy_product.c.product_id.in_(product_ids)))
+        connection.execute(delete(pharmacy_stock_value).where(pharmacy_stock_value.c.pharmacy_id.in_(pharmacy_ids)))
+        connection.execute(delete(Pharmacy).where(Pharmacy.id.in_(pharmacy_ids)))
+        connection.execute(delete(Product).where(Product.id.in_(product_ids)))
+
+
+def worker(product_ids, pharmacy_ids, quantity, seed, outcomes: Counter, lock, start_event) -> None:
+    rng = random.Random(seed)
+    local = Counter()
+    # Товары, которые этот поток ещё не видел закончившимися
+    available = list(product_ids)
+    start_event.wait()
+    while available:
+        product_id = rng.choice(available)
+        db = SessionLocal()
+        try:
+            result = product_service.add_product_to_pharmacy(
+                db, product_id=product_id, pharmacy_id=rng.choice(pharmacy_ids), quantity=quantity
+            )
+        finally:
+            db.close()
+        local[result] += 1
+        if result == -1:
+            available.remove(product_id)
+    with lock:
+        outcomes.update(local)
+
+
+def main(args) -> int:
+    product_ids, pharmacy_ids = setup(args.stock, args.pharmacies, args.products)
+    try:
+        outcomes, lock, start_event = Counter(), threading.Lock(), threading.Event()
+        threads = [
+            threading.Thread(target=worker, args=(product_ids, pharmacy_ids, args.quantity, i, outcomes, lock, start_event))
+            for i in range(args.workers)
+        ]
+        for thread in threads:
+            thread.start()
+        started = time.perf_counter()
+        start_event.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        with engine.connect() as connection:
+            remainders = connection.execute(select(Product.quantity).where(Product.id.in_(product_ids))).scalars().all()
+            in_pharmacies = connection.execute(
+                select(func.coalesce(func.sum(pharmacy_product.c.quantity), 0))
+                .where(pharmacy_product.c.product_id.in_(product_ids))
+            ).scalar_one()
+            valued = connection.execute(
+                select(func.coalesce(func.sum(pharmacy_stock_value.c.total_cost), 0))
+                .where(pharmacy_stock_value.c.pharmacy_id.in_(pharmacy_ids))
+            ).scalar_one()
+
+        moved = outcomes[1] * args.quantity
+        remaining = sum(remainders)
+        print(f"Успешных перемещений: {outcomes[1]}, отказов: {outcomes[-1]}, за {elapsed:.2f} с "
+              f"({outcomes[1] / elapsed:.0f} перемещений/с)")
+        print(f"Остаток: {remaining}, в аптеках: {in_pharmacies}, стоимость в аптеках: {valued}")
+
+        ok = (
+            all(0 <= left < args.quantity for left in remainders)
+            and moved + remaining == args.stock * args.products
+            and in_pharmacies == moved
+            and abs(float(valued) - moved * PRICE) < 1e-6
+        )
+        print("OK: перепродажи нет" if ok else "ОШИБКА: остатки не сходятся")
+        return 0 if ok else 1
+    finally:
+        cleanup(product_ids, pharmacy_ids)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=64)
+    parser.add_argument("--pharmacies", type=int, default=8)
+    parser.add_argument("--stock", type=int, default=5000, help="остаток каждого товара")
+    parser.add_argument("--products", type=int, default=1)
+    parser.add_argument("--quantity", type=int, default=3)
+    sys.exit(main(parser.parse_args()))
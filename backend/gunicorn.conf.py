@@ -0,0 +1,86 @@
+"""
+Многопроцессный режим для продакшена:
+
+    gunicorn -c gunicorn.conf.py app.main:app
+
+Приложение загружается один раз в главном процессе (preload_app), затем
+gunicorn запускает WEB_CONCURRENCY воркеров uvicorn (по умолчанию по числу
+ядер), которые разделяют загруженный код через copy-on-write.
+Миграции и тестовые данные применяются один раз в главном процессе до
+запуска воркеров; соединения и пул хеширования паролей главного процесса
+закрываются, чтобы воркеры не унаследовали чужие сокеты и процессы.
+Стоимость bcrypt (если не задана PASSWORD_HASH_ROUNDS) подбирается здесь
+же, чтобы все воркеры хешировали пароли одинаково. Страницы фронтенда
+отрисовываются каждым воркером при запуске. Бюджет соединений с базой
+DB_POOL_BUDGET делится между воркерами (app/db/database.py).
+
+Метрики (/metrics) и статистика /health/db-pool, /health/sql-stats,
+/health/auth-cache хранятся в памяти каждого воркера, а запрос попадает в
+случайный из них. Поэтому воркеры записывают снимки своих значений в общий
+каталог METRICS_MULTIPROC_DIR, и ответ собирается из снимков всех
+процессов (app/core/worker_stats.py): счётчики и гистограммы суммируются,
+мгновенные значения отдаются с меткой worker. Отдельный порт метрик на
+каждый воркер не используется: Prometheus опрашивает один адрес.
+
+Плавный перезапуск: `kill -HUP <pid>` заменяет воркеры по одному, текущие
+запросы дозавершаются за graceful_timeout. С preload_app новый код
+загружается только через `kill -USR2` (новый главный процесс), после чего
+старый останавливается `kill -TERM`.
+"""
+import multiprocessing
+import os
+import tempfile
+
+# Число воркеров передаётся в окружение до загрузки приложения: по нему
+# настройки приложения делят пул соединений и пул хеширования паролей
+workers = int(os.environ.get("WEB_CONCURRENCY") or 0) or multiprocessing.cpu_count()
+os.environ["WEB_CONCURRENCY"] = str(workers)
+
+# Каталог снимков метрик воркеров; задаётся до загрузки приложения
+os.environ.setdefault("METRICS_MULTIPROC_DIR", os.path.join(tempfile.gettempdir(), "pharmacy-metrics"))
+
+bind = os.environ.get("BIND", "0.0.0.0:8000")
+worker_class = "uvicorn.workers.UvicornWorker"
+preload_app = True
+
+timeout = int(os.environ.get("WORKER_TIMEOUT", 60))
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 30))
+keepalive = 5
+
+# Перезапуск воркера после N запросов ограничивает рост памяти; 0 — без перезапуска
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get("ACCESS_LOG") or None
+
+
+def on_starting(server):
+    """Миграции и тестовые данные — один раз, до запуска воркеров"""
+    from app.core import worker_stats
+    from app.core.security import calibrate_before_fork, shutdown_password_hasher
+    from app.db.database import engine
+    from app.manage import setup
+
+    # Снимки метрик предыдущего запуска не должны попасть в счётчики
+    worker_stats.clear()
+
+    # Стоимость bcrypt подбирается один раз, воркеры наследуют её при fork
+    calibrate_before_fork()
+    setup()
+    engine.dispose()
+    # Воркеры создают свои пулы хеширования при первом запросе
+    shutdown_password_hasher()
+
+
+def post_fork(server, worker):
+    # Соединения, открытые в главном процессе, остаются ему; воркер создаёт свои
+    from app.db.database import engine
+
+    engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    # Счётчики завершившегося воркера сохраняются, чтобы сумма не уменьшилась
+    from app.core import worker_stats
+
+    worker_stats.mark_process_dead(worker.pid)
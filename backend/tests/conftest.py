@@ -0,0 +1,110 @@
+"""
+Общие фикстуры тестов: приложение на базе SQLite в памяти.
+
+Типы PostgreSQL, которых нет в SQLite (JSONB), создаются как JSON, а
+оператор JSONB @> заменяется проверкой через json_each();
+авторизация заменяется администратором, чтобы проверять обработчики без
+выпуска токенов. Запросы выполняются через httpx в контексте теста,
+поэтому их SQL-запросы видны count_queries() (app.db.instrumentation).
+"""
+from datetime import datetime
+
+import asyncio
+
+import httpx
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.elements import BinaryExpression
+from sqlalchemy.pool import StaticPool
+
+from app.api.deps import Principal, get_current_principal
+from app.db import instrumentation
+from app.db.database import get_db
+from app.db.models import Base, Pharmacy, Product, Supplier, pharmacy_product
+from app.db.models_auth import UserRole
+from app.main import app
+
+
+@compiles(JSONB, "sqlite")
+def _jsonb_as_json(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(BinaryExpression, "sqlite")
+def _jsonb_contains(binary, compiler, **kw):
+    if getattr(binary.operator, "opstring", None) != "@>":
+        return compiler.visit_binary(binary, **kw)
+    # Каждый элемент правого массива есть в левом
+    left, right = compiler.process(binary.left, **kw), compiler.process(binary.right, **kw)
+    return (
+        f"NOT EXISTS (SELECT 1 FROM json_each({right}) AS needle "
+        f"WHERE needle.value NOT IN (SELECT value FROM json_each({left})))"
+    )
+
+
+@pytest.fixture
+def engine():
+    engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+    Base.metadata.create_all(engine)
+    instrumentation.install(engine)
+    yield engine
+    engine.dispose()
+
+
+@pytest.fixture
+def db(engine):
+    session = sessionmaker(bind=engine, autoflush=False)()
+    yield session
+    session.close()
+
+
+@pytest.fixture
+def api(engine):
+    """Функция запроса к приложению: api("GET", path, params=...) -> httpx.Response"""
+    session_factory = sessionmaker(bind=engine, autocommit=False, autoflush=False)
+
+    def override_get_db():
+        session = session_factory()
+        try:
+            yield session
+        finally:
+            session.close()
+
+    app.dependency_overrides[get_db] = override_get_db
+    app.dependency_overrides[get_current_principal] = lambda: Principal(id=1, username="admin", role=UserRole.ADMIN)
+
+    # Обработчики запуска приложения не вызываются: они работают с PostgreSQL
+    async def send(method: str, path: str, **kwargs) -> httpx.Response:
+        async with httpx.AsyncClient(app=app, base_url="http://testserver") as client:
+            return await client.request(method, path, **kwargs)
+
+    yield lambda method, path, **kwargs: asyncio.run(send(method, path, **kwargs))
+    app.dependency_overrides.clear()
+
+
+@pytest.fixture
+def products(db):
+    """Товары, у части которых есть предпочтительный поставщик, часть просрочена,
+    а часть лежит в аптеке. Возвращает ID поставщика и аптеки с товарами."""
+    suppliers = [Supplier(name=f"Поставщик {i}") for i in range(5)]
+    pharmacy = Pharmacy(name="Аптека 1")
+    db.add_all(suppliers + [pharmacy])
+    db.flush()
+    items = [
+        Product(
+            name=f"Товар {i}", dosages=["10 мг"] if i % 2 else ["10 мг", "20 мг"], price=10.0 + i, quantity=i,
+            expiry_date=datetime(2020, 1, 1) if i % 4 == 0 else datetime(2030, 1, 1),
+            preferred_supplier_id=suppliers[i % len(suppliers)].id if i % 3 else None,
+        )
+        for i in range(60)
+    ]
+    db.add_all(items)
+    db.flush()
+    db.execute(pharmacy_product.insert(), [
+        {"pharmacy_id": pharmacy.id, "product_id": item.id, "quantity": 5} for item in items[:10]
+    ])
+    db.commit()
+    return {"supplier_id": suppliers[1].id, "pharmacy_id": pharmacy.id}
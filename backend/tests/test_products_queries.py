@@ -0,0 +1,22 @@
+"""Число запросов списка товаров не зависит от размера страницы"""
+from app.core.config import settings
+from app.db.instrumentation import count_queries
+
+
+def _list_products(api, limit: int):
+    with count_queries() as stats:
+        response = api("GET", f"{settings.API_V1_STR}/products/", params={"limit": limit})
+    assert response.status_code == 200
+    return response.json(), stats
+
+
+def test_products_list_query_count_does_not_depend_on_page_size(api, products):
+    small, small_stats = _list_products(api, 5)
+    large, large_stats = _list_products(api, 50)
+
+    assert len(small) == 5
+    assert len(large) == 50
+    # Поставщики загружаются тем же запросом, а не отдельным запросом на товар
+    assert any(item["preferred_supplier"] for item in large)
+    assert small_stats.statements == large_stats.statements > 0
+    assert large_stats.max_repeats == 1, large_stats.shapes
@@ -0,0 +1,31 @@
+"""Ответы списков товаров соответствуют схемам response_model.
+
+Списки отдаются словарями из строк результата без проверки моделями
+(app.core.responses.rows_response), поэтому схема проверяется здесь."""
+from typing import List
+
+import pytest
+from pydantic import parse_obj_as
+
+from app.core.config import settings
+from app.schemas.product import Product, ProductWithSupplier
+from app.schemas.product_in_pharmacy import ProductInPharmacy
+
+PRODUCTS = f"{settings.API_V1_STR}/products"
+
+
+@pytest.mark.parametrize("path, model", [
+    ("/", ProductWithSupplier),
+    ("/pharmacy/{pharmacy_id}", ProductInPharmacy),
+    ("/expired/", Product),
+    ("/supplier/{supplier_id}", Product),
+    ("/dosage/20 мг", Product),
+])
+def test_products_list_matches_response_model(api, products, path, model):
+    response = api("GET", PRODUCTS + path.format(**products))
+    assert response.status_code == 200
+    items = response.json()
+    assert items
+    parse_obj_as(List[model], items)
+    # Полей, которых нет в схеме, в ответе тоже нет
+    assert all(set(item) == set(model.__fields__) for item in items)
@@ -0,0 +1,48 @@
+"""Объединение метрик нескольких воркеров через общий каталог"""
+import json
+
+import pytest
+
+from app.core import worker_stats
+from app.core.config import settings
+
+
+def _write_worker(directory, pid: int, requests: int, in_flight: int) -> None:
+    families = [
+        ("http_requests_total", "counter", "Число HTTP-запросов",
+         [("http_requests_total", [["route", "/health"]], requests)]),
+        ("http_requests_in_flight", "gauge", "HTTP-запросы в обработке",
+         [("http_requests_in_flight", [], in_flight)]),
+    ]
+    (directory / f"worker-{pid}.json").write_text(json.dumps({"families": families, "health": {}}))
+
+
+@pytest.fixture
+def multiproc_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(settings, "METRICS_MULTIPROC_DIR", str(tmp_path))
+    # Снимок текущего процесса не участвует в проверке
+    monkeypatch.setattr(worker_stats, "write_snapshot", lambda: None)
+    return tmp_path
+
+
+def test_counters_are_summed_and_gauges_labelled_by_worker(multiproc_dir):
+    _write_worker(multiproc_dir, 101, requests=3, in_flight=1)
+    _write_worker(multiproc_dir, 102, requests=4, in_flight=2)
+
+    body = worker_stats.render_metrics()
+
+    assert 'http_requests_total{route="/health"} 7' in body
+    assert 'http_requests_in_flight{worker="101"} 1' in body
+    assert 'http_requests_in_flight{worker="102"} 2' in body
+
+
+def test_counters_of_exited_worker_are_kept(multiproc_dir):
+    _write_worker(multiproc_dir, 101, requests=3, in_flight=1)
+    _write_worker(multiproc_dir, 102, requests=4, in_flight=2)
+
+    worker_stats.mark_process_dead(101)
+    body = worker_stats.render_metrics()
+
+    assert 'http_requests_total{route="/health"} 7' in body
+    assert 'worker="101"' not in body
+    assert not (multiproc_dir / "worker-101.json").exists()